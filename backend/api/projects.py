@@ -192,6 +192,9 @@ async def deploy_project(
         except ValueError as e:
             raise HTTPException(status_code=400, detail=f"Invalid canvas configuration: {str(e)}")
         
+        # Queries to the system count against the deploying user's rate limit
+        system_config["owner_id"] = user_id
+        
         # Create the multi-agent system
         try:
             system_id = system_manager.create_system(system_config)
@@ -0,0 +1,159 @@
+"""
+Benchmark: simulated saturated LLM endpoint with and without the adaptive concurrency limiter.
+
+Run from the backend directory:
+    python -m benchmarks.bench_concurrency_limiter [--clients N] [--capacity N] [--seconds S]
+
+The simulated endpoint runs `capacity` sequences at once and queues the rest, like
+vLLM with full batch slots. Clients send requests back to back; rejected clients
+back off briefly and retry. Without a limit every request joins the server queue;
+with one, latency stays near the target and the excess is rejected at once.
+A second run splits the clients between a heavy and a light tenant to show the
+fair queue's share of completions per tenant.
+"""
+import argparse
+import threading
+import time
+from typing import Dict, List, Optional
+
+from core.concurrency_limiter import AdaptiveLimiter, EndpointOverloaded
+from core.deadline import Deadline
+from core.metrics import Metrics
+
+
+class SimulatedEndpoint:
+    """Endpoint with a fixed number of batch slots and an unbounded FIFO queue."""
+
+    def __init__(self, capacity: int, prefill: float, decode: float):
+        """
+        Initialize the endpoint.
+
+        Args:
+            capacity: Sequences processed at once
+            prefill: Seconds to the first token once a sequence has a slot
+            decode: Seconds from the first token to the end of the response
+        """
+        self.slots = threading.Semaphore(capacity)
+        self.prefill = prefill
+        self.decode = decode
+
+    def call(self) -> float:
+        """Run one request; returns its time to first token."""
+        started = time.monotonic()
+        with self.slots:
+            time.sleep(self.prefill)
+            first_token = time.monotonic() - started
+            time.sleep(self.decode)
+        return first_token
+
+
+def run(
+    args: argparse.Namespace,
+    limiter: Optional[AdaptiveLimiter],
+    tenants: Dict[str, int]
+) -> Dict[str, Dict[str, float]]:
+    """Drive the endpoint with the given number of clients per tenant for args.seconds."""
+    endpoint = SimulatedEndpoint(args.capacity, args.prefill, args.decode)
+    latencies: Dict[str, List[float]] = {tenant: [] for tenant in tenants}
+    rejected = {tenant: 0 for tenant in tenants}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.seconds
+    limits: List[int] = []
+
+    def client(tenant: str) -> None:
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            if limiter is not None:
+                try:
+                    limiter.acquire(args.queue_timeout, Deadline(60, tenant=tenant))
+                except EndpointOverloaded:
+                    with lock:
+                        rejected[tenant] += 1
+                    time.sleep(args.retry_after)
+                    continue
+            first_token = endpoint.call()
+            if limiter is not None:
+                limiter.release(first_token)
+            with lock:
+                latencies[tenant].append(time.monotonic() - started)
+
+    def sample_limit() -> None:
+        while time.monotonic() < stop_at:
+            limits.append(limiter.limit)
+            time.sleep(args.seconds / 20)
+
+    threads = [
+        threading.Thread(target=client, args=(tenant,))
+        for tenant, clients in tenants.items()
+        for _ in range(clients)
+    ]
+    if limiter is not None:
+        threads.append(threading.Thread(target=sample_limit))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for tenant, samples in latencies.items():
+        samples.sort()
+        results[tenant] = {
+            "completed": len(samples),
+            "rejected": rejected[tenant],
+            "p50": samples[len(samples) // 2] if samples else 0.0,
+            "p99": samples[int(len(samples) * 0.99)] if samples else 0.0,
+        }
+    results["limits"] = limits
+    return results
+
+
+def _new_limiter(args: argparse.Namespace) -> AdaptiveLimiter:
+    """Limiter with the benchmark's settings."""
+    return AdaptiveLimiter(
+        "bench",
+        initial_limit=args.capacity * 2,
+        queue_size=args.queue_size,
+        latency_target=args.latency_target,
+        metrics=Metrics()
+    )
+
+
+def _print_row(name: str, result: Dict[str, float]) -> None:
+    """Print one result row."""
+    print(f"  {name:<10} {result['completed']:>10} {result['rejected']:>10}"
+          f" {result['p50']:>10.3f} {result['p99']:>10.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--capacity", type=int, default=8, help="Sequences the endpoint runs at once")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    parser.add_argument("--prefill", type=float, default=0.01, help="Seconds to first token with a free slot")
+    parser.add_argument("--decode", type=float, default=0.05, help="Seconds to generate the rest")
+    parser.add_argument("--latency-target", type=float, default=0.03, help="Time-to-first-token target")
+    parser.add_argument("--queue-size", type=int, default=8, help="Limiter wait queue size")
+    parser.add_argument("--queue-timeout", type=float, default=0.2, help="Longest wait in the limiter queue")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Client back-off after a rejection")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, endpoint capacity {args.capacity}, {args.seconds:g}s per run")
+    print(f"  {'limiter':<10} {'completed':>10} {'rejected':>10} {'p50 (s)':>10} {'p99 (s)':>10}")
+    for name in ("none", "adaptive"):
+        limiter = _new_limiter(args) if name == "adaptive" else None
+        result = run(args, limiter, {"all": args.clients})
+        _print_row(name, result["all"])
+        if result["limits"]:
+            print(f"  limit over time: {result['limits']}")
+
+    light = max(1, args.clients // 16)
+    tenants = {"heavy": args.clients - light, "light": light}
+    print(f"\nFair queueing: {tenants['heavy']} heavy-tenant clients, {light} light-tenant clients")
+    print(f"  {'tenant':<10} {'completed':>10} {'rejected':>10} {'p50 (s)':>10} {'p99 (s)':>10}")
+    result = run(args, _new_limiter(args), tenants)
+    for tenant in tenants:
+        _print_row(tenant, result[tenant])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Microbenchmark: single-pass JSON object scanner vs. the previous routing and tool-call extractors.
+
+Run from the backend directory:
+    python -m benchmarks.bench_json_extraction [--repeat N]
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.core_agent import CoreAgent
+from core.router import Router
+
+
+TOOLS = [
+    {"id": 1, "name": "GitHub", "type": "github"},
+    {"id": 2, "name": "Jira", "type": "jira"},
+]
+
+
+# ---------------------------------------------------------------------------
+# Previous implementations, kept verbatim (as standalone functions) for comparison
+# ---------------------------------------------------------------------------
+
+def legacy_extract_json(response: str) -> str:
+    """
+    Extract JSON from response that may contain reasoning text.
+
+    Args:
+        response: Full response text that may contain reasoning + JSON
+
+    Returns:
+        Extracted JSON string
+    """
+    response = response.strip()
+
+    # Remove markdown code blocks if present
+    if response.startswith("```json"):
+        response = response[7:]
+    elif response.startswith("```"):
+        response = response[3:]
+    if response.endswith("```"):
+        response = response[:-3]
+    response = response.strip()
+
+    # Try multiple strategies to find JSON
+
+    # Strategy 0: Multi-model routing or task graph object (contains nested
+    # objects, so the flat patterns below would only find one of them)
+    routes_idx = response.find('"tasks"')
+    if routes_idx == -1:
+        routes_idx = response.find('"routes"')
+    if routes_idx != -1:
+        start_idx = response.rfind('{', 0, routes_idx)
+        if start_idx != -1:
+            brace_count = 0
+            in_string = False
+            escape_next = False
+            for i in range(start_idx, len(response)):
+                char = response[i]
+                if escape_next:
+                    escape_next = False
+                    continue
+                if char == '\\':
+                    escape_next = True
+                    continue
+                if char == '"':
+                    in_string = not in_string
+                    continue
+                if in_string:
+                    continue
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0:
+                        json_text = response[start_idx:i + 1]
+                        try:
+                            json.loads(json_text)
+                            return json_text.strip()
+                        except:
+                            pass
+                        break
+
+    # Strategy 1: Look for JSON object pattern with model_id
+    import re
+    json_pattern = r'\{[^{}]*"model_id"[^{}]*\}'
+    matches = re.findall(json_pattern, response, re.DOTALL)
+    if matches:
+        # Try to find the most complete match (longest)
+        for match in sorted(matches, key=len, reverse=True):
+            try:
+                json.loads(match)
+                return match
+            except:
+                continue
+
+    # Strategy 2: Find the last complete JSON object
+    start_idx = response.rfind('{')
+    if start_idx != -1:
+        # Find matching closing brace
+        brace_count = 0
+        end_idx = start_idx
+        for i in range(start_idx, len(response)):
+            if response[i] == '{':
+                brace_count += 1
+            elif response[i] == '}':
+                brace_count -= 1
+                if brace_count == 0:
+                    end_idx = i + 1
+                    json_text = response[start_idx:end_idx]
+                    try:
+                        json.loads(json_text)
+                        return json_text.strip()
+                    except:
+                        continue
+
+        # If we found opening brace but no closing, try to find it backwards
+        # Sometimes the JSON might be incomplete, try to find the last }
+        last_closing = response.rfind('}')
+        if last_closing > start_idx:
+            json_text = response[start_idx:last_closing + 1]
+            try:
+                json.loads(json_text)
+                return json_text.strip()
+            except:
+                pass
+
+    # Strategy 3: Look for JSON after common markers
+    markers = ['</think>', '</reasoning>', '```json', '```', 'JSON:', 'Response:']
+    for marker in markers:
+        idx = response.find(marker)
+        if idx != -1:
+            after_marker = response[idx + len(marker):].strip()
+            # Try to find JSON in the part after marker
+            json_start = after_marker.find('{')
+            if json_start != -1:
+                json_candidate = after_marker[json_start:]
+                # Try to extract complete JSON
+                brace_count = 0
+                end_idx = 0
+                for i, char in enumerate(json_candidate):
+                    if char == '{':
+                        brace_count += 1
+                    elif char == '}':
+                        brace_count -= 1
+                        if brace_count == 0:
+                            end_idx = i + 1
+                            try:
+                                json_text = json_candidate[:end_idx]
+                                json.loads(json_text)
+                                return json_text.strip()
+                            except:
+                                continue
+
+    # Fallback: return the whole response and let the caller handle the error
+    return response
+
+
+def legacy_parse_tool_calls(response: str, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Parse every tool call request from sub-agent response.
+    Looks for MCP tool call format in the response.
+
+    Args:
+        response: Sub-agent response text
+
+    Returns:
+        List of tool call dicts in the order they appear (duplicates removed)
+    """
+    # Try to find JSON tool calls in response
+    # Pattern 1: {"tool_id": 1, "action": "...", ...}
+    # Pattern 2: {"tool_call": {"name": "...", "arguments": {...}}}
+    found = []
+
+    # Look for JSON objects with tool_id
+    json_pattern = r'\{[^{}]*"tool_id"[^{}]*\}'
+    for match in re.finditer(json_pattern, response, re.DOTALL):
+        try:
+            tool_call = json.loads(match.group())
+            if "tool_id" in tool_call:
+                found.append((match.start(), tool_call))
+        except:
+            continue
+
+    # Look for tool_call format: {"tool_call": {"name": "...", "arguments": {...}}}
+    # Use a more robust approach to find nested JSON
+    # Try to find each complete JSON object by counting braces
+    start_idx = response.find('{"tool_call"')
+    while start_idx != -1:
+        brace_count = 0
+        end_idx = start_idx
+        in_string = False
+        escape_next = False
+
+        for i in range(start_idx, len(response)):
+            char = response[i]
+
+            if escape_next:
+                escape_next = False
+                continue
+
+            if char == '\\':
+                escape_next = True
+                continue
+
+            if char == '"' and not escape_next:
+                in_string = not in_string
+                continue
+
+            if not in_string:
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0:
+                        end_idx = i + 1
+                        break
+
+        if brace_count == 0 and end_idx > start_idx:
+            try:
+                parsed = json.loads(response[start_idx:end_idx])
+                tool_call = _legacy_tool_call_from_named_call(parsed.get("tool_call", {}), tools)
+                if tool_call:
+                    found.append((start_idx, tool_call))
+            except:
+                pass
+
+        start_idx = response.find('{"tool_call"', max(end_idx, start_idx + 1))
+
+    # Order by position and drop repeated identical calls
+    tool_calls = []
+    for _, tool_call in sorted(found, key=lambda item: item[0]):
+        if tool_call not in tool_calls:
+            tool_calls.append(tool_call)
+    return tool_calls
+
+
+def _legacy_tool_call_from_named_call(tool_call_data: Dict[str, Any], tools: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Convert a {"name": ..., "arguments": {...}} tool call to the tool_id format.
+
+    Args:
+        tool_call_data: Named tool call
+
+    Returns:
+        Tool call dict with tool_id, or None if no tool has that name
+    """
+    tool_name = tool_call_data.get("name", "")
+    arguments = tool_call_data.get("arguments", {})
+
+    # Find tool_id by matching tool name
+    tool_id = None
+    for tool in tools:
+        if tool.get("name", "").lower() == tool_name.lower():
+            tool_id = tool.get("id")
+            break
+
+    if not tool_id:
+        return None
+
+    # Merge tool_id with arguments
+    result = {"tool_id": tool_id}
+    result.update(arguments)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+def _reasoning(size: int) -> str:
+    """Prose of roughly `size` characters with stray braces and quotes, like model reasoning."""
+    sentence = 'The user asks about "quarterly numbers"; a dict like {a: b} is not JSON, and x = {y} neither. '
+    return sentence * (size // len(sentence) + 1)
+
+
+def build_routing_workloads() -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """Core agent responses (reasoning, then the routing object) and the expected routing object."""
+    routing = {"model_id": 2, "prompt": "Summarize {the} \"report\""}
+    fanout = {"routes": [{"model_id": i, "prompt": f"Part {i}: explain {{x}}"} for i in range(1, 4)]}
+    drafts = [{"model_id": i, "prompt": f"draft {i}"} for i in range(2_000)]
+    text = json.dumps(routing)
+    return {
+        "small": (f"<think>Pick a model.</think>\n{text}", routing),
+        "reasoning_100kb": (f"<think>{_reasoning(100_000)}</think>\n{text}", routing),
+        "reasoning_1mb": (f"<think>{_reasoning(1_000_000)}</think>\n{text}", routing),
+        "fanout_nested": (f"<think>{_reasoning(50_000)}</think>\n```json\n{json.dumps(fanout)}\n```", fanout),
+        "unbalanced_open_braces": ("{" * 20_000 + text, routing),
+        "many_quotes": ('"' * 50_001 + text, routing),
+        "unclosed_model_id_keys": ("{" + '"model_id" ' * 2_000 + "\n" + text, routing),
+        "many_drafts": ("\n".join(json.dumps(draft) for draft in drafts), drafts[-1]),
+    }
+
+
+def build_tool_call_workloads() -> Dict[str, Tuple[str, List[Dict[str, Any]]]]:
+    """Sub-agent responses containing tool calls, and the expected tool calls."""
+    flat_call = {"tool_id": 1, "action": "get_file_contents", "owner": "o", "repo": "r", "path": "a.py"}
+    named_call = {"tool_call": {"name": "Jira", "arguments": {
+        "action": "create_issue", "fields": {"summary": "Fix {bug}", "labels": ["a", "b"]}
+    }}}
+    named_as_flat = {"tool_id": 2, **named_call["tool_call"]["arguments"]}
+    escaped_call = {"tool_id": 1, "action": "x", "body": '\\"{}' * 20_000}
+    mixed = [dict(flat_call, path=f"f{i}.py") if i % 2 else
+             {"tool_call": {"name": "Jira", "arguments": {"action": "create_issue", "summary": f"Fix {i} {{x}}"}}}
+             for i in range(500)]
+    mixed_expected = [call if "tool_id" in call else {"tool_id": 2, **call["tool_call"]["arguments"]} for call in mixed]
+    return {
+        "single_call": (f"I will read the file.\n{json.dumps(flat_call)}", [flat_call]),
+        "reasoning_1mb": (f"{_reasoning(1_000_000)}\n{json.dumps(flat_call)}", [flat_call]),
+        "nested_named_calls_x200": (
+            "\n".join(f"Step {i}: {json.dumps(named_call)}" for i in range(200)), [named_as_flat]
+        ),
+        "mixed_calls_x500": ("\n".join(json.dumps(call) for call in mixed), mixed_expected),
+        "unbalanced_open_braces": ("{" * 20_000 + json.dumps(flat_call), [flat_call]),
+        "unclosed_tool_call_prefixes": ('{"tool_call" ' * 2_000 + json.dumps(flat_call), [flat_call]),
+        "escaped_strings": (json.dumps(escaped_call), [escaped_call]),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _time(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _report(name: str, size: int, legacy_ms: float, new_ms: float, legacy_ok: bool, new_ok: bool) -> None:
+    """Print one result row."""
+    speedup = legacy_ms / new_ms if new_ms else float("inf")
+    correct = f"{'yes' if legacy_ok else 'NO':>6} {'yes' if new_ok else 'NO':>7}"
+    print(f"  {name:<28} {size:>10,} {legacy_ms:>10.2f} {new_ms:>10.2f} {speedup:>8.1f}x {correct}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    agent = CoreAgent(models=[], knowledge_bases=[], tools=TOOLS)
+    router = Router(models=[], knowledge_bases=[], tools=TOOLS)
+    header = (f"  {'workload':<28} {'chars':>10} {'legacy ms':>10} {'new ms':>10} {'speedup':>9}"
+              f" {'legacy':>6} {'scanner':>7}")
+
+    print("Routing object extraction (CoreAgent), correct = expected routing object found")
+    print(header)
+    for name, (text, expected) in build_routing_workloads().items():
+        legacy_ms = _time(lambda: legacy_extract_json(text), args.repeat)
+        new_ms = _time(lambda: agent._extract_routing_object(text), args.repeat)
+        try:
+            legacy_ok = json.loads(legacy_extract_json(text)) == expected
+        except ValueError:
+            legacy_ok = False
+        _report(name, len(text), legacy_ms, new_ms, legacy_ok, agent._extract_routing_object(text) == expected)
+
+    print("\nTool call parsing (Router), correct = exactly the expected tool calls found")
+    print(header)
+    for name, (text, expected) in build_tool_call_workloads().items():
+        legacy_ms = _time(lambda: legacy_parse_tool_calls(text, TOOLS), args.repeat)
+        new_ms = _time(lambda: router._parse_tool_calls_from_response(text), args.repeat)
+        legacy_ok = legacy_parse_tool_calls(text, TOOLS) == expected
+        _report(name, len(text), legacy_ms, new_ms, legacy_ok, router._parse_tool_calls_from_response(text) == expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark: precompiled single-pass response cleaner vs. the previous regex cleaner.
+
+Run from the backend directory:
+    python -m benchmarks.bench_response_cleaner [--repeat N] [--legacy-max-chars N]
+
+The previous cleaner is quadratic on text missing any of the reasoning markers it
+strips, so it is only timed up to --legacy-max-chars; the scaling table shows the trend.
+"""
+import argparse
+import re
+import time
+from typing import Any, Callable, Dict
+
+from core.response_cleaner import StreamingCleaner, clean_response
+
+
+# ---------------------------------------------------------------------------
+# Previous implementation (CoreAgent._clean_response_simple), kept verbatim for comparison
+# ---------------------------------------------------------------------------
+
+def legacy_clean_response(response: str) -> str:
+    """
+    Simple cleanup: remove reasoning blocks and verbose text using regex.
+    Used as fallback when LLM-based refinement fails.
+
+    Args:
+        response: Raw response text
+
+    Returns:
+        Cleaned response text
+    """
+    # Remove reasoning blocks (common patterns)
+    # Remove everything up to and including reasoning markers
+    # Handle patterns like: </think>, </reasoning>, with or without backticks or newlines
+    reasoning_markers = [
+        r'.*?</think>\s*',
+        r'.*?</reasoning>\s*',
+        r'.*?`</think>`\s*',
+        r'.*?`</reasoning>`\s*',
+    ]
+    for marker in reasoning_markers:
+        response = re.sub(marker, '', response, flags=re.DOTALL | re.IGNORECASE)
+
+    # Remove common reasoning patterns at start of paragraphs
+    reasoning_patterns = [
+        r'^(Let me think|Okay, let me|First, I need|Wait,|But wait,|However,|Maybe I should).*?(?=\n\n|\Z)',
+        r'^(I need to|I should|Let me check|Let me start).*?(?=\n\n|\Z)',
+    ]
+
+    for pattern in reasoning_patterns:
+        response = re.sub(pattern, '', response, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
+
+    # Split into paragraphs and filter out reasoning-heavy ones
+    paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
+    clean_paragraphs = []
+
+    reasoning_indicators = ['let me', 'i need to', 'first', 'wait', 'but wait', 'however', 'maybe',
+                           'i should', 'let me check', 'okay,', 'so,', 'hmm,', 'well,',
+                           'no tool was required', 'i used tool', 'the tool', 'internal']
+
+    for para in paragraphs:
+        para_lower = para.lower()
+        # Skip if it's a reasoning paragraph (starts with reasoning indicators and is short)
+        if any(para_lower.startswith(indicator) for indicator in reasoning_indicators) and len(para) < 300:
+            continue
+        # Skip if it contains tool call JSON
+        if 'tool_id' in para or '"tool_call"' in para or 'tool execution' in para_lower:
+            continue
+        clean_paragraphs.append(para)
+
+    if clean_paragraphs:
+        cleaned = '\n\n'.join(clean_paragraphs)
+    else:
+        # If we filtered everything out, keep the original but remove obvious reasoning
+        cleaned = response
+
+    # Remove standalone reasoning sentences
+    lines = cleaned.split('\n')
+    clean_lines = []
+    for line in lines:
+        line_lower = line.strip().lower()
+        if any(line_lower.startswith(indicator) for indicator in reasoning_indicators) and len(line) < 200:
+            continue
+        clean_lines.append(line)
+
+    cleaned = '\n'.join(clean_lines)
+
+    # Remove excessive whitespace
+    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    cleaned = re.sub(r' {2,}', ' ', cleaned)
+
+    return cleaned.strip()
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+_ANSWER_PARAGRAPH = (
+    "The quarterly revenue grew by 12% compared to the previous quarter, driven mostly by "
+    "the new subscription tier. Churn stayed flat at 3.1%, and support volume dropped.\n"
+    "Key drivers:\n- Pricing change in March\n- Two enterprise renewals\n\n"
+)
+_REASONING_PARAGRAPH = (
+    "Let me think about which numbers matter here. The user asked about revenue, so I "
+    "should look at the totals first.\nWait, the table has two currencies.\n\n"
+)
+
+
+def _repeat_to(text: str, size: int) -> str:
+    """Repeat a text to roughly `size` characters."""
+    return text * (size // len(text) + 1)
+
+
+def build_workloads(size: int) -> Dict[str, str]:
+    """Responses of roughly `size` characters."""
+    return {
+        "think_then_answer": f"<think>{_repeat_to(_REASONING_PARAGRAPH, size // 2)}</think>\n\n"
+                             + _repeat_to(_ANSWER_PARAGRAPH, size // 2),
+        "no_marker_answer": _repeat_to(_ANSWER_PARAGRAPH, size),
+        "no_marker_reasoning": _repeat_to(_REASONING_PARAGRAPH + _ANSWER_PARAGRAPH, size),
+        "single_line": _repeat_to("word ", size),
+        "paragraph_breaks_only": "\n\n" * (size // 2),
+        "many_markers": _repeat_to("step </think> ", size),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _time(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _stream_clean(text: str, chunk_chars: int = 16) -> str:
+    """Clean a text fed in small chunks, as a streamed response would be."""
+    cleaner = StreamingCleaner()
+    for start in range(0, len(text), chunk_chars):
+        cleaner.feed(text[start:start + chunk_chars])
+    return cleaner.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--legacy-max-chars", type=int, default=25_000,
+                        help="Largest input the previous cleaner is timed on")
+    args = parser.parse_args()
+
+    print("Scaling on marker-free text (ms)")
+    print(f"  {'chars':>10} {'legacy':>10} {'new':>10} {'streamed':>10}")
+    for size in (2_500, 5_000, 10_000, 20_000, 100_000, 1_000_000):
+        text = _repeat_to(_ANSWER_PARAGRAPH, size)
+        legacy = f"{'skipped':>10}"
+        if size <= args.legacy_max_chars:
+            legacy = f"{_time(lambda: legacy_clean_response(text), 1):10.2f}"
+        print(f"  {len(text):>10,} {legacy} {_time(lambda: clean_response(text), args.repeat):10.2f}"
+              f" {_time(lambda: _stream_clean(text), args.repeat):10.2f}")
+
+    for size in (10_000, 1_000_000):
+        print(f"\nWorkloads of ~{size:,} characters (ms); same = identical output")
+        print(f"  {'workload':<24} {'legacy':>10} {'new':>10} {'streamed':>10}  same")
+        for name, text in build_workloads(size).items():
+            expected = None
+            legacy = f"{'skipped':>10}"
+            # The previous cleaner is quadratic unless every marker it strips is present
+            if len(text) <= args.legacy_max_chars:
+                legacy = f"{_time(lambda: legacy_clean_response(text), 1):10.2f}"
+                expected = legacy_clean_response(text)
+            new_ms = _time(lambda: clean_response(text), args.repeat)
+            streamed_ms = _time(lambda: _stream_clean(text), args.repeat)
+            if expected is None:
+                same = "-"
+            else:
+                same = "yes" if clean_response(text) == expected == _stream_clean(text) else "NO"
+            print(f"  {name:<24} {legacy} {new_ms:10.2f} {streamed_ms:10.2f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
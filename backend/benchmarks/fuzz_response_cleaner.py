@@ -0,0 +1,67 @@
+"""
+Differential fuzz: the response cleaner must match the previous regex cleaner exactly,
+both on whole texts and when the same text is fed in random chunks.
+
+Run from the backend directory:
+    python -m benchmarks.fuzz_response_cleaner [--cases N] [--seed N]
+"""
+import argparse
+import random
+import sys
+
+from benchmarks.bench_response_cleaner import legacy_clean_response
+from core.response_cleaner import StreamingCleaner, clean_response
+
+
+# Fragments that exercise every rule: markers (split, cased, in backticks), reasoning
+# phrases and indicators, tool text, whitespace runs, long lines for the length limits,
+# and characters whose case mapping is unusual (Kelvin sign, long s, dotted I)
+FRAGMENTS = [
+    "</think>", "</THINK>", "</Reasoning>", "</reasoning>", "`</think>`", "`</reasoning>`",
+    "</thi", "nk>", "<think>", "\n", "\n", "\n\n", "\n\n\n", " ", "  ", "   ", "\t", "\r", " ",
+    "Wait, ", "wait", "But wait, ", "Let me think", "LET ME CHECK", "Let me start", "However, ",
+    "I should ", "I need to ", "First, I need", "first ", "okay, ", "Okay, let me", "So, ", "hmm, ",
+    "well, ", "Maybe I should ", "internal ", "the tool ", "no tool was required", "I used tool",
+    "tool_id", '"tool_call"', "Tool Execution", "answer ", "The result is 42. ",
+    "x" * 60, "y" * 150, "z" * 250, "K", "ſ", "İ",
+]
+
+
+def random_response(rng: random.Random) -> str:
+    """Build a random response from the fragments."""
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 60)))
+
+
+def stream_clean(text: str, rng: random.Random) -> str:
+    """Clean a text fed in random chunks."""
+    cleaner = StreamingCleaner()
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 24)
+        cleaner.feed(text[pos:pos + size])
+        pos += size
+    return cleaner.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20_000, help="Number of random responses")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for case in range(args.cases):
+        text = random_response(rng)
+        expected = legacy_clean_response(text)
+        for mode, actual in (("whole", clean_response(text)), ("streamed", stream_clean(text, rng))):
+            if actual != expected:
+                print(f"Mismatch in case {case} ({mode}):")
+                print(f"  input:    {text!r}")
+                print(f"  expected: {expected!r}")
+                print(f"  actual:   {actual!r}")
+                sys.exit(1)
+    print(f"{args.cases} cases passed (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
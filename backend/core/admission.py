@@ -0,0 +1,91 @@
+"""
+Admission control: token-bucket rate limits per system and per owning user.
+"""
+import threading
+import time
+from typing import Dict, Any, Optional
+from .config import SYSTEM_RATE_PER_SECOND, SYSTEM_RATE_BURST
+
+
+class RateLimited(RuntimeError):
+    """Raised when a query is over its system's or user's rate limit."""
+
+    def __init__(self, message: str, retry_after: float):
+        """
+        Initialize the error.
+
+        Args:
+            message: Error message
+            retry_after: Seconds until the query would be admitted
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, up to burst tokens saved."""
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket size
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        Take one token if there is one.
+
+        Returns:
+            0 if a token was taken, else seconds until one is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def refund(self) -> None:
+        """Give back a token taken for a query that was not admitted after all."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class AdmissionPolicy:
+    """Per-system rate limit and fair-queueing weight."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the admission policy.
+
+        Args:
+            config: Optional policy configuration:
+                - rate_per_second: Queries admitted per second
+                  (default: SYSTEM_RATE_PER_SECOND; 0 disables the limit)
+                - burst: Queries admitted at once after an idle period (default: SYSTEM_RATE_BURST)
+                - weight: Share of LLM endpoint capacity relative to other tenants (default: 1)
+
+        Raises:
+            ValueError: If a setting is invalid
+        """
+        config = config or {}
+        self.rate_per_second = float(config.get('rate_per_second', SYSTEM_RATE_PER_SECOND))
+        self.burst = float(config.get('burst', SYSTEM_RATE_BURST))
+        self.weight = float(config.get('weight', 1))
+        if self.rate_per_second < 0:
+            raise ValueError("admission.rate_per_second must not be negative")
+        if self.rate_per_second > 0 and self.burst < 1:
+            raise ValueError("admission.burst must be at least 1")
+        if self.weight <= 0:
+            raise ValueError("admission.weight must be positive")
+        self.bucket = TokenBucket(self.rate_per_second, self.burst) if self.rate_per_second > 0 else None
@@ -1,10 +1,18 @@
 """
 Systems API router for multi-agent system endpoints.
 """
-from fastapi import APIRouter, HTTPException
+import asyncio
+import math
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..system_manager import SystemManager
+from ..config import DISCONNECT_POLL_SECONDS
+from ..admission import RateLimited
+from ..concurrency_limiter import EndpointOverloaded
+from ..deadline import DeadlineExceeded
+from ..degradation import degradation_controller, LEVEL_NAMES
+from ..metrics import global_metrics
 
 router = APIRouter(prefix="/api/systems", tags=["systems"])
 
@@ -18,6 +26,9 @@ class SystemConfig(BaseModel):
     models: list[Dict[str, Any]]
     knowledge_bases: list[Dict[str, Any]]
     tools: list[Dict[str, Any]]
+    refinement: Optional[Dict[str, Any]] = None
+    deadline_seconds: Optional[float] = None
+    admission: Optional[Dict[str, Any]] = None
 
 
 class SystemCreateResponse(BaseModel):
@@ -34,6 +45,8 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     """Response model for chat endpoint."""
     response: str
+    degradation_level: int = 0  # Load-shedding level applied (0 = normal, see core/degradation.py)
+    degradation: str = LEVEL_NAMES[0]
 
 
 @router.post("/create", response_model=SystemCreateResponse)
@@ -63,22 +76,88 @@ async def create_system(config: SystemConfig):
 
 
 @router.post("/{system_id}/chat", response_model=ChatResponse)
-async def chat_with_system(system_id: str, request: ChatRequest):
+async def chat_with_system(system_id: str, request: ChatRequest, http_request: Request):
     """
     Process a query through a multi-agent system.
+    The query runs in a worker thread; if the client disconnects first, it is
+    cancelled so no more GPU time is spent on it.
     
     Args:
         system_id: System ID
         request: Chat request with query
+        http_request: Raw HTTP request, polled for client disconnects (an optional
+            Idempotency-Key header identifies retries of the same query)
     
     Returns:
-        Response from the multi-agent system
+        Response from the multi-agent system and the degradation level it was produced at
     """
     try:
-        response = system_manager.process_query(system_id, request.query)
-        return {"response": response}
+        # Rate limits are checked and the time budget starts when the request arrives;
+        # retries that send the same Idempotency-Key do not repeat side-effecting tool calls
+        deadline = system_manager.admit_query(system_id, http_request.headers.get("Idempotency-Key"))
+        level = degradation_controller.level()
+        query_task = asyncio.ensure_future(
+            asyncio.to_thread(system_manager.process_query, system_id, request.query, deadline, level)
+        )
+        while True:
+            done, _ = await asyncio.wait({query_task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                break
+            if await http_request.is_disconnected():
+                print(f"DEBUG: Client disconnected, cancelling query to system {system_id}")
+                system_manager.cancel_query(system_id, deadline)
+                # The worker thread ends with RequestCancelled; nobody waits for it
+                query_task.add_done_callback(lambda task: task.exception())
+                # Nobody reads this; 499 is the conventional "client closed request" status
+                raise HTTPException(status_code=499, detail="Client disconnected")
+        response = query_task.result()
+        return {"response": response, "degradation_level": level, "degradation": LEVEL_NAMES[level]}
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except EndpointOverloaded as e:
+        # Retryable: the LLM endpoints are at their concurrency limit
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process query: {str(e)}")
 
+
+@router.get("/metrics")
+async def get_global_metrics():
+    """
+    Get process-wide metrics shared by all systems (e.g., LLM endpoint concurrency limits).
+    
+    Returns:
+        Counters, gauges, and observations
+    """
+    return global_metrics.snapshot()
+
+
+@router.get("/{system_id}/metrics")
+async def get_system_metrics(system_id: str):
+    """
+    Get metrics recorded for a multi-agent system.
+    
+    Args:
+        system_id: System ID
+    
+    Returns:
+        Counters, gauges, and observations for the system
+    """
+    try:
+        return system_manager.get_metrics(system_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
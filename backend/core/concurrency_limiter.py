@@ -0,0 +1,289 @@
+"""
+Adaptive concurrency limits for LLM endpoints.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from .config import (
+    LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MIN, LLM_CONCURRENCY_MAX,
+    LLM_QUEUE_SIZE, LLM_LATENCY_TARGET_SECONDS, LLM_LIMIT_BACKOFF,
+)
+from .deadline import Deadline
+from .metrics import Metrics, global_metrics
+
+# Averaging time (in seconds) of the time-to-first-token estimate used as the load signal
+_LATENCY_DECAY_SECONDS = 10.0
+
+
+class EndpointOverloaded(RuntimeError):
+    """Raised when an endpoint's wait queue is full or a queued call waited too long."""
+
+    def __init__(self, message: str, retry_after: float):
+        """
+        Initialize the error.
+
+        Args:
+            message: Error message
+            retry_after: Suggested seconds before retrying
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit with a bounded wait queue in front of it.
+
+    Calls that complete with a time to first token under the latency target raise
+    the limit by about one per limit's worth of calls (additive increase); a slow
+    first token, an overload response, or a timeout cuts it by the backoff factor
+    (multiplicative decrease), at most once per latency target. Calls over the
+    limit wait in a queue of queue_size; when that is full they are rejected at
+    once so callers can retry instead of piling up behind a saturated server.
+
+    The queue is weighted-fair across tenants (start-time fair queueing): each
+    waiting call is tagged with its tenant's virtual start time, which advances by
+    1/weight per call, and the lowest tag gets the next free slot. When the queue
+    is full, a call that would be served before the last queued call takes its
+    place instead of being rejected. A tenant with many queued calls therefore
+    cannot starve one with a few.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = LLM_CONCURRENCY_INITIAL,
+        min_limit: float = LLM_CONCURRENCY_MIN,
+        max_limit: float = LLM_CONCURRENCY_MAX,
+        queue_size: int = LLM_QUEUE_SIZE,
+        latency_target: float = LLM_LATENCY_TARGET_SECONDS,
+        backoff: float = LLM_LIMIT_BACKOFF,
+        metrics: Metrics = global_metrics
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Endpoint name, used in metric names
+            initial_limit: Starting concurrency limit
+            min_limit: Lowest limit
+            max_limit: Highest limit
+            queue_size: Most calls that may wait for a slot
+            latency_target: Time to first token above which the endpoint counts as saturated
+            backoff: Factor the limit is multiplied by on saturation
+            metrics: Metrics that receive the limit, in-flight, and queue gauges
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.metrics = metrics
+        self._limit = float(max(min_limit, min(max_limit, initial_limit)))
+        self._inflight = 0
+        self._last_decrease = 0.0
+        self._latency_average = 0.0
+        self._latency_updated = time.monotonic()
+        self._cond = threading.Condition()
+        # Waiting calls as a heap of [start tag, sequence number, evicted]; the list
+        # object identifies the waiter
+        self._queue: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._tenant_finish: Dict[Optional[str], float] = {}
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit."""
+        return max(1, int(self._limit))
+
+    def load(self) -> float:
+        """
+        Current load: the larger of the queue's fill ratio and the recent time to
+        first token relative to the latency target (1.0 = full queue or at target).
+        The latency part fades when no calls complete, so an idle endpoint reads as unloaded.
+        """
+        with self._cond:
+            idle = time.monotonic() - self._latency_updated
+            latency = self._latency_average * math.exp(-idle / _LATENCY_DECAY_SECONDS)
+            return max(len(self._queue) / max(1, self.queue_size), latency / self.latency_target)
+
+    def acquire(self, timeout: float, deadline: Optional[Deadline] = None) -> float:
+        """
+        Take a slot, waiting in the queue if the endpoint is at its limit.
+
+        Args:
+            timeout: Longest time to wait in the queue
+            deadline: Optional request deadline; its tenant and weight set the call's
+                place in the fair queue, and cancelling it stops the wait
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            EndpointOverloaded: If the queue is full or the wait timed out
+            DeadlineExceeded: If the deadline expires or is cancelled while waiting
+        """
+        with self._cond:
+            if not self._queue and self._inflight < self.limit:
+                self._inflight += 1
+                self._publish()
+                return 0.0
+            if len(self._queue) >= self.queue_size:
+                # Make room by dropping the queued call that would be served last,
+                # unless this call would be served after it anyway
+                last = max(self._queue)
+                if self._start_tag(deadline) >= last[0]:
+                    self.metrics.incr(f"llm.rejected.{self.name}")
+                    raise self._overloaded()
+                last[2] = True
+                self._dequeue(last)
+            waiter = self._enqueue(deadline)
+
+        started = time.monotonic()
+        unregister = deadline.on_cancel(self._wake) if deadline is not None else None
+        try:
+            with self._cond:
+                wait_until = started + timeout
+                while not (self._queue and self._queue[0] is waiter and self._inflight < self.limit):
+                    if waiter[2]:
+                        self.metrics.incr(f"llm.rejected.{self.name}")
+                        raise self._overloaded()
+                    if deadline is not None and deadline.expired():
+                        self._dequeue(waiter)
+                        raise deadline.exceeded(f"waiting for LLM endpoint {self.name}")
+                    remaining = wait_until - time.monotonic()
+                    if remaining <= 0:
+                        self._dequeue(waiter)
+                        self.metrics.incr(f"llm.rejected.{self.name}")
+                        raise EndpointOverloaded(
+                            f"Timed out after {timeout:g}s waiting for LLM endpoint {self.name}",
+                            retry_after=self.latency_target
+                        )
+                    self._cond.wait(remaining)
+                self._dequeue(waiter)
+                self._virtual_time = waiter[0]
+                self._inflight += 1
+                self._publish()
+        finally:
+            if unregister is not None:
+                unregister()
+        waited = time.monotonic() - started
+        self.metrics.observe(f"llm.queue_wait.{self.name}", waited)
+        return waited
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        Return a slot and adjust the limit from the call's outcome.
+
+        Args:
+            latency: Time to first token in seconds, or None if not measured
+            overloaded: True if the call failed with an overload response or a timeout
+        """
+        with self._cond:
+            was_saturated = self._inflight >= self._limit / 2
+            self._inflight -= 1
+            now = time.monotonic()
+            if latency is not None:
+                # Time-weighted moving average of the time to first token
+                decay = math.exp(-(now - self._latency_updated) / _LATENCY_DECAY_SECONDS)
+                weight = min(decay, 0.8)
+                self._latency_average = weight * self._latency_average + (1 - weight) * latency
+                self._latency_updated = now
+            if overloaded or (latency is not None and latency > self.latency_target):
+                if now - self._last_decrease >= self.latency_target:
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._last_decrease = now
+            elif was_saturated:
+                # Only grow while the limit is actually in use
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._publish()
+            self._cond.notify_all()
+
+    def _overloaded(self) -> EndpointOverloaded:
+        """Error for a call rejected because the queue is full (called with the lock held)."""
+        return EndpointOverloaded(
+            f"LLM endpoint {self.name} is overloaded ({self._inflight} in flight, {len(self._queue)} queued)",
+            retry_after=self.latency_target
+        )
+
+    def _start_tag(self, deadline: Optional[Deadline]) -> float:
+        """Virtual start time the next call of a deadline's tenant would get (lock held)."""
+        tenant = deadline.tenant if deadline is not None else None
+        return max(self._virtual_time, self._tenant_finish.get(tenant, 0.0))
+
+    def _enqueue(self, deadline: Optional[Deadline]) -> List[Any]:
+        """Queue a call under its tenant's next start tag (called with the lock held)."""
+        tenant = deadline.tenant if deadline is not None else None
+        weight = deadline.weight if deadline is not None else 1.0
+        start_tag = self._start_tag(deadline)
+        self._tenant_finish[tenant] = start_tag + 1.0 / weight
+        if len(self._tenant_finish) > 4 * self.queue_size:
+            # Tenants that are not ahead of virtual time would restart from it anyway
+            self._tenant_finish = {
+                name: finish for name, finish in self._tenant_finish.items() if finish > self._virtual_time
+            }
+        waiter = [start_tag, next(self._sequence), False]
+        heapq.heappush(self._queue, waiter)
+        self._publish()
+        return waiter
+
+    def _dequeue(self, waiter: List[Any]) -> None:
+        """Remove a call from the queue and let the next one check for a slot (lock held)."""
+        if self._queue[0] is waiter:
+            heapq.heappop(self._queue)
+        else:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+        self._publish()
+        self._cond.notify_all()
+
+    def _wake(self) -> None:
+        """Wake queued callers so they can notice a cancelled deadline."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _publish(self) -> None:
+        """Update the gauges (called with the lock held)."""
+        self.metrics.set_gauge(f"llm.limit.{self.name}", self.limit)
+        self.metrics.set_gauge(f"llm.inflight.{self.name}", self._inflight)
+        self.metrics.set_gauge(f"llm.queued.{self.name}", len(self._queue))
+
+
+# One limiter per endpoint URL, shared by every system in the process
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(base_url: str) -> AdaptiveLimiter:
+    """
+    Get the limiter for an endpoint, creating it on first use.
+
+    Args:
+        base_url: Endpoint base URL
+
+    Returns:
+        Limiter shared by all calls to that endpoint
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(base_url)
+        if limiter is None:
+            limiter = _limiters[base_url] = AdaptiveLimiter(base_url)
+        return limiter
+
+
+def endpoint_load() -> float:
+    """
+    Highest load across all LLM endpoints (see AdaptiveLimiter.load()).
+
+    Returns:
+        Load, 0 if no endpoint has been called yet
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return max((limiter.load() for limiter in limiters), default=0.0)
@@ -46,6 +46,123 @@ DEFAULT_MAX_TOKENS = int(os.getenv("DEFAULT_MAX_TOKENS", "256"))
 # Maximum response length (in characters) for refined responses
 MAX_RESPONSE_LENGTH = int(os.getenv("MAX_RESPONSE_LENGTH", "2000"))
 
+# Multi-model fan-out: maximum number of parallel sub-agents per query,
+# and how long (in seconds) to wait for them before dropping slow branches
+MAX_FANOUT_BRANCHES = int(os.getenv("MAX_FANOUT_BRANCHES", "3"))
+BRANCH_TIMEOUT_SECONDS = float(os.getenv("BRANCH_TIMEOUT_SECONDS", "60"))
+
+# Query decomposition: maximum number of subtasks in a task graph, how many
+# run at once, and the time budget (in seconds) for the whole graph
+MAX_GRAPH_TASKS = int(os.getenv("MAX_GRAPH_TASKS", "6"))
+TASK_GRAPH_MAX_CONCURRENCY = int(os.getenv("TASK_GRAPH_MAX_CONCURRENCY", "4"))
+TASK_GRAPH_DEADLINE_SECONDS = float(os.getenv("TASK_GRAPH_DEADLINE_SECONDS", "120"))
+
+# Token budgets: model context window, optional local tokenizer.json file
+# (token counts are estimated without it), sub-agent generation length, and
+# the share of the context window kept free for tool-loop history
+MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "32768"))
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")
+SUB_AGENT_MAX_TOKENS = int(os.getenv("SUB_AGENT_MAX_TOKENS", "2048"))
+HISTORY_RESERVE_FRACTION = float(os.getenv("HISTORY_RESERVE_FRACTION", "0.25"))
+
+# Character budget for a single tool result fed back to a sub-agent
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "12000"))
+
+# Maximum number of concurrent calls to the same tool
+TOOL_CONCURRENCY_PER_TOOL = int(os.getenv("TOOL_CONCURRENCY_PER_TOOL", "2"))
+
+# Side-effecting tool calls (e.g., creating a Jira issue) repeated within the same
+# request are answered from the first call's result: seconds a result is kept, and
+# most results kept
+TOOL_IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv("TOOL_IDEMPOTENCY_WINDOW_SECONDS", "600"))
+TOOL_IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("TOOL_IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+# Tool HTTP transport: keep-alive connections kept open per host, retries after a
+# failed attempt, and the base and longest backoff (in seconds) between attempts
+TOOL_POOL_MAXSIZE = int(os.getenv("TOOL_POOL_MAXSIZE", "10"))
+TOOL_RETRIES = int(os.getenv("TOOL_RETRIES", "2"))
+TOOL_RETRY_BACKOFF_SECONDS = float(os.getenv("TOOL_RETRY_BACKOFF_SECONDS", "0.5"))
+TOOL_RETRY_MAX_BACKOFF_SECONDS = float(os.getenv("TOOL_RETRY_MAX_BACKOFF_SECONDS", "5"))
+
+# Largest total size (in bytes) of GitHub file contents kept in the file cache
+# (0 disables the cache)
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# GitHub rate-limit scheduling: share of a token's limit below which calls are paced
+# over the rest of the window, and share that background calls (e.g., prefetches) leave
+# for interactive ones
+GITHUB_RATE_LOW_FRACTION = float(os.getenv("GITHUB_RATE_LOW_FRACTION", "0.1"))
+GITHUB_BACKGROUND_RESERVE_FRACTION = float(os.getenv("GITHUB_BACKGROUND_RESERVE_FRACTION", "0.2"))
+
+# Jira create metadata (projects and issue types) used to validate issues before they
+# are sent: seconds it is kept, and most projects whose issue types are loaded up front
+JIRA_METADATA_TTL_SECONDS = float(os.getenv("JIRA_METADATA_TTL_SECONDS", "600"))
+JIRA_METADATA_MAX_PROJECTS = int(os.getenv("JIRA_METADATA_MAX_PROJECTS", "20"))
+# Seconds a failed metadata fetch (e.g., an older Jira without the createmeta endpoints,
+# or a 5xx) is remembered, so issues are sent unvalidated without trying again each time
+JIRA_METADATA_FAILURE_TTL_SECONDS = float(os.getenv("JIRA_METADATA_FAILURE_TTL_SECONDS", "60"))
+
+# Speculative prefetch of GitHub files named in a query, started while the query is
+# routed: most files fetched per query (0 disables prefetching) and largest file kept
+PREFETCH_MAX_FILES = int(os.getenv("PREFETCH_MAX_FILES", "4"))
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(256 * 1024)))
+
+# Most bytes of one GitHub file returned (larger files are cut short, or read by line range)
+GITHUB_FILE_MAX_BYTES = int(os.getenv("GITHUB_FILE_MAX_BYTES", str(1024 * 1024)))
+
+# GitHub directory and batch reads: most tree entries listed, most files and total
+# characters of content returned by one get_files call, and files fetched at once
+GITHUB_TREE_MAX_ENTRIES = int(os.getenv("GITHUB_TREE_MAX_ENTRIES", "500"))
+GITHUB_BATCH_MAX_FILES = int(os.getenv("GITHUB_BATCH_MAX_FILES", "20"))
+GITHUB_BATCH_MAX_CHARS = int(os.getenv("GITHUB_BATCH_MAX_CHARS", "60000"))
+GITHUB_BATCH_CONCURRENCY = int(os.getenv("GITHUB_BATCH_CONCURRENCY", "4"))
+
+# Request deadlines: default time budget (in seconds) for a chat request (a system
+# can override it with 'deadline_seconds'), the longest timeout a single LLM, tool,
+# or KB call may use, and the time left that refinement or another tool iteration
+# needs to be started
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+TOOL_REQUEST_TIMEOUT_SECONDS = float(os.getenv("TOOL_REQUEST_TIMEOUT_SECONDS", "30"))
+KB_FETCH_TIMEOUT_SECONDS = float(os.getenv("KB_FETCH_TIMEOUT_SECONDS", "30"))
+MIN_REFINEMENT_SECONDS = float(os.getenv("MIN_REFINEMENT_SECONDS", "10"))
+MIN_TOOL_ITERATION_SECONDS = float(os.getenv("MIN_TOOL_ITERATION_SECONDS", "15"))
+
+# How often (in seconds) a chat request checks whether its client has disconnected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+# Adaptive concurrency limit per LLM endpoint: starting, lowest, and highest limit,
+# how many calls may wait for a slot (and for how long) before being rejected, the
+# time to first token above which the endpoint counts as saturated, and the factor
+# the limit is cut by when it is
+LLM_CONCURRENCY_INITIAL = float(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+LLM_CONCURRENCY_MIN = float(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "2"))
+LLM_LIMIT_BACKOFF = float(os.getenv("LLM_LIMIT_BACKOFF", "0.9"))
+
+# Admission control: default rate limit per system (queries per second, and how many
+# may arrive at once after an idle period), and the limit shared by all systems of one
+# owning user. A rate of 0 disables the limit.
+SYSTEM_RATE_PER_SECOND = float(os.getenv("SYSTEM_RATE_PER_SECOND", "2"))
+SYSTEM_RATE_BURST = float(os.getenv("SYSTEM_RATE_BURST", "10"))
+USER_RATE_PER_SECOND = float(os.getenv("USER_RATE_PER_SECOND", "5"))
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", "20"))
+
+# Load-aware degradation: endpoint load (queue fill or time to first token relative to
+# LLM_LATENCY_TARGET_SECONDS) at which the level steps up or back down, the least time
+# between steps, the highest level used (0 disables degradation), and the limits
+# applied at the higher levels
+DEGRADE_UP_LOAD = float(os.getenv("DEGRADE_UP_LOAD", "0.8"))
+DEGRADE_DOWN_LOAD = float(os.getenv("DEGRADE_DOWN_LOAD", "0.4"))
+DEGRADE_STEP_SECONDS = float(os.getenv("DEGRADE_STEP_SECONDS", "10"))
+DEGRADE_MAX_LEVEL = int(os.getenv("DEGRADE_MAX_LEVEL", "4"))
+DEGRADED_MAX_ITERATIONS = int(os.getenv("DEGRADED_MAX_ITERATIONS", "2"))
+DEGRADED_KB_MAX_TOKENS = int(os.getenv("DEGRADED_KB_MAX_TOKENS", "2000"))
+DEGRADED_MAX_TOKENS = int(os.getenv("DEGRADED_MAX_TOKENS", "512"))
+
 
 def get_base_url(endpoint: str) -> str:
     """
@@ -0,0 +1,205 @@
+"""
+Token-budget-aware context assembly for LLM calls.
+"""
+import re
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+from .config import MODEL_CONTEXT_WINDOW, TOKENIZER_PATH
+
+# The tokenizers package is optional: without it (or without a tokenizer file)
+# token counts fall back to a fast estimate
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+
+# Words and individual punctuation marks, for the fallback estimator
+_ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Chat template overhead per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Tokens kept free for estimation error
+SAFETY_MARGIN_TOKENS = 64
+
+TRUNCATION_MARKER = "\n[... truncated to fit the context window ...]"
+
+
+class TokenCounter:
+    """Counts tokens with a local tokenizer file, or estimates them without one."""
+
+    def __init__(self, tokenizer_path: Optional[str] = None):
+        """
+        Initialize the token counter.
+
+        Args:
+            tokenizer_path: Optional path to a tokenizer.json file (loaded offline)
+        """
+        self._tokenizer = None
+        self.source = "estimate"
+        if tokenizer_path and Tokenizer is not None:
+            try:
+                self._tokenizer = Tokenizer.from_file(tokenizer_path)
+                self.source = "tokenizer"
+            except Exception as e:
+                print(f"WARNING: Failed to load tokenizer from {tokenizer_path}: {e}, using estimates")
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens (exact with a tokenizer, estimated otherwise)
+        """
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # Roughly one token per 4 characters of a word, one per punctuation mark
+        return sum(1 + (len(piece) - 1) // 4 for piece in _ESTIMATE_RE.findall(text))
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Count the tokens in a chat message list, including template overhead.
+
+        Args:
+            messages: Chat messages
+
+        Returns:
+            Number of prompt tokens
+        """
+        return sum(self.count(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the shared token counter (loads TOKENIZER_PATH once)."""
+    global _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            _token_counter = TokenCounter(TOKENIZER_PATH or None)
+            print(f"DEBUG: Token counter using {_token_counter.source}")
+        return _token_counter
+
+
+class ContextAssembler:
+    """Allocates a model's context window across prompt sections, history, and generation."""
+
+    def __init__(self, context_window: int = MODEL_CONTEXT_WINDOW, counter: Optional[TokenCounter] = None):
+        """
+        Initialize the context assembler.
+
+        Args:
+            context_window: Model context window in tokens
+            counter: Token counter (default: shared counter)
+        """
+        self.context_window = context_window
+        self.counter = counter or get_token_counter()
+
+    def trim_text(self, text: str, max_tokens: int) -> str:
+        """
+        Trim a text to at most max_tokens, keeping its beginning.
+
+        Args:
+            text: Text to trim
+            max_tokens: Token limit
+
+        Returns:
+            The text, or its longest fitting prefix followed by a truncation marker
+        """
+        tokens = self.counter.count(text)
+        if tokens <= max_tokens:
+            return text
+        marker_tokens = self.counter.count(TRUNCATION_MARKER)
+        if max_tokens <= marker_tokens:
+            return ""
+
+        # Cut proportionally, then shrink until it fits
+        keep_chars = int(len(text) * (max_tokens - marker_tokens) / tokens)
+        while keep_chars > 0:
+            trimmed = text[:keep_chars] + TRUNCATION_MARKER
+            if self.counter.count(trimmed) <= max_tokens:
+                return trimmed
+            keep_chars = int(keep_chars * 0.9)
+        return ""
+
+    def assemble_system_prompt(
+        self,
+        sections: List[Dict[str, Any]],
+        reserved_tokens: int
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Join prompt sections, trimming the lowest-priority sections first until the
+        prompt fits in the context window minus reserved_tokens.
+
+        Args:
+            sections: Sections in prompt order, each {"name", "text", "priority"}.
+                Lower priority is trimmed first; sections with priority None are never trimmed.
+            reserved_tokens: Tokens reserved for everything else (task, history, generation)
+
+        Returns:
+            Tuple of (system prompt, budget dict with per-section token counts and trims)
+        """
+        budget = self.context_window - reserved_tokens - SAFETY_MARGIN_TOKENS
+        texts = [section["text"] for section in sections]
+        counts = [self.counter.count(text) for text in texts]
+        trimmed_sections = []
+
+        trim_order = sorted(
+            (idx for idx, section in enumerate(sections) if section.get("priority") is not None),
+            key=lambda idx: sections[idx]["priority"]
+        )
+        for idx in trim_order:
+            overflow = sum(counts) - budget
+            if overflow <= 0:
+                break
+            texts[idx] = self.trim_text(texts[idx], max(0, counts[idx] - overflow))
+            counts[idx] = self.counter.count(texts[idx])
+            trimmed_sections.append(sections[idx]["name"])
+
+        prompt = "\n\n".join(text for text in texts if text)
+        return prompt, {
+            "system_budget": budget,
+            "system_tokens": sum(counts),
+            "sections": {section["name"]: count for section, count in zip(sections, counts)},
+            "trimmed": trimmed_sections,
+        }
+
+    def fit_generation(
+        self,
+        messages: List[Dict[str, str]],
+        desired_max_tokens: int,
+        min_max_tokens: int = 256
+    ) -> Dict[str, Any]:
+        """
+        Compute the generation budget left for a call with the given messages.
+
+        Args:
+            messages: Chat messages for the call
+            desired_max_tokens: Generation length wanted
+            min_max_tokens: Smallest useful generation length
+
+        Returns:
+            Budget dict:
+            {
+                "prompt_tokens": <prompt tokens>,
+                "max_tokens": <generation tokens to request>,
+                "context_window": <context window>,
+                "fits": <False if less than min_max_tokens are left>
+            }
+        """
+        prompt_tokens = self.counter.count_messages(messages)
+        available = self.context_window - prompt_tokens - SAFETY_MARGIN_TOKENS
+        return {
+            "prompt_tokens": prompt_tokens,
+            "max_tokens": max(0, min(desired_max_tokens, available)),
+            "context_window": self.context_window,
+            "fits": available >= min_max_tokens,
+        }
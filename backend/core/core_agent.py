@@ -1,10 +1,15 @@
 """
 Core Agent for routing queries to appropriate sub-agents.
 """
-import json
 from typing import Dict, List, Any, Optional
 from .llm_client import chat
-from .config import ENDPOINT_CORE, MAX_RESPONSE_LENGTH
+from .deadline import Deadline
+from .context_assembler import ContextAssembler
+from .metrics import Metrics
+from .config import ENDPOINT_CORE, MAX_RESPONSE_LENGTH, MAX_FANOUT_BRANCHES, MAX_GRAPH_TASKS
+from .task_graph import validate_task_graph
+from .json_scanner import iter_json_objects
+from .response_cleaner import clean_response
 
 
 CORE_SYSTEM_PROMPT = """Your task is to select the best possible model to accomplish the task you are assigned. Select the appropriate model to use from the following list of models based on their capabilities. Output the id of the model you select as well as a prompt for the model to execute.
@@ -23,11 +28,51 @@ Example response:
     "prompt": "Analyze this transaction for fraud patterns"
 }"""
 
+FANOUT_PROMPT = f"""If the task needs the knowledge bases or tools of more than one model, you may instead split it into one sub-prompt per model (at most {MAX_FANOUT_BRANCHES} models). The sub-prompts run in parallel and their answers are combined:
+{{
+    "routes": [
+        {{"model_id": 1, "prompt": "Find suspicious transactions for account 42"}},
+        {{"model_id": 2, "prompt": "Summarize the finance records for account 42"}}
+    ]
+}}
+
+Only split the task when a single model cannot answer it."""
+
+TASK_GRAPH_PROMPT = f"""If the task is a sequence of steps where some steps need the results of others (for example: read a file, compare it to a knowledge base, then file a ticket), you may instead return a task graph (at most {MAX_GRAPH_TASKS} tasks). Tasks without dependencies run in parallel; each task receives the results of the tasks in its "depends_on" list:
+{{
+    "tasks": [
+        {{"id": "read", "model_id": 1, "prompt": "Read config.py from owner/repo", "depends_on": []}},
+        {{"id": "compare", "model_id": 2, "prompt": "Compare the config with the knowledge base", "depends_on": ["read"]}},
+        {{"id": "ticket", "model_id": 1, "prompt": "File a Jira ticket listing the differences", "depends_on": ["compare"]}}
+    ]
+}}"""
+
+
+REFINEMENT_SYSTEM_PROMPT = """You are a response formatter. Your task is to clean up and format responses to be concise, clear, and user-friendly.
+
+You must:
+1. Remove all internal reasoning or thinking process (e.g., "Let me think...", "Okay, I need to...", reasoning blocks)
+2. Remove all references to tools, processes, or internal steps that were used
+3. Remove meta-commentary about the process (e.g., "No tool was required", "I used tool X")
+4. Provide a direct, clear answer to the user's query
+5. Format the response clearly and concisely
+6. Keep the response under {max_length} characters
+7. Preserve all important information, data, and results
+8. Remove verbose explanations and redundant text
+
+Return ONLY the cleaned response. Do not include any explanations about what you removed or changed."""
+
 
 class CoreAgent:
     """Core agent that routes queries to appropriate sub-agents."""
     
-    def __init__(self, models: List[Dict[str, Any]], knowledge_bases: List[Dict[str, Any]], tools: List[Dict[str, Any]]):
+    def __init__(
+        self,
+        models: List[Dict[str, Any]],
+        knowledge_bases: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        metrics: Optional[Metrics] = None
+    ):
         """
         Initialize the core agent.
         
@@ -35,11 +80,42 @@ class CoreAgent:
             models: List of model configurations
             knowledge_bases: List of knowledge base configurations
             tools: List of tool configurations
+            metrics: Optional metrics that receive the call budgets
         """
         self.models = models
         self.knowledge_bases = knowledge_bases
         self.tools = tools
         self.endpoint = ENDPOINT_CORE
+        self.metrics = metrics
+        self.assembler = ContextAssembler()
+    
+    def _fit_call(self, prompt: str, system_prompt: str, max_tokens: int, stage: str) -> int:
+        """
+        Generation budget of a core agent call, given its prompt.
+        
+        Args:
+            prompt: User prompt of the call
+            system_prompt: System prompt of the call
+            max_tokens: Generation length wanted
+            stage: Name of the call in logs and metrics (e.g., "routing")
+        
+        Returns:
+            max_tokens to request (less than wanted if the prompt is long)
+        
+        Raises:
+            ValueError: If the prompt leaves too little of the context window to generate
+        """
+        messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]
+        call_budget = self.assembler.fit_generation(messages, max_tokens)
+        print(f"DEBUG: Call budget ({stage}): {call_budget}")
+        if self.metrics is not None:
+            self.metrics.observe(f"context.{stage}.prompt_tokens", call_budget["prompt_tokens"])
+            self.metrics.observe(f"context.{stage}.max_tokens", call_budget["max_tokens"])
+        if not call_budget["fits"]:
+            if self.metrics is not None:
+                self.metrics.incr(f"context.{stage}.exhausted")
+            raise ValueError(f"The {stage} prompt does not fit in the model context window")
+        return call_budget["max_tokens"]
     
     def _format_models_context(self) -> str:
         """Format models, knowledge bases, and tools for the system prompt."""
@@ -74,171 +150,143 @@ Tools: {', '.join(tool_names) if tool_names else 'None'}
         
         return "\n".join(models_info)
     
-    def route_query(self, user_query: str) -> Dict[str, Any]:
+    def route_query(self, user_query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Route a user query to the appropriate sub-agent.
         
         Args:
             user_query: The user's query
+            deadline: Optional request deadline
         
         Returns:
-            Dict with 'model_id' and 'prompt'
+            Dict with 'routes' (list of {'model_id', 'prompt'}), plus 'model_id'
+            and 'prompt' of the first route. If the query was decomposed, also
+            'tasks' (validated task graph).
         
         Raises:
-            ValueError: If the response cannot be parsed
+            ValueError: If the routing prompt does not fit in the context window, or the
+                response cannot be parsed
+            DeadlineExceeded: If the deadline expires during routing
         """
         # Build system prompt with models context
         models_context = self._format_models_context()
-        full_system_prompt = f"{CORE_SYSTEM_PROMPT}\n\nAvailable Models:\n{models_context}"
+        full_system_prompt = f"{CORE_SYSTEM_PROMPT}\n\n{FANOUT_PROMPT}\n\n{TASK_GRAPH_PROMPT}\n\nAvailable Models:\n{models_context}"
         
         # Call LLM
         response = chat(
             prompt=user_query,
             endpoint=self.endpoint,
             system_prompt=full_system_prompt,
-            max_tokens=1024  # Increased to handle reasoning + JSON
+            # 1024 to handle reasoning + JSON, if the prompt leaves room for it
+            max_tokens=self._fit_call(user_query, full_system_prompt, 1024, "routing"),
+            deadline=deadline
         )
         
-        # Parse JSON response
-        try:
-            # Extract JSON from response (might have reasoning text before/after)
-            json_text = self._extract_json_from_response(response)
-            result = json.loads(json_text)
-            
-            # Validate structure
-            if "model_id" not in result or "prompt" not in result:
-                raise ValueError("Response missing required fields: model_id or prompt")
-            
-            return result
-        except json.JSONDecodeError as e:
+        # Extract JSON from response (might have reasoning text before/after)
+        result = self._extract_routing_object(response)
+        if result is None:
             # Show more context in error message
-            error_msg = f"Failed to parse JSON response: {e}\n"
-            error_msg += f"Extracted JSON text (first 500 chars): {json_text[:500]}\n"
+            error_msg = "Failed to parse JSON response: no routing object found\n"
             error_msg += f"Full response (first 1000 chars): {response[:1000]}"
             raise ValueError(error_msg)
+        
+        return self._normalize_routes(result)
     
-    def _extract_json_from_response(self, response: str) -> str:
+    def _normalize_routes(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Extract JSON from response that may contain reasoning text.
+        Validate a routing result and normalize it to a list of routes.
         
         Args:
-            response: Full response text that may contain reasoning + JSON
+            result: Parsed routing JSON: {"model_id", "prompt"}, {"routes": [...]},
+                or {"tasks": [...]}
         
         Returns:
-            Extracted JSON string
-        """
-        response = response.strip()
-        
-        # Remove markdown code blocks if present
-        if response.startswith("```json"):
-            response = response[7:]
-        elif response.startswith("```"):
-            response = response[3:]
-        if response.endswith("```"):
-            response = response[:-3]
-        response = response.strip()
-        
-        # Try multiple strategies to find JSON
-        
-        # Strategy 1: Look for JSON object pattern with model_id
-        import re
-        json_pattern = r'\{[^{}]*"model_id"[^{}]*\}'
-        matches = re.findall(json_pattern, response, re.DOTALL)
-        if matches:
-            # Try to find the most complete match (longest)
-            for match in sorted(matches, key=len, reverse=True):
-                try:
-                    json.loads(match)
-                    return match
-                except:
-                    continue
+            Dict with 'routes', 'model_id', and 'prompt' (and 'tasks' for a task graph)
         
-        # Strategy 2: Find the last complete JSON object
-        start_idx = response.rfind('{')
-        if start_idx != -1:
-            # Find matching closing brace
-            brace_count = 0
-            end_idx = start_idx
-            for i in range(start_idx, len(response)):
-                if response[i] == '{':
-                    brace_count += 1
-                elif response[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_idx = i + 1
-                        json_text = response[start_idx:end_idx]
-                        try:
-                            json.loads(json_text)
-                            return json_text.strip()
-                        except:
-                            continue
-            
-            # If we found opening brace but no closing, try to find it backwards
-            # Sometimes the JSON might be incomplete, try to find the last }
-            last_closing = response.rfind('}')
-            if last_closing > start_idx:
-                json_text = response[start_idx:last_closing + 1]
-                try:
-                    json.loads(json_text)
-                    return json_text.strip()
-                except:
-                    pass
+        Raises:
+            ValueError: If required fields are missing, the task graph is invalid, or
+                no route names a model of this system
+        """
+        if "tasks" in result:
+            tasks = validate_task_graph(
+                result["tasks"], MAX_GRAPH_TASKS, [model.get('id') for model in self.models]
+            )
+            roots = [task for task in tasks if not task["depends_on"]]
+            return {
+                "tasks": tasks,
+                "routes": [{"model_id": task["model_id"], "prompt": task["prompt"]} for task in roots],
+                "model_id": roots[0]["model_id"],
+                "prompt": roots[0]["prompt"],
+            }
+        
+        routes = result.get("routes")
+        if routes is None:
+            # Validate structure
+            if "model_id" not in result or "prompt" not in result:
+                raise ValueError("Response missing required fields: model_id or prompt")
+            routes = [{"model_id": result["model_id"], "prompt": result["prompt"]}]
+        
+        if not isinstance(routes, list) or not routes:
+            raise ValueError("Response 'routes' must be a non-empty list")
+        for route in routes:
+            if not isinstance(route, dict) or "model_id" not in route or "prompt" not in route:
+                raise ValueError("Each route must include model_id and prompt")
+        
+        # Drop routes to unknown and duplicate models and enforce the fan-out limit
+        unique_routes = []
+        seen_model_ids = set()
+        for route in routes:
+            if not any(model.get('id') == route["model_id"] for model in self.models):
+                print(f"WARNING: Dropping route to unknown model {route['model_id']}")
+                continue
+            if route["model_id"] in seen_model_ids:
+                continue
+            seen_model_ids.add(route["model_id"])
+            unique_routes.append({"model_id": route["model_id"], "prompt": route["prompt"]})
+        if not unique_routes:
+            raise ValueError(f"No route names a configured model: {[route['model_id'] for route in routes]}")
+        unique_routes = unique_routes[:MAX_FANOUT_BRANCHES]
+        
+        return {
+            "routes": unique_routes,
+            "model_id": unique_routes[0]["model_id"],
+            "prompt": unique_routes[0]["prompt"],
+        }
+    
+    def _extract_routing_object(self, response: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract the routing JSON object from response that may contain reasoning text.
         
-        # Strategy 3: Look for JSON after common markers
-        markers = ['</think>', '</reasoning>', '```json', '```', 'JSON:', 'Response:']
-        for marker in markers:
-            idx = response.find(marker)
-            if idx != -1:
-                after_marker = response[idx + len(marker):].strip()
-                # Try to find JSON in the part after marker
-                json_start = after_marker.find('{')
-                if json_start != -1:
-                    json_candidate = after_marker[json_start:]
-                    # Try to extract complete JSON
-                    brace_count = 0
-                    end_idx = 0
-                    for i, char in enumerate(json_candidate):
-                        if char == '{':
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                            if brace_count == 0:
-                                end_idx = i + 1
-                                try:
-                                    json_text = json_candidate[:end_idx]
-                                    json.loads(json_text)
-                                    return json_text.strip()
-                                except:
-                                    continue
+        Args:
+            response: Full response text that may contain reasoning + JSON
         
-        # Fallback: return the whole response and let the caller handle the error
-        return response
+        Returns:
+            The last JSON object with 'tasks', 'routes', or 'model_id'
+            (reasoning may contain drafts before the final answer), or None
+        """
+        routing_object = None
+        for obj in iter_json_objects(response):
+            if "tasks" in obj or "routes" in obj or "model_id" in obj:
+                routing_object = obj
+        return routing_object
     
-    def refine_response(self, sub_agent_response: str, original_query: str) -> str:
+    def refine_response(
+        self,
+        sub_agent_response: str,
+        original_query: str,
+        deadline: Optional[Deadline] = None
+    ) -> str:
         """
         Refine and clean up sub-agent response to make it concise and well-formatted.
         
         Args:
             sub_agent_response: Raw response from sub-agent
             original_query: Original user query
+            deadline: Optional request deadline (falls back to simple cleanup when it expires)
         
         Returns:
             Cleaned and refined response
         """
-        REFINEMENT_SYSTEM_PROMPT = """You are a response formatter. Your task is to clean up and format responses to be concise, clear, and user-friendly.
-
-You must:
-1. Remove all internal reasoning or thinking process (e.g., "Let me think...", "Okay, I need to...", reasoning blocks)
-2. Remove all references to tools, processes, or internal steps that were used
-3. Remove meta-commentary about the process (e.g., "No tool was required", "I used tool X")
-4. Provide a direct, clear answer to the user's query
-5. Format the response clearly and concisely
-6. Keep the response under {max_length} characters
-7. Preserve all important information, data, and results
-8. Remove verbose explanations and redundant text
-
-Return ONLY the cleaned response. Do not include any explanations about what you removed or changed."""
-        
         refinement_prompt = f"""Clean up and format the following sub-agent response:
 
 Original User Query: {original_query}
@@ -249,11 +297,13 @@ Sub-Agent Response:
 Provide a clean, concise, and well-formatted response that directly answers the user's query. Remove all reasoning, internal process references, and meta-commentary. Keep it under {MAX_RESPONSE_LENGTH} characters."""
         
         try:
+            system_prompt = REFINEMENT_SYSTEM_PROMPT.format(max_length=MAX_RESPONSE_LENGTH)
             response = chat(
                 prompt=refinement_prompt,
                 endpoint=self.endpoint,
-                system_prompt=REFINEMENT_SYSTEM_PROMPT.format(max_length=MAX_RESPONSE_LENGTH),
-                max_tokens=1024
+                system_prompt=system_prompt,
+                max_tokens=self._fit_call(refinement_prompt, system_prompt, 1024, "refinement"),
+                deadline=deadline
             )
             
             # Clean up the response further (remove any remaining reasoning)
@@ -294,78 +344,82 @@ Provide a clean, concise, and well-formatted response that directly answers the
                     cleaned_response = truncated + "..."
             return cleaned_response.strip()
     
-    def _clean_response_simple(self, response: str) -> str:
+    def merge_responses(self, branch_results: List[Dict[str, Any]]) -> str:
         """
-        Simple cleanup: remove reasoning blocks and verbose text using regex.
-        Used as fallback when LLM-based refinement fails.
+        Merge the answers of sub-agents that ran in parallel into one response.
+        Each answer is cleaned of reasoning before merging, so later cleanup
+        does not cut across branches.
         
         Args:
-            response: Raw response text
+            branch_results: Results from Router.route_to_sub_agents()
         
         Returns:
-            Cleaned response text
+            Merged response with one section per answering model
         """
-        import re
-        
-        # Remove reasoning blocks (common patterns)
-        # Remove everything up to and including reasoning markers
-        # Handle patterns like: </think>, </reasoning>, with or without backticks or newlines
-        reasoning_markers = [
-            r'.*?</think>\s*',
-            r'.*?</reasoning>\s*',
-            r'.*?`</think>`\s*',
-            r'.*?`</reasoning>`\s*',
-        ]
-        for marker in reasoning_markers:
-            response = re.sub(marker, '', response, flags=re.DOTALL | re.IGNORECASE)
-        
-        # Remove common reasoning patterns at start of paragraphs
-        reasoning_patterns = [
-            r'^(Let me think|Okay, let me|First, I need|Wait,|But wait,|However,|Maybe I should).*?(?=\n\n|\Z)',
-            r'^(I need to|I should|Let me check|Let me start).*?(?=\n\n|\Z)',
-        ]
-        
-        for pattern in reasoning_patterns:
-            response = re.sub(pattern, '', response, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
-        
-        # Split into paragraphs and filter out reasoning-heavy ones
-        paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
-        clean_paragraphs = []
-        
-        reasoning_indicators = ['let me', 'i need to', 'first', 'wait', 'but wait', 'however', 'maybe', 
-                               'i should', 'let me check', 'okay,', 'so,', 'hmm,', 'well,',
-                               'no tool was required', 'i used tool', 'the tool', 'internal']
-        
-        for para in paragraphs:
-            para_lower = para.lower()
-            # Skip if it's a reasoning paragraph (starts with reasoning indicators and is short)
-            if any(para_lower.startswith(indicator) for indicator in reasoning_indicators) and len(para) < 300:
-                continue
-            # Skip if it contains tool call JSON
-            if 'tool_id' in para or '"tool_call"' in para or 'tool execution' in para_lower:
+        answers = []
+        for branch in branch_results:
+            if branch.get('status') != 'ok':
                 continue
-            clean_paragraphs.append(para)
+            answer = self._clean_response_simple(branch.get('response', ''))
+            if answer:
+                model_name = branch.get('model_name') or f"Model {branch.get('model_id')}"
+                answers.append((model_name, answer))
+        
+        if not answers:
+            return "Error: None of the selected sub-agents returned an answer in time"
+        if len(answers) == 1:
+            return answers[0][1]
+        return "\n\n".join(f"{model_name}:\n{answer}" for model_name, answer in answers)
+    
+    def refine_segment(
+        self,
+        segment: str,
+        original_query: str,
+        max_length: int,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Refine one section of a longer sub-agent response that is still being generated.
+        Used by pipelined refinement; the caller joins the refined sections in order.
         
-        if clean_paragraphs:
-            cleaned = '\n\n'.join(clean_paragraphs)
-        else:
-            # If we filtered everything out, keep the original but remove obvious reasoning
-            cleaned = response
+        Args:
+            segment: Section of the sub-agent answer (reasoning already removed)
+            original_query: Original user query
+            max_length: Maximum length of the refined section in characters
+            deadline: Optional request deadline
         
-        # Remove standalone reasoning sentences
-        lines = cleaned.split('\n')
-        clean_lines = []
-        for line in lines:
-            line_lower = line.strip().lower()
-            if any(line_lower.startswith(indicator) for indicator in reasoning_indicators) and len(line) < 200:
-                continue
-            clean_lines.append(line)
+        Returns:
+            Cleaned and refined section
+        """
+        refinement_prompt = f"""Clean up and format the following section of a longer sub-agent response. Other sections are formatted separately, so do not add an introduction or a conclusion.
+
+Original User Query: {original_query}
+
+Sub-Agent Response Section:
+{segment}
+
+Provide a clean, concise version of this section. Remove all reasoning, internal process references, and meta-commentary. Keep it under {max_length} characters."""
         
-        cleaned = '\n'.join(clean_lines)
+        system_prompt = REFINEMENT_SYSTEM_PROMPT.format(max_length=max_length)
+        response = chat(
+            prompt=refinement_prompt,
+            endpoint=self.endpoint,
+            system_prompt=system_prompt,
+            max_tokens=self._fit_call(refinement_prompt, system_prompt, 1024, "segment_refinement"),
+            deadline=deadline
+        )
+        return self._clean_response_simple(response)
+    
+    def _clean_response_simple(self, response: str) -> str:
+        """
+        Simple cleanup: remove reasoning blocks and verbose text.
+        Used as fallback when LLM-based refinement fails.
         
-        # Remove excessive whitespace
-        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
-        cleaned = re.sub(r' {2,}', ' ', cleaned)
+        Args:
+            response: Raw response text
         
-        return cleaned.strip()
+        Returns:
+            Cleaned response text
+        """
+        return clean_response(response)
 
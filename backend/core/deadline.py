@@ -0,0 +1,183 @@
+"""
+Per-request deadlines shared by every stage of a query.
+"""
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of time before or during a downstream call."""
+
+
+class RequestCancelled(DeadlineExceeded):
+    """Raised when a request was cancelled (e.g., the client disconnected)."""
+
+
+class Deadline:
+    """
+    Time budget for one request.
+
+    Created when the request arrives and passed down to routing, sub-agents, tools,
+    and KB fetches, so every downstream call times out when the request would.
+    Cancelling it ends the budget at once and runs the registered cancel callbacks
+    (e.g., closing open LLM streams). It also names the tenant the request is for,
+    so the LLM endpoints can share their capacity fairly between tenants, and the
+    request itself, so repeated side-effecting tool calls can be recognized.
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        tenant: Optional[str] = None,
+        weight: float = 1.0,
+        request_id: Optional[str] = None
+    ):
+        """
+        Initialize the deadline.
+
+        Args:
+            seconds: Time budget from now
+            tenant: Tenant the request is for (e.g., the owning user or the system)
+            weight: Tenant's share of LLM endpoint capacity relative to other tenants
+            request_id: ID of the request, the same for retries of it (e.g., the
+                client's Idempotency-Key); a new one is generated if not given
+        """
+        self.tenant = tenant
+        self.weight = weight
+        self.request_id = request_id or uuid.uuid4().hex
+        # Speculative tool fetches started for the request (a core.prefetch.Prefetch)
+        self.prefetch = None
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cancelled = False
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired or cancelled)."""
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """True if no time is left or the request was cancelled."""
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+    def cancel(self) -> None:
+        """Cancel the request: no further calls start, and in-flight ones are aborted."""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"WARNING: Cancel callback failed: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Register a callback that aborts in-flight work when the request is cancelled.
+        Runs at once if the request is already cancelled.
+
+        Args:
+            callback: Callable with no arguments (e.g., a response's close method)
+
+        Returns:
+            Callable that unregisters the callback once the work is done
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def child(self) -> "Deadline":
+        """
+        A deadline for work that may be abandoned on its own (e.g., speculative LLM
+        calls): same expiry, tenant, and request, cancelled when this one is, but
+        cancelling it leaves this one running.
+
+        Returns:
+            New Deadline
+        """
+        child = Deadline(self.remaining(), self.tenant, self.weight, self.request_id)
+        child.budget = self.budget
+        child.expires_at = self.expires_at
+        child.on_cancel(self.on_cancel(child.cancel))
+        return child
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        """Unregister a cancel callback."""
+        with self._lock:
+            if callback in self._cancel_callbacks:
+                self._cancel_callbacks.remove(callback)
+
+    def exceeded(self, when: str) -> DeadlineExceeded:
+        """
+        Error for a call that ran out of time or was cancelled.
+
+        Args:
+            when: Where it happened, e.g. "during LLM call"
+
+        Returns:
+            RequestCancelled if the request was cancelled, else DeadlineExceeded
+        """
+        if self.cancelled:
+            return RequestCancelled(f"Request cancelled {when}")
+        return DeadlineExceeded(f"Request deadline of {self.budget:g}s exceeded {when}")
+
+    def allows(self, seconds: float) -> bool:
+        """
+        Check whether an optional stage is worth starting.
+
+        Args:
+            seconds: Time the stage needs
+
+        Returns:
+            True if at least that much time is left
+        """
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float, stage: str = "call") -> float:
+        """
+        Timeout for one downstream call: the remaining budget, at most cap.
+
+        Args:
+            cap: Longest timeout the call may use
+            stage: Name of the call, for the error message
+
+        Returns:
+            Timeout in seconds
+
+        Raises:
+            DeadlineExceeded: If no time is left (RequestCancelled if cancelled)
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise self.exceeded(f"before {stage}")
+        return min(cap, remaining)
+
+
+def call_timeout(deadline: Optional[Deadline], cap: float, stage: str = "call") -> float:
+    """
+    Timeout for a downstream call that may or may not run under a deadline.
+
+    Args:
+        deadline: Request deadline, or None
+        cap: Timeout to use without a deadline, and the upper bound with one
+        stage: Name of the call, for the error message
+
+    Returns:
+        Timeout in seconds
+
+    Raises:
+        DeadlineExceeded: If the deadline has no time left
+    """
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap, stage)
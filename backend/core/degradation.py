@@ -0,0 +1,121 @@
+"""
+Load-aware graceful degradation: trade answer quality for latency during load peaks.
+"""
+import threading
+import time
+from typing import Dict, Any, Callable
+from .config import (
+    DEGRADE_UP_LOAD, DEGRADE_DOWN_LOAD, DEGRADE_STEP_SECONDS, DEGRADE_MAX_LEVEL,
+    DEGRADED_MAX_ITERATIONS, DEGRADED_KB_MAX_TOKENS, DEGRADED_MAX_TOKENS,
+)
+from .concurrency_limiter import endpoint_load
+from .metrics import Metrics, global_metrics
+
+
+# Degradation levels; each level also applies everything below it
+NORMAL = 0
+NO_REFINEMENT = 1          # Deterministic cleanup instead of LLM refinement
+FEWER_TOOL_ITERATIONS = 2  # At most DEGRADED_MAX_ITERATIONS sub-agent calls
+KB_PROFILES = 3            # Only the beginning of each KB, up to DEGRADED_KB_MAX_TOKENS in total
+SHORT_ANSWERS = 4          # Sub-agent answers capped at DEGRADED_MAX_TOKENS
+
+LEVEL_NAMES = ("normal", "no_refinement", "fewer_tool_iterations", "kb_profiles", "short_answers")
+
+
+def level_settings(level: int) -> Dict[str, Any]:
+    """
+    What a degradation level changes.
+
+    Args:
+        level: Degradation level
+
+    Returns:
+        Dict with:
+            - llm_refinement: Whether LLM refinement may be used
+            - sub_agent_options: Keyword arguments for Router.route_to_sub_agent()
+              (max_iterations, kb_max_tokens, max_tokens; empty at NORMAL)
+    """
+    options: Dict[str, Any] = {}
+    if level >= FEWER_TOOL_ITERATIONS:
+        options['max_iterations'] = DEGRADED_MAX_ITERATIONS
+    if level >= KB_PROFILES:
+        options['kb_max_tokens'] = DEGRADED_KB_MAX_TOKENS
+    if level >= SHORT_ANSWERS:
+        options['max_tokens'] = DEGRADED_MAX_TOKENS
+    return {
+        "llm_refinement": level < NO_REFINEMENT,
+        "sub_agent_options": options,
+    }
+
+
+class DegradationController:
+    """
+    Steps the degradation level up while the LLM endpoints are loaded and back
+    down when the load drops.
+
+    The level moves up one step at a time, at most once per step_seconds, while the
+    load is at least up_load. While the load is at most down_load it moves down one
+    step per step_seconds elapsed since the last step, so after an idle period the
+    first query is already served at the level the quiet time has earned. The gap
+    between the two thresholds keeps the level from flapping.
+    """
+
+    def __init__(
+        self,
+        load_source: Callable[[], float] = endpoint_load,
+        up_load: float = DEGRADE_UP_LOAD,
+        down_load: float = DEGRADE_DOWN_LOAD,
+        step_seconds: float = DEGRADE_STEP_SECONDS,
+        max_level: int = DEGRADE_MAX_LEVEL,
+        metrics: Metrics = global_metrics
+    ):
+        """
+        Initialize the controller at NORMAL.
+
+        Args:
+            load_source: Callable returning the current load (1.0 = saturated)
+            up_load: Load at which the level steps up
+            down_load: Load at which the level steps down
+            step_seconds: Least time between two steps
+            max_level: Highest level used (0 disables degradation)
+            metrics: Metrics that receive the level and load gauges
+        """
+        self.load_source = load_source
+        self.up_load = up_load
+        self.down_load = down_load
+        self.step_seconds = step_seconds
+        self.max_level = max(0, min(max_level, len(LEVEL_NAMES) - 1))
+        self.metrics = metrics
+        self._level = NORMAL
+        self._last_step = time.monotonic()
+        self._lock = threading.Lock()
+
+    def level(self) -> int:
+        """
+        Update the level from the current load and return it.
+
+        Returns:
+            Degradation level to apply to a query starting now
+        """
+        load = self.load_source()
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_step
+            if elapsed >= self.step_seconds:
+                if load >= self.up_load and self._level < self.max_level:
+                    self._level += 1
+                    self._last_step = now
+                    print(f"WARNING: Endpoint load {load:.2f}, degrading to level {self._level} ({LEVEL_NAMES[self._level]})")
+                elif load <= self.down_load and self._level > NORMAL:
+                    # Levels are only evaluated when queries arrive: catch up on the quiet time since the last step
+                    steps = int(elapsed // self.step_seconds) if self.step_seconds > 0 else self._level
+                    self._level = max(NORMAL, self._level - steps)
+                    self._last_step = now
+                    print(f"DEBUG: Endpoint load {load:.2f}, recovering to level {self._level} ({LEVEL_NAMES[self._level]})")
+            self.metrics.set_gauge("degradation.level", self._level)
+            self.metrics.set_gauge("degradation.load", load)
+            return self._level
+
+
+# Process-wide controller (the endpoints and their load are shared by all systems)
+degradation_controller = DegradationController()
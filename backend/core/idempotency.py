@@ -0,0 +1,209 @@
+"""
+Idempotent execution of side-effecting tool calls: the first call with a key runs,
+identical calls within the window get its result instead of running again.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+from .config import TOOL_IDEMPOTENCY_WINDOW_SECONDS, TOOL_IDEMPOTENCY_MAX_ENTRIES
+from .metrics import Metrics, global_metrics
+
+
+def idempotency_key(*parts: Any) -> str:
+    """
+    Key of a call from its identifying parts (e.g., system, request, tool, arguments).
+
+    Args:
+        parts: JSON-serializable values; dict key order does not matter
+
+    Returns:
+        Hex digest
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def normalize_arguments(value: Any) -> Any:
+    """
+    Normalize call arguments so that calls meaning the same thing get the same key:
+    whitespace runs in strings are collapsed and trimmed, and empty values dropped.
+
+    Args:
+        value: Arguments (dicts, lists, and scalars)
+
+    Returns:
+        Normalized copy
+    """
+    if isinstance(value, dict):
+        normalized = {key: normalize_arguments(item) for key, item in value.items()}
+        return {key: item for key, item in normalized.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [normalize_arguments(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def succeeded(result: Dict[str, Any]) -> bool:
+    """
+    Whether a call fully succeeded: calls that report results of their own (e.g.,
+    Jira create_issues, whose 'result' has 'success' False when some issues failed)
+    only count as successful if all of it succeeded.
+
+    Args:
+        result: Result dict with 'success'
+
+    Returns:
+        True if the result can be stored and replayed
+    """
+    if not result.get('success'):
+        return False
+    inner = result.get('result')
+    return not (isinstance(inner, dict) and inner.get('success') is False)
+
+
+class _Entry:
+    """A call's outcome (guarded by the store's lock, except for the event)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.expires_at = float("inf")  # In flight until the result is stored
+
+
+class IdempotentCalls:
+    """
+    Remembers the results of side-effecting calls by idempotency key.
+
+    The first call with a key runs; a call with the same key made while it runs waits
+    for it, and one made later in the window gets the stored result. Only fully
+    successful results are kept (see succeeded()), so a failed call, or one that
+    partly failed, can be retried. Results are kept for
+    window_seconds, at most max_entries of them.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = TOOL_IDEMPOTENCY_WINDOW_SECONDS,
+        max_entries: int = TOOL_IDEMPOTENCY_MAX_ENTRIES,
+        metrics: Metrics = global_metrics
+    ):
+        """
+        Initialize an empty store.
+
+        Args:
+            window_seconds: How long a result is returned for repeated calls (0 disables deduplication)
+            max_entries: Most results kept
+            metrics: Metrics that receive the replay counter
+        """
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key: str, call: Callable[[], Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+        """
+        Run a call once per key.
+
+        Args:
+            key: Idempotency key of the call
+            call: Callable returning a result dict with 'success'
+            timeout: Longest time to wait for an identical call in flight
+
+        Returns:
+            The call's result, or the stored result of an identical call (marked
+            'replayed')
+        """
+        if self.window_seconds <= 0:
+            return call()
+        give_up_at = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._expire()
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry()
+                    break
+            # An identical call ran or is running: use its result
+            if entry.done.wait(max(0.0, give_up_at - time.monotonic())) and entry.result is not None:
+                return self._replay(entry.result)
+            if not entry.done.is_set():
+                return {
+                    "success": False,
+                    "error": "An identical call is still running; its result was not ready in time"
+                }
+            # The identical call failed, so nothing was stored: run this one
+        try:
+            result = call()
+        except BaseException:
+            self._finish(key, entry, None)
+            raise
+        self._finish(key, entry, result if succeeded(result) else None)
+        return result
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Stored result of a call that already ran.
+
+        Args:
+            key: Idempotency key of the call
+
+        Returns:
+            The stored result (marked 'replayed'), or None
+        """
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            result = entry.result if entry is not None and entry.done.is_set() else None
+        return self._replay(result) if result is not None else None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store the successful result of a call made outside run() (e.g., as part of a bulk call).
+
+        Args:
+            key: Idempotency key of the call
+            result: Result dict with 'success'
+        """
+        if self.window_seconds <= 0 or not succeeded(result):
+            return
+        entry = _Entry()
+        with self._lock:
+            self._entries[key] = entry
+        self._finish(key, entry, result)
+
+    def _finish(self, key: str, entry: _Entry, result: Optional[Dict[str, Any]]) -> None:
+        """Store a call's result, or forget the call if it failed, and wake waiting calls."""
+        with self._lock:
+            if result is not None:
+                entry.result = result
+                entry.expires_at = time.monotonic() + self.window_seconds
+                if self._entries.get(key) is entry:
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _replay(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """A stored result, returned for a repeated call."""
+        self.metrics.incr("tools.idempotency.replayed")
+        return dict(result, replayed=True)
+
+    def _expire(self) -> None:
+        """Drop results past their window, oldest first (lock held)."""
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[key]
+
+
+# Process-wide store shared by every system (keys include the system)
+idempotent_calls = IdempotentCalls()
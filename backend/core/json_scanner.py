@@ -0,0 +1,194 @@
+"""
+Single-pass, string-aware scanner for JSON objects embedded in LLM output.
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+
+# How many levels below an invalid candidate to look for valid objects
+# (e.g. a JSON object wrapped in braces of prose)
+MAX_RETRY_DEPTH = 4
+
+# Characters that matter inside an object, and inside a string
+_STRUCTURAL_RE = re.compile(r'[{}"]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+
+# A JSON object starts with a key or is empty; anything else (e.g. "{x}" in
+# prose) is rejected without calling json.loads
+_OBJECT_START_RE = re.compile(r'\{\s*["}]')
+
+# An opening brace, unless it starts a brace pair that cannot hold an object
+# (e.g. "{x}" or "{a: b}" in prose); those are skipped without leaving C
+_CANDIDATE_RE = re.compile(r'\{(?!\s*[^\s"{}][^{}"]*\})')
+
+# An object with no nested braces outside its strings, matched in one step
+_FLAT_OBJECT_RE = re.compile(r'\{(?:[^{}"]++|"(?:[^"\\]++|\\.)*+")*+\}', re.DOTALL)
+
+
+class JsonObjectScanner:
+    """
+    Finds top-level JSON objects in text in one linear pass.
+
+    Braces inside JSON strings are ignored, nested objects are kept whole, and
+    text can be fed in chunks (e.g., from a streaming response). Each balanced
+    candidate is parsed with json.loads once; if it is not valid JSON, the
+    balanced objects nested directly inside it are tried instead.
+    """
+
+    def __init__(self):
+        """Initialize an empty scanner."""
+        # Text of the current top-level candidate, from its opening brace
+        self._pieces: List[str] = []
+        self._buffered = 0
+        # One frame per open brace: [start index in candidate, child spans]
+        self._stack: List[List[Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._offset = 0
+        self._start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Scan the next chunk of text.
+
+        Args:
+            chunk: Text chunk
+
+        Returns:
+            (start offset, parsed object) for each top-level object completed in this chunk
+        """
+        found = []
+        stack = self._stack
+        n = len(chunk)
+        pos = 0
+        # chunk[base] is at candidate index self._buffered
+        base = 0
+
+        while pos < n:
+            if not stack:
+                # Outside any object: jump to the next opening brace
+                match = _CANDIDATE_RE.search(chunk, pos)
+                if match is None:
+                    break
+                j = match.start()
+                flat = _FLAT_OBJECT_RE.match(chunk, j)
+                if flat is not None:
+                    for rel_start, obj in _parse_span(chunk, (j, flat.end(), []), 0):
+                        found.append((self._offset + rel_start, obj))
+                    pos = flat.end()
+                    continue
+                self._start = self._offset + j
+                self._pieces = []
+                self._buffered = 0
+                base = j
+                stack.append([0, []])
+                pos = j + 1
+                continue
+
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+
+            if self._in_string:
+                match = _STRING_SPECIAL_RE.search(chunk, pos)
+                if match is None:
+                    break
+                j = match.start()
+                if chunk[j] == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos = j + 1
+                continue
+
+            match = _STRUCTURAL_RE.search(chunk, pos)
+            if match is None:
+                break
+            j = match.start()
+            char = chunk[j]
+            pos = j + 1
+            if char == '"':
+                self._in_string = True
+            elif char == '{':
+                flat = _FLAT_OBJECT_RE.match(chunk, j)
+                if flat is not None:
+                    stack[-1][1].append((self._buffered + j - base, self._buffered + flat.end() - base, []))
+                    pos = flat.end()
+                    continue
+                stack.append([self._buffered + j - base, []])
+            else:
+                start, children = stack.pop()
+                span = (start, self._buffered + j - base + 1, children)
+                if stack:
+                    stack[-1][1].append(span)
+                    continue
+                self._pieces.append(chunk[base:pos])
+                text = "".join(self._pieces)
+                for rel_start, obj in _parse_span(text, span, MAX_RETRY_DEPTH):
+                    found.append((self._start + rel_start, obj))
+                self._pieces = []
+                self._buffered = 0
+
+        if stack:
+            self._pieces.append(chunk[base:])
+            self._buffered += n - base
+        self._offset += n
+        return found
+
+    def flush(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Finish scanning. An unclosed brace (e.g., in prose) would otherwise hide
+        the complete objects that follow it, so those are returned here.
+
+        Returns:
+            (start offset, parsed object) for each complete object inside unclosed braces
+        """
+        found = []
+        if self._stack:
+            text = "".join(self._pieces)
+            for _, children in self._stack:
+                for child in children:
+                    for rel_start, obj in _parse_span(text, child, MAX_RETRY_DEPTH):
+                        found.append((self._start + rel_start, obj))
+        self._pieces = []
+        self._buffered = 0
+        self._stack.clear()
+        self._in_string = False
+        self._escape = False
+        return found
+
+
+def _parse_span(text: str, span: Tuple[int, int, list], retry_depth: int) -> List[Tuple[int, Dict[str, Any]]]:
+    """Parse a balanced span, falling back to its nested spans if it is not a JSON object."""
+    start, end, children = span
+    if _OBJECT_START_RE.match(text, start):
+        try:
+            obj = json.loads(text[start:end])
+            if isinstance(obj, dict):
+                return [(start, obj)]
+        except ValueError:
+            pass
+    if retry_depth <= 0:
+        return []
+    found = []
+    for child in children:
+        found.extend(_parse_span(text, child, retry_depth - 1))
+    return found
+
+
+def iter_json_objects(text: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the top-level JSON objects in a text, in order.
+
+    Args:
+        text: Text that may contain JSON objects among other content
+
+    Yields:
+        Parsed objects
+    """
+    scanner = JsonObjectScanner()
+    for _, obj in scanner.feed(text):
+        yield obj
+    for _, obj in scanner.flush():
+        yield obj
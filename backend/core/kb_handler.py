@@ -5,15 +5,18 @@ import requests
 import json
 import csv
 import io
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
+from .config import KB_FETCH_TIMEOUT_SECONDS
+from .deadline import Deadline, call_timeout
 
 
-def fetch_kb_content(s3_url: str) -> str:
+def fetch_kb_content(s3_url: str, timeout: float = KB_FETCH_TIMEOUT_SECONDS) -> str:
     """
     Fetch content from an S3 URL.
     
     Args:
         s3_url: S3 URL to fetch from (HTTP/HTTPS URL)
+        timeout: Request timeout in seconds
     
     Returns:
         Raw content as string
@@ -28,7 +31,7 @@ def fetch_kb_content(s3_url: str) -> str:
     
     print(f"DEBUG: Fetching KB content from: {s3_url}")
     try:
-        response = requests.get(s3_url, timeout=30)
+        response = requests.get(s3_url, timeout=timeout)
         response.raise_for_status()
         content = response.text
         print(f"DEBUG: Successfully fetched {len(content)} characters from {s3_url}")
@@ -83,18 +86,19 @@ def parse_csv_content(content: str) -> str:
         return content
 
 
-def get_kb_content(s3_url: str) -> str:
+def get_kb_content(s3_url: str, timeout: float = KB_FETCH_TIMEOUT_SECONDS) -> str:
     """
     Fetch and parse knowledge base content from S3 URL.
     Automatically detects JSON or CSV format.
     
     Args:
         s3_url: S3 URL to fetch from
+        timeout: Request timeout in seconds
     
     Returns:
         Parsed and formatted content as string
     """
-    content = fetch_kb_content(s3_url)
+    content = fetch_kb_content(s3_url, timeout=timeout)
     
     if not content or not content.strip():
         print(f"WARNING: Fetched content from {s3_url} is empty")
@@ -134,13 +138,20 @@ def get_kb_content(s3_url: str) -> str:
         return content
 
 
-def format_kbs_for_prompt(knowledge_bases: List[Dict[str, Any]]) -> str:
+def format_kbs_for_prompt(
+    knowledge_bases: List[Dict[str, Any]],
+    deadline: Optional[Deadline] = None,
+    trim_content: Optional[Callable[[str], str]] = None
+) -> str:
     """
     Format knowledge bases for inclusion in system prompt.
     Fetches content from S3 URLs on each call.
     
     Args:
         knowledge_bases: List of knowledge base dicts with 'url', 'name', 'description', 'id'
+        deadline: Optional request deadline; each fetch gets at most the time left
+        trim_content: Optional function applied to each KB's content (e.g., to keep
+            only its beginning under load)
     
     Returns:
         Formatted string with KB content
@@ -167,8 +178,11 @@ def format_kbs_for_prompt(knowledge_bases: List[Dict[str, Any]]) -> str:
         
         try:
             print(f"DEBUG: Fetching KB content from {kb_url}")
-            kb_content = get_kb_content(kb_url)
+            timeout = call_timeout(deadline, KB_FETCH_TIMEOUT_SECONDS, f"fetching KB {kb_id}")
+            kb_content = get_kb_content(kb_url, timeout=timeout)
             print(f"DEBUG: Successfully fetched KB content, length: {len(kb_content)} chars")
+            if trim_content is not None:
+                kb_content = trim_content(kb_content)
             
             if not kb_content or not kb_content.strip():
                 print(f"WARNING: KB {kb_id} content is empty after fetch")
@@ -1,9 +1,36 @@
 """
 LLM Client wrapper for vLLM endpoints.
 """
+import json
+import time
 import requests
-from typing import Optional
-from .config import API_KEY, MODEL_NAME, DEFAULT_MAX_TOKENS, get_base_url
+from typing import Dict, List, Optional, Iterator
+from .config import (
+    API_KEY, MODEL_NAME, DEFAULT_MAX_TOKENS, LLM_REQUEST_TIMEOUT_SECONDS, LLM_QUEUE_TIMEOUT_SECONDS,
+    get_base_url,
+)
+from .concurrency_limiter import get_limiter
+from .deadline import Deadline, DeadlineExceeded, call_timeout
+
+# Responses that mean the endpoint is saturated
+_OVERLOAD_STATUS_CODES = (429, 503)
+
+
+def _is_overload(error: Exception) -> bool:
+    """True if a failed call means the endpoint is saturated (timeout, refused, or 429/503)."""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code in _OVERLOAD_STATUS_CODES
+
+
+def _build_messages(prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+    """Build the chat messages list from a prompt and optional system prompt."""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
 
 
 def chat(
@@ -12,6 +39,7 @@ def chat(
     system_prompt: Optional[str] = None,
     max_tokens: int = DEFAULT_MAX_TOKENS,
     model: str = MODEL_NAME,
+    deadline: Optional[Deadline] = None,
 ) -> str:
     """
     Send a chat completion request to the vLLM endpoint.
@@ -22,35 +50,225 @@ def chat(
         system_prompt: Optional system prompt
         max_tokens: Maximum tokens to generate
         model: Model name to use
+        deadline: Optional request deadline; the call times out when it does
     
     Returns:
         Response content from the LLM
     
     Raises:
         requests.HTTPError: If the API request fails
+        EndpointOverloaded: If the endpoint's wait queue is full or the wait times out
+        DeadlineExceeded: If the deadline expires before or during the call
+    """
+    return chat_messages(
+        _build_messages(prompt, system_prompt),
+        endpoint,
+        max_tokens=max_tokens,
+        model=model,
+        deadline=deadline,
+    )
+
+
+def chat_messages(
+    messages: List[Dict[str, str]],
+    endpoint: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    model: str = MODEL_NAME,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Send a multi-turn chat completion request to the vLLM endpoint.
+
+    Args:
+        messages: Full message history ({"role", "content"} dicts). Keep it
+            append-only across turns so vLLM can reuse the cached prefix.
+        endpoint: Endpoint value (CORE, EVEN, ODD, or numeric value)
+        max_tokens: Maximum tokens to generate
+        model: Model name to use
+        deadline: Optional request deadline; the call times out when it does and is
+            aborted when the request is cancelled
+
+    Returns:
+        Response content from the LLM
+
+    Raises:
+        requests.HTTPError: If the API request fails
+        EndpointOverloaded: If the endpoint's wait queue is full or the wait times out
+        DeadlineExceeded: If the deadline expires before or during the call
+            (RequestCancelled if the request is cancelled)
     """
+    if deadline is not None:
+        # Streamed so that cancelling the request can close the connection mid-generation
+        return "".join(
+            chat_messages_stream(messages, endpoint, max_tokens=max_tokens, model=model, deadline=deadline)
+        )
+
     base_url = get_base_url(endpoint)
     
     # Ensure base_url doesn't have trailing slash before appending path
     base_url = base_url.rstrip('/')
     
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
+    # Wait for a slot under the endpoint's concurrency limit (or be rejected).
+    # Without streaming there is no time to first token, so only failures adjust the limit.
+    limiter = get_limiter(base_url)
+    limiter.acquire(LLM_QUEUE_TIMEOUT_SECONDS)
+    overloaded = False
+    try:
+        resp = requests.post(
+            f"{base_url}/chat/completions",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {API_KEY}",
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+            },
+            timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+        )
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        overloaded = _is_overload(e)
+        raise
+    finally:
+        limiter.release(overloaded=overloaded)
+    return resp.json()["choices"][0]["message"]["content"]
+
+
+
+def chat_stream(
+    prompt: str,
+    endpoint: str,
+    system_prompt: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    model: str = MODEL_NAME,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[str]:
+    """
+    Send a streaming chat completion request to the vLLM endpoint.
+    
+    Args:
+        prompt: User prompt/message
+        endpoint: Endpoint value (CORE, EVEN, ODD, or numeric value)
+        system_prompt: Optional system prompt
+        max_tokens: Maximum tokens to generate
+        model: Model name to use
+        deadline: Optional request deadline; the call times out when it does
+    
+    Yields:
+        Content chunks as they are generated
     
-    resp = requests.post(
-        f"{base_url}/chat/completions",
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {API_KEY}",
-        },
-        json={
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-        },
+    Raises:
+        requests.HTTPError: If the API request fails
+        EndpointOverloaded: If the endpoint's wait queue is full or the wait times out
+        DeadlineExceeded: If the deadline expires before or during the call
+    """
+    return chat_messages_stream(
+        _build_messages(prompt, system_prompt),
+        endpoint,
+        max_tokens=max_tokens,
+        model=model,
+        deadline=deadline,
     )
-    resp.raise_for_status()
-    return resp.json()["choices"][0]["message"]["content"]
 
+
+def chat_messages_stream(
+    messages: List[Dict[str, str]],
+    endpoint: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    model: str = MODEL_NAME,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[str]:
+    """
+    Send a streaming multi-turn chat completion request to the vLLM endpoint.
+
+    Args:
+        messages: Full message history ({"role", "content"} dicts)
+        endpoint: Endpoint value (CORE, EVEN, ODD, or numeric value)
+        max_tokens: Maximum tokens to generate
+        model: Model name to use
+        deadline: Optional request deadline; the call times out when it does, and
+            cancelling the request closes the connection so vLLM aborts the sequence
+
+    Yields:
+        Content chunks as they are generated
+
+    Raises:
+        requests.HTTPError: If the API request fails
+        EndpointOverloaded: If the endpoint's wait queue is full or the wait times out
+        DeadlineExceeded: If the deadline expires before or during the call
+            (RequestCancelled if the request is cancelled)
+    """
+    base_url = get_base_url(endpoint).rstrip('/')
+    
+    # Wait for a slot under the endpoint's concurrency limit (or be rejected)
+    limiter = get_limiter(base_url)
+    limiter.acquire(call_timeout(deadline, LLM_QUEUE_TIMEOUT_SECONDS, "waiting for LLM endpoint"), deadline)
+    started = time.monotonic()
+    first_token_latency = None
+    overloaded = False
+    try:
+        # The timeout bounds the connection and each wait for the next chunk
+        try:
+            resp = requests.post(
+                f"{base_url}/chat/completions",
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {API_KEY}",
+                },
+                json={
+                    "model": model,
+                    "messages": messages,
+                    "max_tokens": max_tokens,
+                    "stream": True,
+                },
+                stream=True,
+                timeout=call_timeout(deadline, LLM_REQUEST_TIMEOUT_SECONDS, "LLM call"),
+            )
+        except requests.RequestException as e:
+            overloaded = _is_overload(e)
+            if isinstance(e, requests.Timeout) and deadline is not None and deadline.expired():
+                raise deadline.exceeded("during LLM call") from e
+            raise
+        # Cancelling the request closes the connection even while waiting for a chunk
+        unregister = deadline.on_cancel(resp.close) if deadline is not None else None
+        try:
+            resp.raise_for_status()
+            # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+            for line in resp.iter_lines(decode_unicode=True):
+                if first_token_latency is None:
+                    # Time to first token: how long vLLM queued and prefilled the request
+                    first_token_latency = time.monotonic() - started
+                if deadline is not None and deadline.expired():
+                    # Closing the connection (below) makes vLLM abort the sequence
+                    raise deadline.exceeded("during LLM stream")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if not choices:
+                    continue
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+            else:
+                # No [DONE]: the stream was cut short, possibly by cancel()
+                if deadline is not None and deadline.expired():
+                    raise deadline.exceeded("during LLM stream")
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # A read timeout, or a read from the connection closed by cancel(), fails here
+            if deadline is not None and deadline.expired():
+                raise deadline.exceeded("during LLM stream") from e
+            overloaded = _is_overload(e)
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+            resp.close()
+    finally:
+        limiter.release(first_token_latency, overloaded)
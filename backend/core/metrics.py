@@ -0,0 +1,78 @@
+"""
+In-process metrics registry for counters, gauges, and timing observations.
+"""
+import threading
+from typing import Dict, Any
+
+
+class Metrics:
+    """Thread-safe collection of named counters, gauges, and observations."""
+
+    def __init__(self):
+        """Initialize an empty metrics collection."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._observations: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: Counter name (e.g., "refinement.decision.llm")
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name: Gauge name
+            value: Current value
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record an observation (e.g., a latency in seconds).
+        Keeps count, sum, min, and max rather than raw samples.
+
+        Args:
+            name: Observation name
+            value: Observed value
+        """
+        with self._lock:
+            obs = self._observations.get(name)
+            if obs is None:
+                self._observations[name] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            obs["count"] += 1
+            obs["sum"] += value
+            obs["min"] = min(obs["min"], value)
+            obs["max"] = max(obs["max"], value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a point-in-time copy of all metrics.
+
+        Returns:
+            Dict with 'counters', 'gauges', and 'observations'
+        """
+        with self._lock:
+            observations = {}
+            for name, obs in self._observations.items():
+                observations[name] = dict(obs, avg=obs["sum"] / obs["count"])
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "observations": observations,
+            }
+
+
+# Process-wide metrics (endpoint- and transport-level)
+global_metrics = Metrics()
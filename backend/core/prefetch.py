@@ -0,0 +1,240 @@
+"""
+Speculative prefetch of tool inputs named in a query (e.g., "explain src/app/page.tsx
+in owner/repo"), started while the query is still being routed.
+"""
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from .config import PREFETCH_MAX_FILES, PREFETCH_MAX_BYTES, TOOL_REQUEST_TIMEOUT_SECONDS
+from .deadline import Deadline
+from .metrics import Metrics
+from .tool_registry import ToolRegistry
+from .tools.github_rate_limit import BACKGROUND
+from .tools.github_tool import get_file_contents
+from .tools.jira_metadata import jira_metadata
+
+# Threads shared by the prefetches of all queries
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="prefetch")
+
+# https://github.com/<owner>/<repo>/blob/<ref>/<path> and raw.githubusercontent.com/<owner>/<repo>/<ref>/<path>
+_FILE_URL = re.compile(
+    r"https?://(?:github\.com/([\w.-]+)/([\w.-]+)/blob|raw\.githubusercontent\.com/([\w.-]+)/([\w.-]+))"
+    r"/([^/\s]+)/([^\s?#)\]'\"<>`]+)"
+)
+_URL = re.compile(r"https?://\S+")
+
+# "in owner/repo", "from the repo owner/repo", ... (not followed by more path segments)
+_REPO = re.compile(
+    r"\b(?:in|from|repo|repository)\s+(?:the\s+)?(?:repo(?:sitory)?\s+)?`?"
+    r"([A-Za-z0-9][\w-]*)/([\w.-]*\w)(?![\w/-])",
+    re.IGNORECASE
+)
+
+# File paths: optional directories, a name, and an extension with a letter in it
+_PATH = re.compile(r"(?<![\w/.:@-])((?:[\w.-]+/)*[\w-][\w.-]*\.[A-Za-z][A-Za-z0-9]{0,9})(?![\w/])")
+
+# Extensions of host names rather than files, when there is no directory part
+_HOST_SUFFIXES = {"com", "org", "net", "io", "dev", "ai", "co", "app"}
+
+# Queries that are likely to create Jira issues
+_JIRA_MENTION = re.compile(r"\b(?:jira|tickets?|issues?|bugs?)\b", re.IGNORECASE)
+
+# (owner, repo, path, ref) of a file; owner and repo lowercased, ref "" for the default branch
+FileTarget = Tuple[str, str, str, str]
+
+# (tool ID, file target): a prefetched file is only served to the tool whose token fetched it
+_Fetch = Tuple[Any, FileTarget]
+
+
+def find_github_files(query: str) -> List[FileTarget]:
+    """
+    Find GitHub files a query names: file URLs, and file paths in a query that names
+    exactly one repository ("in owner/repo"). Of several repository candidates, ones
+    with a dot in their name are taken for file paths ("from src/config.py").
+
+    Args:
+        query: User query
+
+    Returns:
+        Targets in order of appearance, without duplicates
+    """
+    targets: List[FileTarget] = []
+    for match in _FILE_URL.finditer(query):
+        owner, repo = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        targets.append(_target(owner, repo, match.group(6).rstrip(".,;:"), match.group(5)))
+
+    text = _URL.sub(" ", query)
+    repos = {(match.group(1).lower(), match.group(2).lower()): match.span() for match in _REPO.finditer(text)}
+    if len(repos) > 1:
+        repos = {name: span for name, span in repos.items() if "." not in name[1]}
+    if len(repos) == 1:
+        (owner, repo), repo_span = next(iter(repos.items()))
+        for match in _PATH.finditer(text):
+            if match.start() < repo_span[1] and match.end() > repo_span[0]:
+                continue
+            path = match.group(1).rstrip(".")
+            if "/" not in path and (path.rsplit(".", 1)[-1].lower() in _HOST_SUFFIXES or len(path.split(".")[0]) < 2):
+                continue
+            targets.append(_target(owner, repo, path, ""))
+    return list(dict.fromkeys(targets))
+
+
+def _target(owner: str, repo: str, path: str, ref: str) -> FileTarget:
+    """Normalized file target (GitHub owners and repos are case-insensitive)."""
+    return owner.lower(), repo.lower(), path.strip("/"), ref
+
+
+class Prefetch:
+    """
+    Speculative tool fetches for one query.
+
+    Started before the query is routed, so GitHub files the query names are already
+    downloaded (at BACKGROUND priority, at most PREFETCH_MAX_BYTES each) with each
+    of the system's GitHub tools when a sub-agent asks for them; its get_file_contents
+    call then uses the content its own tool prefetched, waiting for it if the download
+    is already running. A prefetch still queued or waiting for rate-limit budget does
+    not hold the call up: the call runs on its own. Files read in full also land in
+    the GitHub file cache. Prefetched files no call used are counted as waste
+    when the query ends.
+    """
+
+    def __init__(self, metrics: Metrics, max_files: int = PREFETCH_MAX_FILES, max_bytes: int = PREFETCH_MAX_BYTES):
+        """
+        Initialize an empty prefetch.
+
+        Args:
+            metrics: Metrics of the system, receiving the prefetch counters
+            max_files: Most files fetched per GitHub tool
+            max_bytes: Largest file kept (larger files are left to the sub-agent's call)
+        """
+        self.metrics = metrics
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._files: Dict[_Fetch, Future] = {}
+        # Set once a fetch's download is under way (past the rate-limit scheduler)
+        self._started: Dict[_Fetch, threading.Event] = {}
+        self._used: set = set()
+        self._lock = threading.Lock()
+
+    def start(self, query: str, registry: ToolRegistry, deadline: Deadline) -> int:
+        """
+        Start fetching what the query names, with the system's tools.
+
+        Args:
+            query: User query
+            registry: The system's tools
+            deadline: Request deadline; fetches time out with it
+
+        Returns:
+            Number of files being fetched (over all GitHub tools)
+        """
+        handlers = registry.handlers()
+        targets = find_github_files(query)[:self.max_files] if self.max_files > 0 else []
+        if targets:
+            timeout = min(TOOL_REQUEST_TIMEOUT_SECONDS, deadline.remaining())
+            # Each tool fetches with its own token, so no call gets content its tool could not read
+            for handler in handlers:
+                if handler.name != "github" or not handler.tool.get('api_key'):
+                    continue
+                for target in targets:
+                    fetch = (handler.tool_id, target)
+                    self._started[fetch] = threading.Event()
+                    self._files[fetch] = _executor.submit(
+                        self._fetch, target, handler.tool['api_key'], timeout, self._started[fetch]
+                    )
+                    self.metrics.incr("prefetch.started")
+
+        # Jira projects and issue types are fetched again once their cache entry expired
+        if _JIRA_MENTION.search(query):
+            for handler in handlers:
+                if handler.name == "jira" and jira_metadata.describe(
+                    handler.tool.get('api_url', ''), handler.tool.get('email', '')
+                ) is None:
+                    handler.warm()
+                    self.metrics.incr("prefetch.jira_metadata")
+        return len(self._files)
+
+    def take(self, tool_id: Any, mcp_call: Dict[str, Any], timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Result of a GitHub call from the files prefetched with its tool, if one matches it.
+
+        Args:
+            tool_id: ID of the GitHub tool the call is made with
+            mcp_call: MCP call parameters of a GitHub tool
+            timeout: The call's timeout (half of it is spent waiting for a download
+                already running, at most)
+
+        Returns:
+            Tool result dict, or None if nothing prefetched answers the call
+        """
+        if mcp_call.get('action', 'get_file_contents') != 'get_file_contents':
+            return None
+        if mcp_call.get('start_line') or mcp_call.get('end_line'):
+            return None
+        if not all(isinstance(mcp_call.get(key), str) for key in ("owner", "repo", "path")):
+            return None
+        fetch = (tool_id, _target(mcp_call['owner'], mcp_call['repo'], mcp_call['path'], mcp_call.get('ref') or ""))
+        future = self._files.get(fetch)
+        if future is None:
+            return None
+        if future.cancel():
+            # Still queued behind other prefetches: the call is quicker on its own
+            self.metrics.incr("prefetch.cancelled")
+            return None
+        if not self._started[fetch].is_set() and not future.done():
+            # Waiting for rate-limit budget at BACKGROUND priority, which the call would
+            # get first; it runs on its own and the prefetch counts as waste
+            return None
+        try:
+            # Leave the call itself time to run if the prefetch is stuck (e.g., waiting
+            # for rate-limit budget at BACKGROUND priority)
+            result = future.result(timeout=timeout / 2)
+        except Exception:
+            return None
+        if result is None:
+            return None
+        with self._lock:
+            self._used.add(fetch)
+        self.metrics.incr("prefetch.hits")
+        return {"success": True, "result": dict(result)}
+
+    def finish(self) -> None:
+        """Count the prefetched files no call used (once each finishes downloading)."""
+        for fetch, future in self._files.items():
+            with self._lock:
+                if fetch in self._used:
+                    continue
+            future.add_done_callback(self._count_waste)
+
+    def _fetch(
+        self,
+        target: FileTarget,
+        api_key: str,
+        timeout: float,
+        started: threading.Event
+    ) -> Optional[Dict[str, Any]]:
+        """Download a file; None if it failed or is larger than max_bytes."""
+        owner, repo, path, ref = target
+        try:
+            result = get_file_contents(
+                owner, repo, path, api_key, timeout=timeout, ref=ref or None,
+                max_bytes=self.max_bytes, priority=BACKGROUND, started=started
+            )
+        except Exception as e:
+            print(f"DEBUG: Prefetch of {owner}/{repo}/{path} failed: {e}")
+            self.metrics.incr("prefetch.failed")
+            return None
+        self.metrics.incr("prefetch.bytes", result.get("size", 0))
+        if result.get("truncated"):
+            # Cut short by the prefetch cap; the sub-agent's own call reads more
+            self.metrics.incr("prefetch.too_large")
+            return None
+        return result
+
+    def _count_waste(self, future: Future) -> None:
+        """Count an unused prefetched file."""
+        result = None if future.cancelled() or future.exception() else future.result()
+        if result is not None:
+            self.metrics.incr("prefetch.wasted")
+            self.metrics.incr("prefetch.wasted_bytes", result.get("size", 0))
@@ -0,0 +1,323 @@
+"""
+Refinement policy for deciding how a sub-agent response is cleaned up before it is returned.
+"""
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from .config import MAX_RESPONSE_LENGTH, LLM_QUEUE_TIMEOUT_SECONDS, LLM_REQUEST_TIMEOUT_SECONDS
+from .deadline import Deadline
+
+
+# Refinement decisions
+PASSTHROUGH = "passthrough"
+CLEANUP = "cleanup"
+LLM = "llm"
+
+REFINEMENT_MODES = ("auto", PASSTHROUGH, CLEANUP, LLM)
+
+_REASONING_MARKER_RE = re.compile(r'</?(?:think|reasoning)>', re.IGNORECASE)
+_CLOSING_MARKER_RE = re.compile(r'</(?:think|reasoning)>', re.IGNORECASE)
+_TOOL_CALL_RE = re.compile(r'"tool_id"|"tool_call"')
+_TOOL_TRANSCRIPT_RE = re.compile(
+    r'"tool_id"|"tool_call"|^Tool Result:|^Tool execution|^Agent:',
+    re.MULTILINE
+)
+_REASONING_PREAMBLE_RE = re.compile(
+    r'^\s*(?:let me|okay,|i need to|first, i|wait,|but wait,|hmm,|maybe i should|i should)',
+    re.IGNORECASE
+)
+
+# Longest reasoning marker, minus one: how far back to rescan for a marker split across chunks
+_MARKER_LOOKBACK = len('</reasoning>') - 1
+
+
+def classify_response(response: str) -> Dict[str, Any]:
+    """
+    Classify a sub-agent response by the features that determine how much cleanup it needs.
+
+    Args:
+        response: Raw sub-agent response
+
+    Returns:
+        Dict with:
+        {
+            "length": <total length in characters>,
+            "answer_length": <length after the last reasoning marker>,
+            "has_think": <True if reasoning markers are present>,
+            "has_tool_transcript": <True if tool-call JSON or tool results are present>,
+            "has_reasoning_preamble": <True if the answer opens with reasoning phrases>
+        }
+    """
+    answer_start = 0
+    has_think = False
+    for match in _REASONING_MARKER_RE.finditer(response):
+        has_think = True
+        answer_start = match.end()
+    answer = response[answer_start:]
+
+    return {
+        "length": len(response),
+        "answer_length": len(answer.strip()),
+        "has_think": has_think,
+        "has_tool_transcript": _TOOL_TRANSCRIPT_RE.search(response) is not None,
+        "has_reasoning_preamble": _REASONING_PREAMBLE_RE.match(answer) is not None,
+    }
+
+
+class RefinementPolicy:
+    """Per-system policy that picks pass-through, deterministic cleanup, or LLM refinement."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the refinement policy.
+
+        Args:
+            config: Optional policy configuration:
+                - mode: "auto" (default), "passthrough", "cleanup", or "llm"
+                - max_passthrough_length: Longest answer (in characters) that is returned
+                  without LLM refinement (default: MAX_RESPONSE_LENGTH)
+                - refine_tool_transcripts: Use LLM refinement when the response contains
+                  tool calls or tool results (default: True)
+                - pipelined: Stream the sub-agent answer and refine it section by section
+                  while it is still being generated (default: False)
+
+        Raises:
+            ValueError: If mode is not a known refinement mode
+        """
+        config = config or {}
+        self.mode = config.get('mode', 'auto')
+        if self.mode not in REFINEMENT_MODES:
+            raise ValueError(
+                f"Invalid refinement mode: {self.mode}. Must be one of {', '.join(REFINEMENT_MODES)}"
+            )
+        self.max_passthrough_length = int(config.get('max_passthrough_length', MAX_RESPONSE_LENGTH))
+        self.refine_tool_transcripts = bool(config.get('refine_tool_transcripts', True))
+        self.pipelined = bool(config.get('pipelined', False))
+
+    def decide(self, features: Dict[str, Any]) -> str:
+        """
+        Decide how to refine a response.
+
+        Args:
+            features: Output of classify_response()
+
+        Returns:
+            One of PASSTHROUGH, CLEANUP, or LLM
+        """
+        if self.mode != 'auto':
+            return self.mode
+
+        # Tool transcripts need summarizing, not just stripping
+        if features['has_tool_transcript'] and self.refine_tool_transcripts:
+            return LLM
+
+        # Answers that are too long need condensing
+        if features['answer_length'] > self.max_passthrough_length:
+            return LLM
+
+        # Reasoning blocks and preambles can be removed deterministically
+        if features['has_think'] or features['has_reasoning_preamble']:
+            return CLEANUP
+
+        return PASSTHROUGH
+
+
+class PipelinedRefiner:
+    """
+    Refines a streamed sub-agent answer section by section while it is still being generated.
+
+    Chunks are fed as they arrive. Once the reasoning section has closed (a closing
+    think/reasoning marker), each completed section of the answer is refined in the
+    background, so refinement overlaps with the rest of the sub-agent generation.
+    Refinements of sections that are discarded (the model reopened its reasoning, or
+    the turn was a tool call) are cancelled, closing their LLM calls.
+
+    With an "auto" policy, sections are only refined once the answer is longer than
+    the policy's max_passthrough_length (so it would be refined by an LLM anyway);
+    until then nothing is submitted, and the caller decides on the full answer.
+    """
+
+    def __init__(
+        self,
+        core_agent: Any,
+        original_query: str,
+        segment_chars: int = 600,
+        max_workers: int = 2,
+        deadline: Optional[Deadline] = None,
+        policy: Optional[RefinementPolicy] = None
+    ):
+        """
+        Initialize the pipelined refiner.
+
+        Args:
+            core_agent: CoreAgent used for refinement
+            original_query: Original user query
+            segment_chars: Minimum section size (in characters) before it is refined
+            max_workers: Maximum number of concurrent refinement calls
+            deadline: Optional request deadline for the refinement calls
+            policy: Optional refinement policy; in "auto" mode, short answers are not
+                refined section by section (without a policy, every answer is)
+        """
+        self.core_agent = core_agent
+        self.original_query = original_query
+        self.segment_chars = segment_chars
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.policy = policy
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: List[Future] = []
+        # Deadline of the submitted sections' refinements, cancelled when they are discarded
+        self._segment_deadline: Optional[Deadline] = None
+        self._segments: List[str] = []
+        self._raw: List[str] = []
+        self._pending = ""
+        self._scan_from = 0
+        self._reasoning_closed = False
+        self._hold = False
+
+    @property
+    def has_output(self) -> bool:
+        """True if the current answer has any streamed content."""
+        return bool(self._raw)
+
+    @property
+    def refining(self) -> bool:
+        """True if sections of the current answer were submitted for refinement."""
+        return bool(self._segments)
+
+    def feed(self, chunk: str) -> None:
+        """
+        Feed the next chunk of the sub-agent answer.
+
+        Args:
+            chunk: Streamed content chunk
+        """
+        self._raw.append(chunk)
+        self._pending += chunk
+
+        # Anything before a closing reasoning marker is reasoning: drop it,
+        # including sections already submitted if the model reopened its reasoning
+        marker_end = None
+        for match in _CLOSING_MARKER_RE.finditer(self._pending, max(0, self._scan_from - _MARKER_LOOKBACK)):
+            marker_end = match.end()
+        if marker_end is not None:
+            self._discard_segments()
+            self._pending = self._pending[marker_end:]
+            self._reasoning_closed = True
+            self._hold = False
+        self._scan_from = len(self._pending)
+
+        if not self._reasoning_closed or self._hold:
+            return
+        if not self.refining and not self._needs_refinement():
+            return
+
+        # Submit completed sections (ending at a paragraph break) for refinement
+        boundary = self._pending.rfind('\n\n')
+        if boundary < self.segment_chars:
+            return
+        segment = self._pending[:boundary].strip()
+        if _TOOL_CALL_RE.search(segment):
+            # Looks like a tool call; keep everything for finish() or reset()
+            self._hold = True
+            return
+        self._pending = self._pending[boundary + 2:]
+        self._scan_from = len(self._pending)
+        if segment:
+            self._submit(segment)
+
+    def reset(self) -> None:
+        """Discard everything fed so far (e.g., the streamed turn was a tool call)."""
+        self._discard_segments()
+        self._raw = []
+        self._pending = ""
+        self._scan_from = 0
+        self._reasoning_closed = False
+        self._hold = False
+
+    def finish(self) -> str:
+        """
+        Refine the remaining answer and join all refined sections in order.
+
+        Returns:
+            Refined response
+        """
+        try:
+            if not self._reasoning_closed:
+                # Reasoning never closed, so nothing could overlap: refine the whole answer
+                return self.core_agent.refine_response("".join(self._raw), self.original_query, deadline=self.deadline)
+
+            remainder = self._pending.strip()
+            if remainder:
+                self._submit(remainder)
+            refined = [future.result() for future in self._futures]
+        finally:
+            # Stops refinements still running if one of them failed
+            self._cancel_segments()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+
+        cleaned = "\n\n".join(part.strip() for part in refined if part.strip())
+        # Fall back to deterministic cleanup if refinement produced too little
+        # (or of the whole draft, if nothing followed the reasoning)
+        if len(cleaned) < 50:
+            cleaned = self.core_agent._clean_response_simple("\n\n".join(self._segments) or "".join(self._raw))
+        return truncate_response(cleaned).strip()
+
+    def _needs_refinement(self) -> bool:
+        """Whether the answer so far is sure to get LLM refinement under the policy."""
+        if self.policy is None or self.policy.mode == LLM:
+            return True
+        return len(self._pending.strip()) > self.policy.max_passthrough_length
+
+    def _submit(self, segment: str) -> None:
+        """Submit a section for background refinement."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        if self._segment_deadline is None:
+            if self.deadline is not None:
+                self._segment_deadline = self.deadline.child()
+            else:
+                self._segment_deadline = Deadline(LLM_QUEUE_TIMEOUT_SECONDS + LLM_REQUEST_TIMEOUT_SECONDS)
+        self._segments.append(segment)
+        max_length = min(len(segment), MAX_RESPONSE_LENGTH)
+        self._futures.append(
+            self._executor.submit(
+                self.core_agent.refine_segment, segment, self.original_query, max_length, self._segment_deadline
+            )
+        )
+
+    def _discard_segments(self) -> None:
+        """Cancel sections already submitted, including refinements already running."""
+        for future in self._futures:
+            future.cancel()
+        self._cancel_segments()
+        self._futures = []
+        self._segments = []
+
+    def _cancel_segments(self) -> None:
+        """Abort the LLM calls of submitted sections still being refined."""
+        if self._segment_deadline is not None:
+            self._segment_deadline.cancel()
+            self._segment_deadline = None
+
+
+def truncate_response(response: str, max_length: int = MAX_RESPONSE_LENGTH) -> str:
+    """
+    Truncate a response to max_length, preferring a word boundary.
+
+    Args:
+        response: Response text
+        max_length: Maximum length in characters
+
+    Returns:
+        Response text, truncated with "..." if it was too long
+    """
+    if len(response) <= max_length:
+        return response
+    truncated = response[:max_length]
+    last_space = truncated.rfind(' ')
+    # Only truncate at word if we're not losing too much
+    if last_space > max_length * 0.8:
+        return truncated[:last_space] + "..."
+    return truncated + "..."
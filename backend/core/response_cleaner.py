@@ -0,0 +1,181 @@
+"""
+Deterministic response cleanup: strips reasoning blocks, reasoning paragraphs, and tool transcripts.
+"""
+import re
+from typing import List, Optional
+
+# Closing reasoning markers: the answer starts after the last one
+_REASONING_END_RE = re.compile(r'</think>|</reasoning>', re.IGNORECASE)
+
+# Longest closing marker, minus one: how far back to rescan for a marker split across chunks
+_MARKER_LOOKBACK = len('</reasoning>') - 1
+
+# A line opening with one of these starts reasoning that runs to the end of its paragraph
+_REASONING_LINE_RE = re.compile(
+    r'^(?:Let me think|Okay, let me|First, I need|Wait,|But wait,|However,|Maybe I should'
+    r'|I need to|I should|Let me check|Let me start)',
+    re.MULTILINE | re.IGNORECASE
+)
+
+# Short paragraphs and lines opening with one of these are dropped
+REASONING_INDICATORS = (
+    'let me', 'i need to', 'first', 'wait', 'but wait', 'however', 'maybe',
+    'i should', 'let me check', 'okay,', 'so,', 'hmm,', 'well,',
+    'no tool was required', 'i used tool', 'the tool', 'internal',
+)
+
+MAX_REASONING_PARAGRAPH_LENGTH = 300
+MAX_REASONING_LINE_LENGTH = 200
+
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_SPACES_RE = re.compile(r' {2,}')
+
+
+def _is_tool_paragraph(paragraph: str) -> bool:
+    """True if a paragraph contains tool-call JSON or tool output."""
+    return 'tool_id' in paragraph or '"tool_call"' in paragraph or 'tool execution' in paragraph.lower()
+
+
+def _filter_lines(text: str) -> str:
+    """Drop short lines that open with a reasoning indicator."""
+    return '\n'.join(
+        line for line in text.split('\n')
+        if len(line) >= MAX_REASONING_LINE_LENGTH
+        or not line.strip().lower().startswith(REASONING_INDICATORS)
+    )
+
+
+class StreamingCleaner:
+    """
+    Cleans a response in one pass, paragraph by paragraph, as its chunks arrive.
+
+    Text before the last closing think/reasoning marker is dropped; a marker that
+    arrives late discards everything cleaned so far. A line opening with a reasoning
+    phrase is cut to the end of its paragraph. Short reasoning paragraphs and lines,
+    and paragraphs with tool calls or tool output, are dropped. If nothing is left,
+    the whole answer is kept with only its reasoning lines removed.
+
+    Usable as a router stream_sink (feed/reset) or, via clean_response(), on a whole text.
+    """
+
+    def __init__(self):
+        """Initialize an empty cleaner."""
+        self.resets = 0
+        self._start()
+
+    def _start(self) -> None:
+        """Start a new answer."""
+        self._has_output = False
+        # Unfinished last paragraph, and its last few characters
+        self._pieces: List[str] = []
+        self._tail = ""
+        self._skip_whitespace = False
+        # Cleaned paragraphs, and the uncleaned ones for the nothing-left fallback
+        self._cleaned: List[str] = []
+        self._kept_any = False
+        self._truncated: Optional[List[str]] = []
+
+    @property
+    def has_output(self) -> bool:
+        """True if the current answer has any content."""
+        return self._has_output
+
+    def feed(self, chunk: str) -> None:
+        """
+        Feed the next chunk of the response.
+
+        Args:
+            chunk: Response text chunk
+        """
+        if not chunk:
+            return
+        self._has_output = True
+
+        # Anything before a closing reasoning marker is reasoning: start over after it
+        window = self._tail + chunk
+        marker_end = None
+        for match in _REASONING_END_RE.finditer(window):
+            marker_end = match.end()
+        if marker_end is not None:
+            self._start()
+            self._has_output = True
+            self._skip_whitespace = True
+            chunk = window[marker_end:]
+
+        if self._skip_whitespace:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+            self._skip_whitespace = False
+
+        # Clean the paragraphs completed by this chunk (a break may straddle chunks)
+        self._pieces.append(chunk)
+        if '\n\n' in self._tail[-1:] + chunk:
+            paragraphs = ''.join(self._pieces).split('\n\n')
+            # Empty paragraphs only add blank lines, which are collapsed anyway
+            for paragraph in filter(None, paragraphs[:-1]):
+                self._add_paragraph(paragraph)
+            pending = paragraphs[-1]
+            self._pieces = [pending] if pending else []
+            self._tail = pending[-_MARKER_LOOKBACK:]
+        else:
+            self._tail = (self._tail + chunk)[-_MARKER_LOOKBACK:]
+
+    def reset(self) -> None:
+        """Discard everything fed so far (e.g., the streamed turn was a tool call)."""
+        self.resets += 1
+        self._start()
+
+    def finish(self) -> str:
+        """
+        Clean the last paragraph and join the cleaned answer.
+
+        Returns:
+            Cleaned response text
+        """
+        self._add_paragraph(''.join(self._pieces))
+        self._pieces = []
+        self._tail = ""
+
+        if not self._kept_any:
+            # Everything was filtered out: keep the answer minus reasoning lines
+            cleaned = _filter_lines('\n\n'.join(self._truncated))
+            cleaned = _BLANK_LINES_RE.sub('\n\n', cleaned)
+            return _SPACES_RE.sub(' ', cleaned).strip()
+        return '\n\n'.join(paragraph for paragraph in self._cleaned if paragraph).strip()
+
+    def _add_paragraph(self, paragraph: str) -> None:
+        """Clean one complete paragraph."""
+        match = _REASONING_LINE_RE.search(paragraph)
+        if match is not None:
+            paragraph = paragraph[:match.start()]
+        if self._truncated is not None and paragraph:
+            self._truncated.append(paragraph)
+
+        paragraph = paragraph.strip()
+        if not paragraph:
+            return
+        if len(paragraph) < MAX_REASONING_PARAGRAPH_LENGTH and paragraph.lower().startswith(REASONING_INDICATORS):
+            return
+        if _is_tool_paragraph(paragraph):
+            return
+
+        # Once a paragraph is kept, the fallback is no longer needed
+        self._kept_any = True
+        self._truncated = None
+        self._cleaned.append(_SPACES_RE.sub(' ', _filter_lines(paragraph)))
+
+
+def clean_response(response: str) -> str:
+    """
+    Clean a complete response (see StreamingCleaner).
+
+    Args:
+        response: Raw response text
+
+    Returns:
+        Cleaned response text
+    """
+    cleaner = StreamingCleaner()
+    cleaner.feed(response)
+    return cleaner.finish()
@@ -1,19 +1,41 @@
 """
 Router for routing queries from core agent to sub-agents.
 """
-import json
-import re
-from typing import Dict, List, Any, Optional
-from .llm_client import chat
-from .config import ENDPOINT_EVEN, ENDPOINT_ODD
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from .llm_client import chat_messages, chat_messages_stream
+from .config import (
+    ENDPOINT_EVEN, ENDPOINT_ODD, BRANCH_TIMEOUT_SECONDS, TOOL_CONCURRENCY_PER_TOOL,
+    SUB_AGENT_MAX_TOKENS, HISTORY_RESERVE_FRACTION, MIN_TOOL_ITERATION_SECONDS,
+)
+from .context_assembler import ContextAssembler
+from .deadline import Deadline
+from .json_scanner import JsonObjectScanner, iter_json_objects
+from .metrics import Metrics
 from .kb_handler import format_kbs_for_prompt
-from .tool_handler import format_tools_for_prompt, handle_mcp_tool_call
+from .tool_registry import ToolRegistry
+from .idempotency import idempotent_calls
+from .tool_compactor import compact_tool_result, describe_tool_call, get_result_policy
+
+# Fields of a Jira create_issue call that a bulk create request carries
+_JIRA_ISSUE_KEYS = ("project_key", "summary", "issuetype", "description")
+
+# create_issue calls with only these keys can be coalesced without changing what gets created
+_COALESCIBLE_KEYS = {"tool_id", "action", *_JIRA_ISSUE_KEYS}
 
 
 class Router:
     """Router that routes queries to appropriate sub-agents based on model_id."""
     
-    def __init__(self, models: List[Dict[str, Any]], knowledge_bases: List[Dict[str, Any]], tools: List[Dict[str, Any]]):
+    def __init__(
+        self,
+        models: List[Dict[str, Any]],
+        knowledge_bases: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        metrics: Optional[Metrics] = None,
+        system_id: Optional[str] = None
+    ):
         """
         Initialize the router.
         
@@ -21,10 +43,23 @@ class Router:
             models: List of model configurations
             knowledge_bases: List of knowledge base configurations
             tools: List of tool configurations
+            metrics: Optional metrics collection for token budgets
+            system_id: Optional ID of the system (keeps its tool calls' idempotency keys apart)
+        
+        Raises:
+            ValueError: If a tool names an unknown tool type
         """
         self.models = models
         self.knowledge_bases = knowledge_bases
         self.tools = tools
+        self.tool_registry = ToolRegistry(tools, system_id=system_id)
+        self.metrics = metrics
+        self.assembler = ContextAssembler()
+        # Limit concurrent calls per tool (shared across queries to this system)
+        self._tool_semaphores: Dict[Any, threading.Semaphore] = {
+            tool.get('id'): threading.Semaphore(TOOL_CONCURRENCY_PER_TOOL)
+            for tool in tools
+        }
     
     def _get_model_by_id(self, model_id: int) -> Optional[Dict[str, Any]]:
         """Get model configuration by ID."""
@@ -54,7 +89,11 @@ class Router:
         self,
         model_id: int,
         prompt: str,
-        max_iterations: int = 3
+        max_iterations: int = 3,
+        stream_sink: Optional[Any] = None,
+        deadline: Optional[Deadline] = None,
+        max_tokens: int = SUB_AGENT_MAX_TOKENS,
+        kb_max_tokens: Optional[int] = None
     ) -> str:
         """
         Route a query to a sub-agent and return the result.
@@ -63,9 +102,21 @@ class Router:
             model_id: ID of the model to route to
             prompt: Prompt from core agent
             max_iterations: Maximum number of tool call iterations
+            stream_sink: Optional consumer with feed(chunk) and reset() (e.g., PipelinedRefiner or StreamingCleaner).
+                When set, each LLM call is streamed into it; turns that end in a tool call
+                are reset.
+            deadline: Optional request deadline. KB fetches, LLM calls, and tool calls
+                get at most the time left, and no tool round-trip is started without
+                MIN_TOOL_ITERATION_SECONDS to spare.
+            max_tokens: Generation budget per sub-agent call
+            kb_max_tokens: Optional cap on the KB content in total; each KB keeps only
+                its beginning (its share of the cap)
         
         Returns:
             Text response from sub-agent
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes during an LLM call
         """
         # Get model configuration
         model = self._get_model_by_id(model_id)
@@ -85,30 +136,35 @@ class Router:
         print(f"DEBUG: Available KBs in router: {[(kb.get('id'), kb.get('name', 'Unknown')) for kb in self.knowledge_bases]}")
         
         # Fetch KB content (on each query)
-        kb_content = format_kbs_for_prompt(model_kbs)
+        trim_content = None
+        if kb_max_tokens is not None and model_kbs:
+            # Keep each KB's beginning (its header and first records) within its share
+            per_kb_tokens = kb_max_tokens // len(model_kbs)
+
+            def trim_content(text: str) -> str:
+                return self.assembler.trim_text(text, per_kb_tokens)
+        kb_content = format_kbs_for_prompt(model_kbs, deadline=deadline, trim_content=trim_content)
         
         # Debug: Log if KB content is empty (for troubleshooting)
         if model_kbs and not kb_content.strip():
             print(f"WARNING: Model {model_id} has {len(model_kbs)} KB(s) but KB content is empty. KBs: {[kb.get('name', 'Unknown') for kb in model_kbs]}")
             print(f"DEBUG: KB details: {[(kb.get('id'), kb.get('name'), kb.get('url')) for kb in model_kbs]}")
         
-        # Format tools for MCP
-        tool_content = format_tools_for_prompt(model_tools)
+        # Format tools for MCP (prompt sections are rendered once per system)
+        tool_content = self.tool_registry.format_for_prompt([tool.get('id') for tool in model_tools])
         
-        # Build system prompt
-        kb_instruction = ""
+        # Build system prompt sections (KB content is kept separate so it can be
+        # trimmed to the token budget without losing the surrounding instructions)
+        kb_header = ""
+        kb_footer = ""
         if kb_content.strip():
-            kb_instruction = f"""
-╔══════════════════════════════════════════════════════════════════════════════╗
+            kb_header = """╔══════════════════════════════════════════════════════════════════════════════╗
 ║                    KNOWLEDGE BASES - DATA ALREADY LOADED                     ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 IMPORTANT: The following data has been FETCHED FROM S3 and is ALREADY IN YOUR CONTEXT.
-You can use this data DIRECTLY - NO TOOLS ARE NEEDED. The data is RIGHT BELOW.
-
-{kb_content}
-
-╔══════════════════════════════════════════════════════════════════════════════╗
+You can use this data DIRECTLY - NO TOOLS ARE NEEDED. The data is RIGHT BELOW."""
+            kb_footer = """╔══════════════════════════════════════════════════════════════════════════════╗
 ║                         CRITICAL INSTRUCTIONS                                ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
@@ -132,20 +188,11 @@ EXAMPLE RESPONSE:
 User: "Output the data from the connected S3"
 You: "Here is the data from the connected S3 knowledge base:
 
-[Copy the content from the "ACTUAL DATA CONTENT" section above]"
-
-"""
+[Copy the content from the "ACTUAL DATA CONTENT" section above]\""""
         else:
-            kb_instruction = "\nNote: No knowledge bases are connected to this model.\n"
+            kb_header = "Note: No knowledge bases are connected to this model."
         
-        system_prompt = f"""You are a specialized AI agent with access to knowledge bases and tools.
-
-{kb_instruction}
-
-=== AVAILABLE TOOLS ===
-{tool_content}
-
-You can use tools by requesting them through MCP (Model Context Protocol) capabilities. When you need to use a tool, you MUST respond with a JSON object in this exact format:
+        tool_instructions = f"""You can use tools by requesting them through MCP (Model Context Protocol) capabilities. When you need to use a tool, you MUST respond with a JSON object in this exact format:
 
 {{
   "tool_id": <tool_id_number>,
@@ -173,10 +220,38 @@ For example, to use the Jira tool (tool_id 2) to create an issue:
 }}
 
 IMPORTANT REMINDERS: 
+- If you need several tool calls (for example, several files), output all of the JSON objects in a single response. They are executed together and all results are returned to you at once.
 - When you need to read a file from GitHub, you MUST use the GitHub tool with the correct owner, repo, and path parameters. Do not say you cannot access files - use the tool instead.
-- When asked about "S3 data", "connected S3", "knowledge base data", or "output data from S3", you MUST use the knowledge base content shown in the "KNOWLEDGE BASES (ALREADY LOADED FROM S3)" section above. The data is already loaded and available - you do NOT need any tool to retrieve it. Simply read and output the content from the knowledge bases section.
-
-Your task: {prompt}"""
+- To read several files or a whole directory from GitHub, use one "get_files" call (or "list_tree" to see what is there) rather than one "get_file_contents" call per file.
+- When asked about "S3 data", "connected S3", "knowledge base data", or "output data from S3", you MUST use the knowledge base content shown in the "KNOWLEDGE BASES (ALREADY LOADED FROM S3)" section above. The data is already loaded and available - you do NOT need any tool to retrieve it. Simply read and output the content from the knowledge bases section."""
+        
+        task_message = {"role": "user", "content": f"Your task: {prompt}"}
+        
+        # Fit the system prompt into the context window: reserve room for the task,
+        # the generation, and (if the model has tools) later tool iterations.
+        # KB content is trimmed first, then tool schemas.
+        history_reserve = int(self.assembler.context_window * HISTORY_RESERVE_FRACTION) if model_tools else 0
+        reserved_tokens = (
+            self.assembler.counter.count_messages([task_message])
+            + max_tokens
+            + history_reserve
+        )
+        system_prompt, prompt_budget = self.assembler.assemble_system_prompt(
+            [
+                {"name": "intro", "text": "You are a specialized AI agent with access to knowledge bases and tools.", "priority": None},
+                {"name": "kb_header", "text": kb_header, "priority": None},
+                {"name": "kb_content", "text": kb_content.strip() if kb_footer else "", "priority": 1},
+                {"name": "kb_footer", "text": kb_footer, "priority": None},
+                {"name": "tool_schemas", "text": f"=== AVAILABLE TOOLS ===\n{tool_content}", "priority": 2},
+                {"name": "tool_instructions", "text": tool_instructions, "priority": None},
+            ],
+            reserved_tokens
+        )
+        print(f"DEBUG: System prompt budget: {prompt_budget}")
+        if self.metrics is not None:
+            self.metrics.observe("context.system_tokens", prompt_budget["system_tokens"])
+            for section_name in prompt_budget["trimmed"]:
+                self.metrics.incr(f"context.trimmed.{section_name}")
         
         # Debug: Log system prompt length and KB content presence
         print(f"DEBUG: System prompt length: {len(system_prompt)} chars")
@@ -184,39 +259,94 @@ Your task: {prompt}"""
         if kb_content.strip():
             print(f"DEBUG: KB content preview (first 200 chars): {kb_content[:200]}")
         
-        # Call sub-agent LLM and handle tool calls iteratively
-        current_prompt = prompt
+        # The static system prompt comes first and the per-query task second, and
+        # every turn is appended, so each iteration shares the previous request as
+        # its prefix and vLLM's prefix cache only prefills the new tokens
+        messages = [
+            {"role": "system", "content": system_prompt},
+            task_message,
+        ]
         conversation_history = []
+        response = ""
         
         for iteration in range(max_iterations):
+            # Generation budget for this call, given everything sent so far
+            call_budget = self.assembler.fit_generation(messages, max_tokens)
+            print(f"DEBUG: Call budget (iteration {iteration + 1}): {call_budget}")
+            if self.metrics is not None:
+                self.metrics.observe("context.prompt_tokens", call_budget["prompt_tokens"])
+                self.metrics.observe("context.max_tokens", call_budget["max_tokens"])
+            if not call_budget["fits"]:
+                # Another round-trip would overflow the context window; stop here
+                print(f"WARNING: Context window exhausted after {iteration} iteration(s), stopping tool loop")
+                if self.metrics is not None:
+                    self.metrics.incr("context.exhausted")
+                if iteration == 0:
+                    return "Error: Prompt does not fit in the model context window"
+                break
+            
             # Call sub-agent LLM
-            response = chat(
-                prompt=current_prompt,
-                endpoint=endpoint,
-                system_prompt=system_prompt,
-                max_tokens=2048  # Increased for tool call responses
-            )
+            if stream_sink is not None:
+                # Scan for tool-call JSON while the response streams in
+                chunks = []
+                scanner = JsonObjectScanner()
+                objects = []
+                for chunk in chat_messages_stream(
+                    messages, endpoint, max_tokens=call_budget["max_tokens"], deadline=deadline
+                ):
+                    chunks.append(chunk)
+                    objects.extend(obj for _, obj in scanner.feed(chunk))
+                    stream_sink.feed(chunk)
+                objects.extend(obj for _, obj in scanner.flush())
+                response = "".join(chunks)
+            else:
+                response = chat_messages(
+                    messages,
+                    endpoint,
+                    max_tokens=call_budget["max_tokens"],
+                    deadline=deadline
+                )
+            messages.append({"role": "assistant", "content": response})
             
             print(f"DEBUG: LLM response (iteration {iteration + 1}): {response[:200]}...")
             
-            # Check if response contains a tool call
-            tool_call = self._parse_tool_call_from_response(response)
+            # Check if response contains tool calls
+            if stream_sink is not None:
+                tool_calls = self._tool_calls_from_objects(objects)
+            else:
+                tool_calls = self._parse_tool_calls_from_response(response)
             
-            if tool_call:
-                # Execute tool call
-                tool_result = self._execute_tool_and_format_result(tool_call)
+            if tool_calls:
+                # The streamed turn was a tool call, not the answer
+                if stream_sink is not None:
+                    stream_sink.reset()
                 
-                # Add to conversation history
-                conversation_history.append(f"Agent: {response}")
-                conversation_history.append(f"Tool Result: {tool_result}")
+                # A tool round-trip needs another LLM call after it; skip it if the
+                # request would run out of time
+                if deadline is not None and not deadline.allows(MIN_TOOL_ITERATION_SECONDS):
+                    print(f"WARNING: {deadline.remaining():.1f}s left of the request deadline, skipping tool iteration {iteration + 1}")
+                    if self.metrics is not None:
+                        self.metrics.incr("deadline.skipped.tool_iteration")
+                    break
                 
-                # Create follow-up prompt with tool result
-                current_prompt = f"""Previous response: {response}
-
-Tool execution result:
+                # Execute all tool calls of this turn concurrently
+                tool_result, tool_references = self._execute_tool_calls(tool_calls, deadline=deadline)
+                
+                # Add to conversation history: only short references, so the raw
+                # results are not prefilled again by refinement
+                for reference in tool_references:
+                    conversation_history.append(f"Tool Result: {reference}")
+                
+                # Feed all tool results back as the next turn. This is a user turn,
+                # not a "tool" role message: the calls are parsed from plain text, so
+                # there are no tool_call_ids that an OpenAI-style tool message needs.
+                messages.append({
+                    "role": "user",
+                    "content": f"""Tool execution result:
 {tool_result}
 
 Please process the tool result and provide your final answer."""
+                })
             else:
                 # No tool call, return the response
                 if conversation_history:
@@ -229,151 +359,380 @@ Please process the tool result and provide your final answer."""
             return "\n\n".join(conversation_history) + f"\n\nFinal Response: {response}"
         return response
     
-    def _parse_tool_call_from_response(self, response: str) -> Optional[Dict[str, Any]]:
+    def route_to_sub_agents(
+        self,
+        routes: List[Dict[str, Any]],
+        branch_timeout: float = BRANCH_TIMEOUT_SECONDS,
+        deadline: Optional[Deadline] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Route sub-prompts to several sub-agents concurrently.
+        Branches that fail or do not finish within branch_timeout are dropped
+        instead of failing the whole query; each branch runs under its own child of
+        the deadline, which is cancelled when it is dropped so its LLM calls stop.
+        Routes to unknown models fail without running.
+        
+        Args:
+            routes: List of {'model_id', 'prompt'} dicts
+            branch_timeout: Seconds to wait for the branches
+            deadline: Optional request deadline; branches are not waited for past it
+            options: Optional extra keyword arguments for route_to_sub_agent()
+        
+        Returns:
+            One result per route, in route order:
+            {
+                "model_id": <model id>,
+                "model_name": "<model name>",
+                "status": "ok" | "timeout" | "error",
+                "response": "<sub-agent response>"  (only when status is "ok")
+                "error": "<error message>"  (only when status is "error")
+            }
+        """
+        if deadline is not None:
+            branch_timeout = min(branch_timeout, deadline.remaining())
+        executor = ThreadPoolExecutor(max_workers=max(1, len(routes)))
+        branch_deadlines = [
+            deadline.child() if deadline is not None else Deadline(branch_timeout) for _ in routes
+        ]
+        futures = [
+            executor.submit(
+                self.route_to_sub_agent, route['model_id'], route['prompt'], deadline=branch_deadline,
+                **(options or {})
+            )
+            if self._get_model_by_id(route['model_id']) is not None else None
+            for route, branch_deadline in zip(routes, branch_deadlines)
+        ]
+        done, _ = wait([future for future in futures if future is not None], timeout=branch_timeout)
+        # Do not block on slow branches; they are cancelled below and their results ignored
+        executor.shutdown(wait=False)
+        
+        results = []
+        for route, future, branch_deadline in zip(routes, futures, branch_deadlines):
+            model = self._get_model_by_id(route['model_id']) or {}
+            result = {
+                "model_id": route['model_id'],
+                "model_name": model.get('name', f"Model {route['model_id']}"),
+            }
+            if future is None:
+                print(f"ERROR: Sub-agent {route['model_id']} is not a model of this system")
+                result["status"] = "error"
+                result["error"] = f"Model with ID {route['model_id']} not found"
+            elif future not in done:
+                # cancel() only stops a branch that has not started; the deadline stops a running one
+                future.cancel()
+                branch_deadline.cancel()
+                print(f"WARNING: Sub-agent {route['model_id']} timed out after {branch_timeout:.1f}s, dropping branch")
+                result["status"] = "timeout"
+            elif future.exception() is not None:
+                print(f"ERROR: Sub-agent {route['model_id']} failed: {future.exception()}")
+                result["status"] = "error"
+                result["error"] = str(future.exception())
+            else:
+                result["status"] = "ok"
+                result["response"] = future.result()
+            results.append(result)
+        
+        return results
+    
+    def _parse_tool_calls_from_response(self, response: str) -> List[Dict[str, Any]]:
         """
-        Parse tool call request from sub-agent response.
+        Parse every tool call request from sub-agent response.
         Looks for MCP tool call format in the response.
         
         Args:
             response: Sub-agent response text
         
         Returns:
-            Dict with tool call info or None if no tool call detected
+            List of tool call dicts in the order they appear (duplicates removed)
+        """
+        return self._tool_calls_from_objects(iter_json_objects(response))
+    
+    def _tool_calls_from_objects(self, objects: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Select the tool calls among JSON objects found in a response.
+        
+        Args:
+            objects: Top-level JSON objects, in order of appearance
+        
+        Returns:
+            List of tool call dicts (duplicates removed)
         """
-        # Try to find JSON tool call in response
         # Pattern 1: {"tool_id": 1, "action": "...", ...}
         # Pattern 2: {"tool_call": {"name": "...", "arguments": {...}}}
+        tool_calls = []
+        for obj in objects:
+            tool_call = None
+            if "tool_id" in obj:
+                tool_call = obj
+            elif isinstance(obj.get("tool_call"), dict):
+                tool_call = self._tool_call_from_named_call(obj["tool_call"])
+            if tool_call and tool_call not in tool_calls:
+                tool_calls.append(tool_call)
+        return tool_calls
+    
+    def _tool_call_from_named_call(self, tool_call_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Convert a {"name": ..., "arguments": {...}} tool call to the tool_id format.
+        
+        Args:
+            tool_call_data: Named tool call
+        
+        Returns:
+            Tool call dict with tool_id, or None if no tool has that name
+        """
+        tool_name = tool_call_data.get("name", "")
+        arguments = tool_call_data.get("arguments", {})
+        
+        # Find tool_id by matching tool name
+        handler = self.tool_registry.find_by_name(tool_name)
+        tool_id = handler.tool_id if handler is not None else None
+        
+        if not tool_id:
+            return None
+        
+        # Merge tool_id with arguments
+        result = {"tool_id": tool_id}
+        result.update(arguments)
+        return result
+    
+    def _execute_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Execute the tool calls of one turn concurrently and format all results.
+        Calls to the same tool are limited to TOOL_CONCURRENCY_PER_TOOL at a time, and
+        Jira issues filed in the same turn are created with one bulk request per
+        Jira instance.
         
-        # Look for JSON objects with tool_id
-        json_pattern = r'\{[^{}]*"tool_id"[^{}]*\}'
-        matches = re.findall(json_pattern, response, re.DOTALL)
+        Args:
+            tool_calls: Tool call dicts with tool_id and parameters
+            deadline: Optional request deadline for the calls
+        
+        Returns:
+            Tuple of (formatted string with every compacted tool result in call order,
+            one short reference per call for the transcript)
+        """
+        if len(tool_calls) == 1:
+            result = self._execute_tool_with_limit(tool_calls[0], deadline)
+            return result['text'], [result['reference']]
+        
+        def run(group: List[int]) -> List[Tuple[int, Dict[str, str]]]:
+            if len(group) > 1:
+                return self._execute_jira_bulk(group, tool_calls, deadline)
+            return [(group[0], self._execute_tool_with_limit(tool_calls[group[0]], deadline))]
+        
+        groups = self._group_tool_calls(tool_calls)
+        results: List[Dict[str, str]] = [{}] * len(tool_calls)
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            for group_results in executor.map(run, groups):
+                for idx, result in group_results:
+                    results[idx] = result
+        
+        sections = [
+            f"[Tool call {idx + 1} of {len(tool_calls)}: tool_id {tool_call.get('tool_id')}, "
+            f"action {tool_call.get('action', 'default')}]\n{result['text']}"
+            for idx, (tool_call, result) in enumerate(zip(tool_calls, results))
+        ]
+        return "\n\n".join(sections), [result['reference'] for result in results]
+    
+    def _group_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Group a turn's tool calls into units of execution: Jira create_issue calls to
+        the same Jira instance (and account) form one group, every other call its own.
+        
+        Args:
+            tool_calls: Tool call dicts with tool_id and parameters
         
-        for match in matches:
-            try:
-                tool_call = json.loads(match)
-                if "tool_id" in tool_call:
-                    return tool_call
-            except:
+        Returns:
+            Lists of call indices, in order of each group's first call
+        """
+        groups: List[List[int]] = []
+        jira_groups: Dict[Tuple[str, str, str], List[int]] = {}
+        for idx, tool_call in enumerate(tool_calls):
+            handler = self.tool_registry.get(tool_call.get('tool_id'))
+            if (
+                handler is None or handler.name != "jira"
+                or tool_call.get('action', 'create_issue') != 'create_issue'
+                # Calls with parameters a bulk issue cannot carry are made on their own
+                or not set(tool_call) <= _COALESCIBLE_KEYS
+            ):
+                groups.append([idx])
                 continue
+            tool = handler.tool
+            instance = (tool.get('api_url', '').rstrip('/').lower(), tool.get('email', ''), tool.get('api_key', ''))
+            if instance not in jira_groups:
+                jira_groups[instance] = []
+                groups.append(jira_groups[instance])
+            jira_groups[instance].append(idx)
+        return groups
+    
+    def _execute_jira_bulk(
+        self,
+        group: List[int],
+        tool_calls: List[Dict[str, Any]],
+        deadline: Optional[Deadline] = None
+    ) -> List[Tuple[int, Dict[str, str]]]:
+        """
+        Create the issues of several Jira create_issue calls with one bulk request,
+        and report each call's own result. Calls already made earlier in the request
+        get their stored result and are left out of the bulk request.
         
-        # Look for tool_call format: {"tool_call": {"name": "...", "arguments": {...}}}
-        # Use a more robust approach to find nested JSON
-        # Try to find the complete JSON object by counting braces
-        start_idx = response.find('{"tool_call"')
-        if start_idx != -1:
-            brace_count = 0
-            end_idx = start_idx
-            in_string = False
-            escape_next = False
-            
-            for i in range(start_idx, len(response)):
-                char = response[i]
-                
-                if escape_next:
-                    escape_next = False
-                    continue
-                
-                if char == '\\':
-                    escape_next = True
-                    continue
-                
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                    continue
-                
-                if not in_string:
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            end_idx = i + 1
-                            break
-            
-            if brace_count == 0 and end_idx > start_idx:
-                try:
-                    json_str = response[start_idx:end_idx]
-                    parsed = json.loads(json_str)
-                    if "tool_call" in parsed:
-                        tool_call_data = parsed["tool_call"]
-                        tool_name = tool_call_data.get("name", "")
-                        arguments = tool_call_data.get("arguments", {})
-                        
-                        # Find tool_id by matching tool name
-                        tool_id = None
-                        for tool in self.tools:
-                            if tool.get("name", "").lower() == tool_name.lower():
-                                tool_id = tool.get("id")
-                                break
-                        
-                        if tool_id:
-                            # Merge tool_id with arguments
-                            result = {"tool_id": tool_id}
-                            result.update(arguments)
-                            return result
-                except:
-                    pass
-        
-        # Also try to find nested JSON objects more broadly
-        # Look for any JSON object containing "action" (for GitHub/Jira tools)
-        action_pattern = r'\{[^{}]*"action"[^{}]*\}'
-        matches = re.findall(action_pattern, response, re.DOTALL)
-        
-        for match in matches:
-            try:
-                tool_call = json.loads(match)
-                if "action" in tool_call:
-                    # Try to find tool_id by checking if this looks like a tool call
-                    # If it has action but no tool_id, we need to infer it
-                    # For now, check if we can find tool_id elsewhere or infer from context
-                    if "tool_id" not in tool_call:
-                        # Try to find tool_id in surrounding context
-                        # Look for tool_id in a larger JSON block
-                        larger_pattern = r'\{[^{}]*"tool_id"[^{}]*"action"[^{}]*\}'
-                        larger_matches = re.findall(larger_pattern, response, re.DOTALL)
-                        for larger_match in larger_matches:
-                            try:
-                                larger_parsed = json.loads(larger_match)
-                                if "tool_id" in larger_parsed:
-                                    return larger_parsed
-                            except:
-                                continue
-                    else:
-                        return tool_call
-            except:
+        Args:
+            group: Indices of create_issue calls to the same Jira instance
+            tool_calls: All tool calls of the turn
+            deadline: Optional request deadline for the call
+        
+        Returns:
+            (call index, described result) per call in the group
+        """
+        calls = [tool_calls[idx] for idx in group]
+        keys = [self.tool_registry.idempotency_key(call['tool_id'], call, deadline) for call in calls]
+        results: List[Optional[Dict[str, Any]]] = [
+            idempotent_calls.get(key) if key is not None else None for key in keys
+        ]
+        # Identical calls in the same turn create one issue
+        pending: List[int] = []
+        duplicates: Dict[int, int] = {}
+        first_with_key: Dict[str, int] = {}
+        for position, result in enumerate(results):
+            if result is not None:
+                continue
+            key = keys[position]
+            if key is not None and key in first_with_key:
+                duplicates[position] = first_with_key[key]
                 continue
+            if key is not None:
+                first_with_key[key] = position
+            pending.append(position)
         
-        return None
+        if len(pending) == 1:
+            position = pending[0]
+            results[position] = self._call_tool_with_limit(calls[position], deadline)
+        elif pending:
+            bulk_call = {
+                "tool_id": calls[0]['tool_id'],
+                "action": "create_issues",
+                "issues": [
+                    {key: calls[position][key] for key in _JIRA_ISSUE_KEYS if calls[position].get(key)}
+                    for position in pending
+                ],
+            }
+            if self.metrics is not None:
+                self.metrics.incr("tools.jira.coalesced_calls", len(pending))
+            bulk_result = self._call_tool_with_limit(bulk_call, deadline)
+            for item_index, position in enumerate(pending):
+                if not bulk_result.get('success'):
+                    results[position] = bulk_result
+                    continue
+                item = bulk_result['result']['results'][item_index]
+                if item['success']:
+                    results[position] = {"success": True, "result": item}
+                    if keys[position] is not None:
+                        idempotent_calls.put(keys[position], results[position])
+                else:
+                    results[position] = {"success": False, "error": item['error']}
+        for position, original in duplicates.items():
+            original_result = results[original]
+            results[position] = dict(original_result, replayed=True) if original_result.get('success') else original_result
+        
+        return [
+            (idx, self._describe_tool_result(call, result))
+            for idx, call, result in zip(group, calls, results)
+        ]
+    
+    def _execute_tool_with_limit(
+        self,
+        tool_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, str]:
+        """Execute a tool call while holding its tool's concurrency slot (waiting at most until the deadline)."""
+        if tool_call.get('tool_id') not in self._tool_semaphores:
+            return self._execute_tool_call(tool_call, deadline)
+        return self._describe_tool_result(tool_call, self._call_tool_with_limit(tool_call, deadline))
     
-    def _execute_tool_and_format_result(self, tool_call: Dict[str, Any]) -> str:
+    def _call_tool_with_limit(
+        self,
+        tool_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """Run a tool call holding its tool's concurrency slot; returns the raw ToolRegistry.call() result."""
+        semaphore = self._tool_semaphores[tool_call['tool_id']]
+        if deadline is None:
+            with semaphore:
+                return self.tool_registry.call(tool_call['tool_id'], tool_call, deadline=deadline)
+        if not semaphore.acquire(timeout=deadline.remaining()):
+            return {
+                "success": False,
+                "error": f"Request deadline exceeded waiting for tool {tool_call.get('tool_id')}"
+            }
+        try:
+            return self.tool_registry.call(tool_call['tool_id'], tool_call, deadline=deadline)
+        finally:
+            semaphore.release()
+    
+    def _execute_tool_call(
+        self,
+        tool_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, str]:
         """
-        Execute a tool call and format the result for inclusion in agent context.
+        Execute a tool call, compact its result for the agent context, and describe it.
         
         Args:
             tool_call: Tool call dict with tool_id and parameters
+            deadline: Optional request deadline for the call
         
         Returns:
-            Formatted string with tool execution result
+            Dict with 'text' (compacted result for the agent) and 'reference'
+            (one-line summary for the transcript)
         """
         tool_id = tool_call.get('tool_id')
         if not tool_id:
-            return "Error: Tool call missing tool_id"
+            return {"text": "Error: Tool call missing tool_id", "reference": "Invalid tool call: missing tool_id"}
         
         # Execute tool call
-        result = handle_mcp_tool_call(tool_id, self.tools, tool_call)
-        
-        if result.get('success'):
-            tool_result = result.get('result', {})
-            # Format result nicely for agent
-            if isinstance(tool_result, dict):
-                if 'content' in tool_result:
-                    # GitHub file contents
-                    return f"Tool execution successful:\nFile: {tool_result.get('path', 'unknown')}\nContent:\n{tool_result['content']}"
-                else:
-                    return f"Tool execution successful: {json.dumps(tool_result, indent=2)}"
-            else:
-                return f"Tool execution successful: {str(tool_result)}"
-        else:
+        result = self.tool_registry.call(tool_id, tool_call, deadline=deadline)
+        return self._describe_tool_result(tool_call, result)
+    
+    def _describe_tool_result(self, tool_call: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, str]:
+        """Compact a tool call's result for the agent context and describe it for the transcript."""
+        handler = self.tool_registry.get(tool_call.get('tool_id'))
+        tool = handler.tool if handler is not None else None
+        return {
+            "text": self._format_tool_result(tool, tool_call, result),
+            "reference": describe_tool_call(tool, tool_call, result),
+        }
+    
+    def _format_tool_result(
+        self,
+        tool: Optional[Dict[str, Any]],
+        tool_call: Dict[str, Any],
+        result: Dict[str, Any]
+    ) -> str:
+        """
+        Format a tool result for the agent, compacted by the tool's result policy.
+        
+        Args:
+            tool: Tool dict (or None if not found)
+            tool_call: Tool call dict
+            result: Result of ToolRegistry.call()
+        
+        Returns:
+            Formatted string with tool execution result
+        """
+        if not result.get('success'):
             error = result.get('error', 'Unknown error')
             return f"Tool execution failed: {error}"
-
+        
+        tool_type = self.tool_registry.tool_type(tool_call.get('tool_id')) if tool is not None else "generic"
+        policy = get_result_policy(tool or {}, tool_type)
+        
+        compacted = compact_tool_result(tool_type, tool_call, result.get('result', {}), policy)
+        separator = "\n" if "\n" in compacted else " "
+        if result.get('replayed'):
+            # The same side-effecting call already ran for this request
+            return f"Tool execution successful (already done earlier, not repeated):{separator}{compacted}"
+        return f"Tool execution successful:{separator}{compacted}"
@@ -1,10 +1,26 @@
 """
 System Manager for processing JSON configuration and managing multi-agent systems.
 """
+import threading
 import uuid
 from typing import Dict, List, Any, Optional
 from .core_agent import CoreAgent
 from .router import Router
+from .metrics import Metrics
+from .config import (
+    REQUEST_DEADLINE_SECONDS, TASK_GRAPH_DEADLINE_SECONDS, MIN_REFINEMENT_SECONDS,
+    USER_RATE_PER_SECOND, USER_RATE_BURST,
+)
+from .admission import AdmissionPolicy, RateLimited, TokenBucket
+from .deadline import Deadline
+from .degradation import degradation_controller, level_settings, LEVEL_NAMES
+from .prefetch import Prefetch
+from .task_graph import run_task_graph, build_task_prompt, final_task_results
+from .response_cleaner import StreamingCleaner
+from .refinement import (
+    RefinementPolicy, PipelinedRefiner, classify_response, truncate_response,
+    PASSTHROUGH, CLEANUP, LLM,
+)
 
 
 class SystemManager:
@@ -13,13 +29,19 @@ class SystemManager:
     def __init__(self):
         """Initialize the system manager."""
         self.systems: Dict[str, Dict[str, Any]] = {}
+        # Rate limits shared by all systems of the same owner
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._user_buckets_lock = threading.Lock()
     
     def create_system(self, config: Dict[str, Any]) -> str:
         """
         Create a new multi-agent system from JSON configuration.
         
         Args:
-            config: JSON configuration with 'mission', 'models', 'knowledge_bases', 'tools'
+            config: JSON configuration with 'mission', 'models', 'knowledge_bases', 'tools',
+                optional 'refinement' policy settings, an optional 'deadline_seconds'
+                time budget per query, optional 'admission' settings (rate limit and fair
+                queueing weight), and an optional 'owner_id' of the user who deployed it
         
         Returns:
             System ID
@@ -39,23 +61,44 @@ class SystemManager:
                 # Auto-assign ID based on index (starting from 1)
                 model['id'] = idx + 1
         
+        # Build refinement policy (raises ValueError on invalid settings)
+        refinement_policy = RefinementPolicy(config.get('refinement'))
+        
+        # Build admission policy (raises ValueError on invalid settings)
+        admission_policy = AdmissionPolicy(config.get('admission'))
+        
+        # Per-query time budget
+        deadline_seconds = config.get('deadline_seconds')
+        if deadline_seconds is None:
+            deadline_seconds = REQUEST_DEADLINE_SECONDS
+        if deadline_seconds <= 0:
+            raise ValueError("deadline_seconds must be positive")
+        
         # Create system ID
         system_id = str(uuid.uuid4())
         
         # Create core agent
+        metrics = Metrics()
         core_agent = CoreAgent(
             models=models,
             knowledge_bases=config['knowledge_bases'],
-            tools=config['tools']
+            tools=config['tools'],
+            metrics=metrics
         )
         
         # Create router
         router = Router(
             models=models,
             knowledge_bases=config['knowledge_bases'],
-            tools=config['tools']
+            tools=config['tools'],
+            metrics=metrics,
+            system_id=system_id
         )
         
+        # Load what tool schemas depend on (e.g., Jira projects and issue types) in
+        # the background, so they can list the valid options
+        router.tool_registry.warm()
+        
         # Store system configuration
         self.systems[system_id] = {
             'id': system_id,
@@ -64,7 +107,12 @@ class SystemManager:
             'knowledge_bases': config['knowledge_bases'],
             'tools': config['tools'],
             'core_agent': core_agent,
-            'router': router
+            'router': router,
+            'refinement_policy': refinement_policy,
+            'deadline_seconds': deadline_seconds,
+            'admission_policy': admission_policy,
+            'owner_id': config.get('owner_id'),
+            'metrics': metrics
         }
         
         return system_id
@@ -81,65 +129,300 @@ class SystemManager:
         """
         return self.systems.get(system_id)
     
-    def process_query(self, system_id: str, query: str) -> str:
+    def admit_query(self, system_id: str, request_id: Optional[str] = None) -> Deadline:
+        """
+        Admit a query under its system's and its owner's rate limits, and start its
+        time budget.
+        
+        Args:
+            system_id: System ID
+            request_id: Optional client-supplied request ID, the same for retries of the
+                query (side-effecting tool calls are not repeated within one request ID)
+        
+        Returns:
+            Deadline for the query, naming its tenant (the owner, or else the system)
+            for fair queueing at the LLM endpoints
+        
+        Raises:
+            ValueError: If system not found
+            RateLimited: If the system or its owner is over their rate limit
+        """
+        system = self.get_system(system_id)
+        if not system:
+            raise ValueError(f"System with ID {system_id} not found")
+        policy = system['admission_policy']
+        owner_id = system['owner_id']
+        metrics = system['metrics']
+        
+        if policy.bucket is not None:
+            retry_after = policy.bucket.take()
+            if retry_after:
+                metrics.incr("admission.rejected.system")
+                raise RateLimited(f"System {system_id} is over its rate limit", retry_after)
+        user_bucket = self._get_user_bucket(owner_id)
+        if user_bucket is not None:
+            retry_after = user_bucket.take()
+            if retry_after:
+                if policy.bucket is not None:
+                    policy.bucket.refund()
+                metrics.incr("admission.rejected.user")
+                raise RateLimited("The owner of this system is over their rate limit", retry_after)
+        
+        metrics.incr("admission.admitted")
+        return Deadline(
+            system['deadline_seconds'], tenant=owner_id or system_id, weight=policy.weight, request_id=request_id
+        )
+    
+    def _get_user_bucket(self, owner_id: Optional[str]) -> Optional[TokenBucket]:
+        """Get the rate limit shared by an owner's systems (None if unowned or disabled)."""
+        if owner_id is None or USER_RATE_PER_SECOND <= 0:
+            return None
+        with self._user_buckets_lock:
+            bucket = self._user_buckets.get(owner_id)
+            if bucket is None:
+                bucket = self._user_buckets[owner_id] = TokenBucket(USER_RATE_PER_SECOND, USER_RATE_BURST)
+            return bucket
+    
+    def cancel_query(self, system_id: str, deadline: Deadline) -> None:
+        """
+        Cancel a query in flight (e.g., its client disconnected). Open LLM streams are
+        closed so vLLM aborts the sequences, and no further LLM or tool calls start.
+        
+        Args:
+            system_id: System ID
+            deadline: Deadline the query was started with
+        """
+        deadline.cancel()
+        system = self.get_system(system_id)
+        if system:
+            system['metrics'].incr("queries.cancelled")
+    
+    def process_query(
+        self,
+        system_id: str,
+        query: str,
+        deadline: Optional[Deadline] = None,
+        degradation_level: Optional[int] = None
+    ) -> str:
         """
         Process a query through the multi-agent system.
         
         Args:
             system_id: System ID
             query: User query
+            deadline: Request deadline from admit_query() (admitted here if not given).
+                Every downstream call uses the time left as its timeout, and LLM
+                refinement is skipped when less than MIN_REFINEMENT_SECONDS remain.
+            degradation_level: Degradation level to apply (see core/degradation.py;
+                taken from the global degradation controller if not given)
         
         Returns:
             Text response
         
         Raises:
             ValueError: If system not found
+            RateLimited: If no deadline is given and the query is not admitted
+            DeadlineExceeded: If the deadline passes before there is an answer
+                (RequestCancelled if the query is cancelled)
         """
         system = self.get_system(system_id)
         if not system:
             raise ValueError(f"System with ID {system_id} not found")
+        if deadline is None:
+            deadline = self.admit_query(system_id)
+        if degradation_level is None:
+            degradation_level = degradation_controller.level()
+        
+        # Start fetching tool inputs the query names while it is being routed
+        prefetch = Prefetch(system['metrics'])
+        if prefetch.start(query, system['router'].tool_registry, deadline):
+            deadline.prefetch = prefetch
+        try:
+            return self._answer_query(system, query, deadline, degradation_level)
+        finally:
+            prefetch.finish()
+    
+    def _answer_query(
+        self,
+        system: Dict[str, Any],
+        query: str,
+        deadline: Deadline,
+        degradation_level: int
+    ) -> str:
+        """
+        Route a query, run its sub-agents, and refine their answer (see process_query()).
+        
+        Args:
+            system: System configuration
+            query: User query
+            deadline: Request deadline
+            degradation_level: Degradation level to apply
+        
+        Returns:
+            Text response
+        """
+        settings = level_settings(degradation_level)
+        sub_agent_options = settings['sub_agent_options']
         
         core_agent = system['core_agent']
         router = system['router']
         
         # Core agent routes the query
-        routing_result = core_agent.route_query(query)
+        routing_result = core_agent.route_query(query, deadline=deadline)
+        routes = routing_result['routes']
         model_id = routing_result['model_id']
         prompt = routing_result['prompt']
         
-        # Router routes to sub-agent
-        sub_agent_result = router.route_to_sub_agent(model_id, prompt)
+        metrics = system['metrics']
+        policy = system['refinement_policy']
+        metrics.incr(f"degradation.level.{LEVEL_NAMES[degradation_level]}")
+        
+        if 'tasks' in routing_result:
+            # Run the decomposed query as a task graph across sub-agents
+            sub_agent_result = self._run_task_graph(system, routing_result['tasks'], deadline, sub_agent_options)
+        elif len(routes) > 1:
+            # Fan out to several sub-agents in parallel and merge their answers
+            branch_results = router.route_to_sub_agents(routes, deadline=deadline, options=sub_agent_options)
+            metrics.incr("fanout.queries")
+            metrics.incr("fanout.branches", len(branch_results))
+            for branch in branch_results:
+                if branch['status'] != 'ok':
+                    metrics.incr(f"fanout.dropped.{branch['status']}")
+            sub_agent_result = core_agent.merge_responses(branch_results)
+        elif (policy.pipelined and policy.mode in ('auto', LLM) and settings['llm_refinement']
+              and deadline.allows(MIN_REFINEMENT_SECONDS)):
+            # Pipelined mode: refine the answer while the sub-agent is still streaming it
+            refiner = PipelinedRefiner(core_agent, query, deadline=deadline, policy=policy)
+            sub_agent_result = router.route_to_sub_agent(
+                model_id, prompt, stream_sink=refiner, deadline=deadline, **sub_agent_options
+            )
+            # Answers the policy did not send to section refinement (e.g., short ones in
+            # auto mode) are classified below like any other
+            if refiner.refining:
+                metrics.incr("refinement.decision.pipelined")
+                try:
+                    return refiner.finish()
+                except Exception as e:
+                    print(f"Pipelined refinement failed: {e}, using simple cleanup")
+                    metrics.incr("refinement.llm_failed")
+                    return truncate_response(core_agent._clean_response_simple(sub_agent_result))
+        elif policy.mode == CLEANUP:
+            # Cleanup-only mode: clean the answer while the sub-agent is still streaming it
+            cleaner = StreamingCleaner()
+            sub_agent_result = router.route_to_sub_agent(
+                model_id, prompt, stream_sink=cleaner, deadline=deadline, **sub_agent_options
+            )
+            # After tool calls the result also carries the tool transcript; clean that below
+            if cleaner.has_output and not cleaner.resets:
+                metrics.incr(f"refinement.decision.{CLEANUP}")
+                return truncate_response(cleaner.finish())
+        else:
+            # Router routes to sub-agent
+            sub_agent_result = router.route_to_sub_agent(model_id, prompt, deadline=deadline, **sub_agent_options)
+        
+        # Decide how much refinement the response needs
+        features = classify_response(sub_agent_result)
+        decision = policy.decide(features)
+        if decision == LLM and not deadline.allows(MIN_REFINEMENT_SECONDS):
+            # Not enough time left for another LLM call; clean up deterministically
+            print(f"WARNING: {deadline.remaining():.1f}s left of the request deadline, skipping LLM refinement")
+            metrics.incr("deadline.skipped.refinement")
+            decision = CLEANUP
+        elif decision == LLM and not settings['llm_refinement']:
+            # Degraded under load; spare the endpoint the refinement call
+            metrics.incr("degradation.skipped.refinement")
+            decision = CLEANUP
+        metrics.incr(f"refinement.decision.{decision}")
+        
+        if decision == PASSTHROUGH:
+            return truncate_response(sub_agent_result.strip())
+        
+        if decision == CLEANUP:
+            return truncate_response(core_agent._clean_response_simple(sub_agent_result))
         
         # Core agent refines the response to clean up verbose output
         try:
-            refined_result = core_agent.refine_response(sub_agent_result, query)
+            refined_result = core_agent.refine_response(sub_agent_result, query, deadline=deadline)
             return refined_result
         except Exception as e:
             # If refinement fails, return original response with simple cleanup
             print(f"Response refinement failed: {e}, returning original response")
+            metrics.incr("refinement.llm_failed")
             # Apply simple cleanup as fallback
             try:
                 cleaned_result = core_agent._clean_response_simple(sub_agent_result)
                 # Enforce max length even in fallback
-                from .config import MAX_RESPONSE_LENGTH
-                if len(cleaned_result) > MAX_RESPONSE_LENGTH:
-                    truncated = cleaned_result[:MAX_RESPONSE_LENGTH]
-                    last_space = truncated.rfind(' ')
-                    if last_space > MAX_RESPONSE_LENGTH * 0.8:
-                        cleaned_result = truncated[:last_space] + "..."
-                    else:
-                        cleaned_result = truncated + "..."
-                return cleaned_result
+                return truncate_response(cleaned_result)
             except Exception:
                 # Last resort: return original response (truncated if too long)
-                from .config import MAX_RESPONSE_LENGTH
-                if len(sub_agent_result) > MAX_RESPONSE_LENGTH:
-                    truncated = sub_agent_result[:MAX_RESPONSE_LENGTH]
-                    last_space = truncated.rfind(' ')
-                    if last_space > MAX_RESPONSE_LENGTH * 0.8:
-                        return truncated[:last_space] + "..."
-                    return truncated + "..."
-                return sub_agent_result
+                return truncate_response(sub_agent_result)
+    
+    def _run_task_graph(
+        self,
+        system: Dict[str, Any],
+        tasks: List[Dict[str, Any]],
+        deadline: Deadline,
+        sub_agent_options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Run a task graph and merge the results of its final tasks.
+        
+        Args:
+            system: System configuration
+            tasks: Validated task graph
+            deadline: Request deadline; the graph gets at most the time left
+            sub_agent_options: Degradation options for Router.route_to_sub_agent()
+        
+        Returns:
+            Merged sub-agent response
+        """
+        core_agent = system['core_agent']
+        router = system['router']
+        metrics = system['metrics']
+        sub_agent_options = sub_agent_options or {}
+        
+        def run_task(task: Dict[str, Any], dependency_results: Dict[str, str]) -> str:
+            # Pass along only the answers of prerequisite tasks, not their reasoning
+            cleaned_results = {
+                dep_id: core_agent._clean_response_simple(result)
+                for dep_id, result in dependency_results.items()
+            }
+            return router.route_to_sub_agent(
+                task['model_id'], build_task_prompt(task, cleaned_results),
+                deadline=deadline, **sub_agent_options
+            )
+        
+        results = run_task_graph(
+            tasks, run_task,
+            deadline_seconds=min(TASK_GRAPH_DEADLINE_SECONDS, deadline.remaining())
+        )
+        metrics.incr("task_graph.queries")
+        for result in results:
+            metrics.incr(f"task_graph.tasks.{result['status']}")
+        
+        final_results = final_task_results(tasks, results)
+        for result in final_results:
+            model = router._get_model_by_id(result['model_id']) or {}
+            result['model_name'] = f"{model.get('name', 'Model ' + str(result['model_id']))} ({result['id']})"
+        return core_agent.merge_responses(final_results)
+    
+    def get_metrics(self, system_id: str) -> Dict[str, Any]:
+        """
+        Get metrics recorded for a system.
+        
+        Args:
+            system_id: System ID
+        
+        Returns:
+            Metrics snapshot
+        
+        Raises:
+            ValueError: If system not found
+        """
+        system = self.get_system(system_id)
+        if not system:
+            raise ValueError(f"System with ID {system_id} not found")
+        return system['metrics'].snapshot()
     
     def delete_system(self, system_id: str) -> bool:
         """
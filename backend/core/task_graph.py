@@ -0,0 +1,201 @@
+"""
+Task graph scheduler for running decomposed subtasks in parallel across sub-agents.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from typing import Dict, List, Any, Callable, Iterable, Optional
+from .config import TASK_GRAPH_MAX_CONCURRENCY, TASK_GRAPH_DEADLINE_SECONDS
+
+
+def validate_task_graph(
+    tasks: List[Dict[str, Any]],
+    max_tasks: int,
+    model_ids: Optional[Iterable[Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Validate and normalize a task graph emitted by the core agent.
+
+    Args:
+        tasks: List of task dicts with 'id', 'model_id', 'prompt', and optional 'depends_on'
+        max_tasks: Maximum number of tasks allowed
+        model_ids: IDs of the system's models (not checked if None)
+
+    Returns:
+        Normalized task list (ids as strings, 'depends_on' always a list)
+
+    Raises:
+        ValueError: If the graph is empty, too large, malformed, names an unknown
+            model, or has a cycle
+    """
+    if not isinstance(tasks, list) or not tasks:
+        raise ValueError("Response 'tasks' must be a non-empty list")
+    if len(tasks) > max_tasks:
+        raise ValueError(f"Task graph has {len(tasks)} tasks, maximum is {max_tasks}")
+
+    normalized = []
+    for task in tasks:
+        if not isinstance(task, dict) or "id" not in task or "model_id" not in task or "prompt" not in task:
+            raise ValueError("Each task must include id, model_id, and prompt")
+        if model_ids is not None and task["model_id"] not in model_ids:
+            raise ValueError(f"Task '{task['id']}' uses unknown model {task['model_id']}")
+        depends_on = task.get("depends_on") or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        normalized.append({
+            "id": str(task["id"]),
+            "model_id": task["model_id"],
+            "prompt": task["prompt"],
+            "depends_on": [str(dep) for dep in depends_on],
+        })
+
+    task_ids = [task["id"] for task in normalized]
+    if len(set(task_ids)) != len(task_ids):
+        raise ValueError("Task ids must be unique")
+    for task in normalized:
+        for dep in task["depends_on"]:
+            if dep not in task_ids:
+                raise ValueError(f"Task '{task['id']}' depends on unknown task '{dep}'")
+            if dep == task["id"]:
+                raise ValueError(f"Task '{task['id']}' depends on itself")
+
+    # Kahn's algorithm: every task must be reachable in topological order
+    remaining_deps = {task["id"]: set(task["depends_on"]) for task in normalized}
+    ready = [task_id for task_id, deps in remaining_deps.items() if not deps]
+    ordered = 0
+    while ready:
+        task_id = ready.pop()
+        ordered += 1
+        for other_id, deps in remaining_deps.items():
+            if task_id in deps:
+                deps.discard(task_id)
+                if not deps:
+                    ready.append(other_id)
+    if ordered != len(normalized):
+        raise ValueError("Task graph contains a dependency cycle")
+
+    return normalized
+
+
+def build_task_prompt(task: Dict[str, Any], dependency_results: Dict[str, str]) -> str:
+    """
+    Build the prompt for a task, including the results of the tasks it depends on.
+
+    Args:
+        task: Task dict
+        dependency_results: Map of dependency task id to its (cleaned) result
+
+    Returns:
+        Prompt for the sub-agent
+    """
+    if not dependency_results:
+        return task["prompt"]
+
+    sections = [
+        f"[Result of task '{dep_id}']\n{result}"
+        for dep_id, result in dependency_results.items()
+    ]
+    return f"{task['prompt']}\n\nResults from prerequisite tasks:\n\n" + "\n\n".join(sections)
+
+
+def run_task_graph(
+    tasks: List[Dict[str, Any]],
+    run_task: Callable[[Dict[str, Any], Dict[str, str]], str],
+    max_concurrency: int = TASK_GRAPH_MAX_CONCURRENCY,
+    deadline_seconds: float = TASK_GRAPH_DEADLINE_SECONDS
+) -> List[Dict[str, Any]]:
+    """
+    Run a validated task graph, starting each task as soon as its dependencies succeed.
+    Independent tasks run in parallel up to max_concurrency. Tasks whose dependencies
+    failed are skipped, and tasks still running at the deadline are dropped.
+
+    Args:
+        tasks: Output of validate_task_graph()
+        run_task: Callable(task, dependency_results) -> result text
+        max_concurrency: Maximum number of tasks running at once
+        deadline_seconds: Time budget for the whole graph
+
+    Returns:
+        One result per task, in task order:
+        {
+            "id": "<task id>",
+            "model_id": <model id>,
+            "status": "ok" | "error" | "timeout" | "skipped",
+            "response": "<result text>"  (only when status is "ok")
+            "error": "<error message>"  (only when status is "error")
+        }
+    """
+    deadline = time.monotonic() + deadline_seconds
+    tasks_by_id = {task["id"]: task for task in tasks}
+    results: Dict[str, Dict[str, Any]] = {}
+    running: Dict[Future, str] = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+
+    def dependency_results_for(task: Dict[str, Any]) -> Dict[str, str]:
+        return {dep: results[dep]["response"] for dep in task["depends_on"]}
+
+    try:
+        while True:
+            # Resolve pending tasks: skip those with a failed dependency, start the ready ones
+            for task in tasks:
+                task_id = task["id"]
+                if task_id in results or task_id in running.values():
+                    continue
+                dep_statuses = [results[dep]["status"] for dep in task["depends_on"] if dep in results]
+                if any(status != "ok" for status in dep_statuses):
+                    results[task_id] = {"id": task_id, "model_id": task["model_id"], "status": "skipped"}
+                    continue
+                if len(dep_statuses) == len(task["depends_on"]) and len(running) < max_concurrency:
+                    future = executor.submit(run_task, task, dependency_results_for(task))
+                    running[future] = task_id
+
+            if not running:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(running), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = running.pop(future)
+                task = tasks_by_id[task_id]
+                result = {"id": task_id, "model_id": task["model_id"]}
+                if future.exception() is not None:
+                    print(f"ERROR: Task '{task_id}' failed: {future.exception()}")
+                    result["status"] = "error"
+                    result["error"] = str(future.exception())
+                else:
+                    result["status"] = "ok"
+                    result["response"] = future.result()
+                results[task_id] = result
+    finally:
+        # Do not block on tasks that missed the deadline
+        executor.shutdown(wait=False)
+
+    for future, task_id in running.items():
+        future.cancel()
+        print(f"WARNING: Task '{task_id}' did not finish before the deadline, dropping it")
+        results[task_id] = {"id": task_id, "model_id": tasks_by_id[task_id]["model_id"], "status": "timeout"}
+    for task in tasks:
+        if task["id"] not in results:
+            results[task["id"]] = {"id": task["id"], "model_id": task["model_id"], "status": "skipped"}
+
+    return [results[task["id"]] for task in tasks]
+
+
+def final_task_results(tasks: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Select the results that make up the answer: the tasks nothing else depends on.
+    Falls back to every successful task if none of the final tasks succeeded.
+
+    Args:
+        tasks: Validated task list
+        results: Output of run_task_graph()
+
+    Returns:
+        Results to merge into the final answer
+    """
+    dependencies = {dep for task in tasks for dep in task["depends_on"]}
+    final = [result for result in results if result["id"] not in dependencies and result["status"] == "ok"]
+    if final:
+        return final
+    return [result for result in results if result["status"] == "ok"]
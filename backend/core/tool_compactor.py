@@ -0,0 +1,212 @@
+"""
+Tool result compaction before results are fed back to a sub-agent.
+"""
+import json
+from typing import Dict, List, Any, Optional
+from .config import TOOL_RESULT_MAX_CHARS
+
+
+# Default compaction policy per tool type. A tool can override any of these
+# keys with a 'result_policy' dict in its configuration.
+DEFAULT_RESULT_POLICIES: Dict[str, Dict[str, Any]] = {
+    "github": {
+        "max_chars": TOOL_RESULT_MAX_CHARS,
+        "head_ratio": 0.7,
+    },
+    "jira": {
+        "max_chars": 2000,
+        "fields": ["key", "id", "url", "summary", "success", "issues", "errors", "results", "created", "failed"],
+    },
+    "generic": {
+        "max_chars": min(TOOL_RESULT_MAX_CHARS, 4000),
+        "head_ratio": 0.7,
+    },
+}
+
+
+def get_result_policy(tool: Dict[str, Any], tool_type: str) -> Dict[str, Any]:
+    """
+    Get the compaction policy for a tool.
+
+    Args:
+        tool: Tool dict (may contain a 'result_policy' override)
+        tool_type: "github", "jira", or "generic"
+
+    Returns:
+        Policy dict with 'max_chars' and type-specific keys
+    """
+    policy = dict(DEFAULT_RESULT_POLICIES.get(tool_type, DEFAULT_RESULT_POLICIES["generic"]))
+    policy.update(tool.get("result_policy") or {})
+    return policy
+
+
+def slice_lines(content: str, start_line: Optional[int], end_line: Optional[int]) -> str:
+    """
+    Slice a text to a 1-based, inclusive line range.
+
+    Args:
+        content: Text content
+        start_line: First line to keep (default: 1)
+        end_line: Last line to keep (default: last line)
+
+    Returns:
+        The selected lines
+    """
+    lines = content.splitlines()
+    start = max(1, int(start_line or 1))
+    end = min(len(lines), int(end_line or len(lines)))
+    return "\n".join(lines[start - 1:end])
+
+
+def truncate_head_tail(text: str, max_chars: int, head_ratio: float = 0.7) -> str:
+    """
+    Truncate a text to max_chars by keeping its head and tail around an omission marker.
+    Cuts on line boundaries where possible.
+
+    Args:
+        text: Text to truncate
+        max_chars: Character budget
+        head_ratio: Share of the budget given to the head
+
+    Returns:
+        The text, or its head and tail with a marker reporting what was omitted
+    """
+    if len(text) <= max_chars:
+        return text
+
+    head_chars = int(max_chars * head_ratio)
+    tail_chars = max_chars - head_chars
+    head = text[:head_chars]
+    tail = text[len(text) - tail_chars:] if tail_chars > 0 else ""
+
+    # Prefer whole lines
+    if "\n" in head:
+        head = head[:head.rfind("\n")]
+    if "\n" in tail:
+        tail = tail[tail.find("\n") + 1:]
+
+    omitted = text[len(head):len(text) - len(tail)]
+    omitted_lines = omitted.count("\n")
+    marker = f"\n[... {len(omitted)} characters ({omitted_lines} lines) omitted; request a line range to see them ...]\n"
+    return head + marker + tail
+
+
+def project_fields(data: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keep only the listed top-level fields of a JSON object.
+
+    Args:
+        data: Parsed JSON value
+        fields: Field names to keep (None keeps everything)
+
+    Returns:
+        Projected value (non-dict values are returned unchanged)
+    """
+    if not fields or not isinstance(data, dict):
+        return data
+    return {key: data[key] for key in fields if key in data}
+
+
+def compact_tool_result(
+    tool_type: str,
+    tool_call: Dict[str, Any],
+    result: Any,
+    policy: Dict[str, Any]
+) -> str:
+    """
+    Compact a successful tool result for the sub-agent prompt.
+
+    Args:
+        tool_type: "github", "jira", or "generic"
+        tool_call: Tool call dict (may include 'start_line' and 'end_line')
+        result: Tool result value
+        policy: Compaction policy from get_result_policy()
+
+    Returns:
+        Compact text representation of the result
+    """
+    max_chars = int(policy.get("max_chars", TOOL_RESULT_MAX_CHARS))
+    head_ratio = float(policy.get("head_ratio", 0.7))
+
+    # File contents: slice to the requested line range, then head/tail truncate
+    if isinstance(result, dict) and "content" in result and isinstance(result["content"], str):
+        content = result["content"]
+        header = f"File: {result.get('path', 'unknown')}"
+        start_line = tool_call.get("start_line")
+        end_line = tool_call.get("end_line")
+        if result.get("line_range"):
+            # The tool already returned only the requested lines
+            header += f" (lines {result['line_range'][0]}-{result['line_range'][1]})"
+        elif start_line or end_line:
+            content = slice_lines(content, start_line, end_line)
+            header += f" (lines {start_line or 1}-{end_line or 'end'})"
+        if result.get("truncated"):
+            header += f" (cut short after {result.get('size', len(content))} bytes; request a line range to see more)"
+        return f"{header}\nContent:\n{truncate_head_tail(content, max_chars, head_ratio)}"
+
+    # Several files: give each an equal share of the budget
+    if isinstance(result, dict) and isinstance(result.get("files"), list):
+        files = result["files"]
+        share = max_chars // max(1, len(files))
+        sections = [
+            f"File: {item.get('path', 'unknown')}\nContent:\n{truncate_head_tail(item.get('content', ''), share, head_ratio)}"
+            for item in files
+        ]
+        sections.extend(f"Skipped: {item['path']} ({item['reason']})" for item in result.get("skipped", []))
+        return "\n\n".join(sections) or "No files"
+
+    # Directory listings: one entry per line
+    if isinstance(result, dict) and isinstance(result.get("entries"), list):
+        lines = [f"Directory: {result.get('path', '/')} ({result.get('total', len(result['entries']))} entries)"]
+        for entry in result["entries"]:
+            size = f" ({entry['size']} bytes)" if "size" in entry else ""
+            lines.append(f"{entry['path']}{'/' if entry.get('type') == 'dir' else ''}{size}")
+        if result.get("truncated"):
+            lines.append("[... listing truncated; list a subdirectory to see more ...]")
+        return truncate_head_tail("\n".join(lines), max_chars, head_ratio)
+
+    # JSON results: project fields and serialize compactly
+    if isinstance(result, (dict, list)):
+        projected = project_fields(result, policy.get("fields"))
+        text = json.dumps(projected, separators=(",", ":"), ensure_ascii=False, default=str)
+        return truncate_head_tail(text, max_chars, head_ratio)
+
+    return truncate_head_tail(str(result), max_chars, head_ratio)
+
+
+def describe_tool_call(tool: Optional[Dict[str, Any]], tool_call: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """
+    Build a one-line reference to a tool call, used in place of the raw result
+    in the transcript passed on to refinement.
+
+    Args:
+        tool: Tool dict (or None if not found)
+        tool_call: Tool call dict
+        result: Result of ToolRegistry.call()
+
+    Returns:
+        Short reference such as "GitHub get_file_contents owner/repo/src/app.py: ok (1234 chars)"
+    """
+    tool_name = (tool or {}).get("name", f"Tool {tool_call.get('tool_id')}")
+    action = tool_call.get("action", "call")
+
+    target_keys = ("owner", "repo", "path", "project_key", "summary", "endpoint")
+    target = "/".join(str(tool_call[key]) for key in target_keys if tool_call.get(key))
+
+    if not result.get("success"):
+        return f"{tool_name} {action} {target}: failed ({result.get('error', 'Unknown error')[:200]})".replace("  ", " ")
+
+    value = result.get("result", {})
+    if isinstance(value, dict) and isinstance(value.get("content"), str):
+        size = f"{len(value['content'])} chars"
+    elif isinstance(value, dict) and isinstance(value.get("files"), list):
+        size = f"{len(value['files'])} files"
+    elif isinstance(value, dict) and isinstance(value.get("entries"), list):
+        size = f"{len(value['entries'])} entries"
+    elif isinstance(value, dict) and value.get("key"):
+        size = f"key {value['key']}"
+    elif isinstance(value, dict) and isinstance(value.get("results"), list):
+        size = f"{value.get('created', 0)} of {len(value['results'])} created"
+    else:
+        size = f"{len(json.dumps(value, default=str))} chars"
+    return f"{tool_name} {action} {target}: ok ({size})".replace("  ", " ")
@@ -3,9 +3,12 @@ Tool Handler for formatting tools for MCP and executing API calls.
 """
 import requests
 import json
-from typing import Dict, List, Any, Optional
-from .tools.github_tool import get_file_contents
-from .tools.jira_tool import create_issue
+from typing import Callable, Dict, List, Any, Optional
+from .config import TOOL_REQUEST_TIMEOUT_SECONDS
+from .tools.github_tool import get_file_contents, list_tree, get_files
+from .tools.jira_tool import create_issue, create_issues
+from .tools.jira_metadata import jira_metadata
+from .tools.transport import tool_transport
 
 
 def is_github_tool(tool: Dict[str, Any]) -> bool:
@@ -38,9 +41,9 @@ def is_jira_tool(tool: Dict[str, Any]) -> bool:
     return 'atlassian.net' in api_url or 'jira' in tool_name
 
 
-def format_tool_for_mcp(tool: Dict[str, Any]) -> Dict[str, Any]:
+def github_mcp_schema(tool: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Format a tool for MCP (Model Context Protocol) capabilities.
+    MCP tool definition of a GitHub tool.
     
     Args:
         tool: Tool dict with 'id', 'name', 'description', 'api_url', 'api_key'
@@ -48,86 +51,157 @@ def format_tool_for_mcp(tool: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         MCP-formatted tool definition
     """
-    # GitHub tools have special schema
-    if is_github_tool(tool):
-        return {
-            "name": tool.get("name", f"tool_{tool.get('id')}"),
-            "description": tool.get("description", ""),
-            "inputSchema": {
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["get_file_contents"],
-                        "default": "get_file_contents",
-                        "description": "GitHub action to perform"
-                    },
-                    "owner": {
-                        "type": "string",
-                        "description": "Repository owner (username or organization)"
-                    },
-                    "repo": {
-                        "type": "string",
-                        "description": "Repository name"
-                    },
-                    "path": {
-                        "type": "string",
-                        "description": "File path in the repository (e.g., 'src/main.py' or 'README.md')"
-                    }
+    return {
+        "name": tool.get("name", f"tool_{tool.get('id')}"),
+        "description": tool.get("description", ""),
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["get_file_contents", "list_tree", "get_files"],
+                    "default": "get_file_contents",
+                    "description": (
+                        "GitHub action to perform: get_file_contents reads one file, list_tree lists "
+                        "a directory, get_files reads several files or a whole directory at once"
+                    )
+                },
+                "owner": {
+                    "type": "string",
+                    "description": "Repository owner (username or organization)"
+                },
+                "repo": {
+                    "type": "string",
+                    "description": "Repository name"
                 },
-                "required": ["action", "owner", "repo", "path"]
+                "path": {
+                    "type": "string",
+                    "description": (
+                        "File path in the repository (e.g., 'src/main.py' or 'README.md'); "
+                        "a directory for list_tree and get_files"
+                    )
+                },
+                "paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "File paths to read with get_files"
+                },
+                "recursive": {
+                    "type": "boolean",
+                    "default": True,
+                    "description": "list_tree: list the whole subtree, not only the directory's children"
+                },
+                "start_line": {
+                    "type": "integer",
+                    "description": "Optional first line to return (1-based), for reading part of a large file"
+                },
+                "end_line": {
+                    "type": "integer",
+                    "description": "Optional last line to return (inclusive)"
+                },
+                "ref": {
+                    "type": "string",
+                    "description": "Optional branch, tag, or commit SHA (default: the default branch)"
+                }
             },
-            "metadata": {
-                "api_url": tool.get("api_url", ""),
-                "api_key": tool.get("api_key", ""),
-                "tool_id": tool.get("id"),
-                "tool_type": "github"
-            }
+            "required": ["action", "owner", "repo"]
+        },
+        "metadata": {
+            "api_url": tool.get("api_url", ""),
+            "api_key": tool.get("api_key", ""),
+            "tool_id": tool.get("id"),
+            "tool_type": "github"
         }
+    }
+
+
+def jira_mcp_schema(tool: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    MCP tool definition of a Jira tool, listing the valid projects and issue types
+    once the instance's metadata has been loaded.
     
-    # Jira tools have special schema
-    if is_jira_tool(tool):
-        return {
-            "name": tool.get("name", f"tool_{tool.get('id')}"),
-            "description": tool.get("description", ""),
-            "inputSchema": {
-                "type": "object",
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["create_issue"],
-                        "default": "create_issue",
-                        "description": "Jira action to perform"
-                    },
-                    "project_key": {
-                        "type": "string",
-                        "description": "Jira project key (e.g., 'PROJ')"
-                    },
-                    "summary": {
-                        "type": "string",
-                        "description": "Issue summary/title"
-                    },
-                    "issuetype": {
-                        "type": "string",
-                        "description": "Issue type name (e.g., 'Task', 'Bug', 'Story')"
-                    },
-                    "description": {
-                        "type": "string",
-                        "description": "Optional issue description"
-                    }
+    Args:
+        tool: Tool dict with 'id', 'name', 'description', 'api_url', 'api_key', 'email'
+    
+    Returns:
+        MCP-formatted tool definition
+    """
+    project_key_schema = {
+        "type": "string",
+        "description": "Jira project key (e.g., 'PROJ')"
+    }
+    issuetype_schema = {
+        "type": "string",
+        "description": "Issue type name (e.g., 'Task', 'Bug', 'Story')"
+    }
+    # Valid options, once the instance's metadata has been loaded
+    options = jira_metadata.describe(tool.get("api_url", ""), tool.get("email", ""))
+    if options:
+        project_key_schema["enum"] = sorted(options)
+        listed = "; ".join(
+            f"{key} ({', '.join(types)})" if types else key
+            for key, types in sorted(options.items())
+        )
+        issuetype_schema["description"] = f"Issue type name, by project: {listed}"
+    return {
+        "name": tool.get("name", f"tool_{tool.get('id')}"),
+        "description": tool.get("description", ""),
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["create_issue", "create_issues"],
+                    "default": "create_issue",
+                    "description": "Jira action to perform: create_issue files one issue, create_issues several at once"
                 },
-                "required": ["action", "project_key", "summary", "issuetype"]
+                "project_key": project_key_schema,
+                "summary": {
+                    "type": "string",
+                    "description": "Issue summary/title"
+                },
+                "issuetype": issuetype_schema,
+                "description": {
+                    "type": "string",
+                    "description": "Optional issue description"
+                },
+                "issues": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "project_key": project_key_schema,
+                            "summary": {"type": "string"},
+                            "issuetype": {"type": "string"},
+                            "description": {"type": "string"}
+                        },
+                        "required": ["project_key", "summary", "issuetype"]
+                    },
+                    "description": "Issues to create with create_issues"
+                }
             },
-            "metadata": {
-                "api_url": tool.get("api_url", ""),
-                "api_key": tool.get("api_key", ""),
-                "email": tool.get("email", ""),
-                "tool_id": tool.get("id"),
-                "tool_type": "jira"
-            }
+            "required": ["action"]
+        },
+        "metadata": {
+            "api_url": tool.get("api_url", ""),
+            "api_key": tool.get("api_key", ""),
+            "email": tool.get("email", ""),
+            "tool_id": tool.get("id"),
+            "tool_type": "jira"
         }
+    }
+
+
+def generic_mcp_schema(tool: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    MCP tool definition of a generic HTTP tool.
     
-    # Generic tool schema
+    Args:
+        tool: Tool dict with 'id', 'name', 'description', 'api_url', 'api_key'
+    
+    Returns:
+        MCP-formatted tool definition
+    """
     return {
         "name": tool.get("name", f"tool_{tool.get('id')}"),
         "description": tool.get("description", ""),
@@ -159,30 +233,37 @@ def format_tool_for_mcp(tool: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def format_tools_for_prompt(tools: List[Dict[str, Any]]) -> str:
+def format_tool_section(tool: Dict[str, Any], input_schema: Dict[str, Any], usage_instructions: str = "") -> str:
     """
-    Format tools for inclusion in system prompt with MCP capabilities.
+    Format one tool's section of the system prompt.
     
     Args:
-        tools: List of tool dicts with 'id', 'name', 'description', 'api_url', 'api_key'
+        tool: Tool dict with 'id', 'name', 'description', 'api_url'
+        input_schema: The tool's MCP input schema
+        usage_instructions: Optional usage example
     
     Returns:
-        Formatted string with tool descriptions and MCP capabilities
+        Prompt section describing the tool and how to call it
     """
-    tool_sections = []
+    tool_id = tool.get('id')
+    tool_name = tool.get('name', 'Unknown')
+    tool_description = tool.get('description', '')
+    api_url = tool.get('api_url', '')
     
-    for tool in tools:
-        tool_id = tool.get('id')
-        tool_name = tool.get('name', 'Unknown')
-        tool_description = tool.get('description', '')
-        api_url = tool.get('api_url', '')
-        
-        mcp_tool = format_tool_for_mcp(tool)
-        
-        # Add specific usage instructions for GitHub tools
-        usage_instructions = ""
-        if is_github_tool(tool):
-            usage_instructions = """
+    return f"""
+Tool {tool_id}: {tool_name}
+Description: {tool_description}
+API URL: {api_url}
+MCP Capability: Available
+You can call this tool using the MCP protocol with the following schema:
+{json.dumps(input_schema, indent=2)}
+{usage_instructions}
+"""
+
+
+def github_usage_example(tool_id: Any) -> str:
+    """Usage examples of a GitHub tool for the system prompt."""
+    return """
 Usage Example: To read a file from GitHub, use:
 {
   "tool_id": """ + str(tool_id) + """,
@@ -191,9 +272,21 @@ Usage Example: To read a file from GitHub, use:
   "repo": "repository-name",
   "path": "path/to/file.ext"
 }
+To read several files or a whole directory in one call, use:
+{
+  "tool_id": """ + str(tool_id) + """,
+  "action": "get_files",
+  "owner": "repository-owner-username",
+  "repo": "repository-name",
+  "paths": ["path/to/a.ext", "path/to/b.ext"]
+}
+(or "path": "path/to/directory" instead of "paths"). To list a directory, use "action": "list_tree" with "path".
 """
-        elif is_jira_tool(tool):
-            usage_instructions = """
+
+
+def jira_usage_example(tool_id: Any) -> str:
+    """Usage examples of a Jira tool for the system prompt."""
+    return """
 Usage Example: To create a Jira issue, use:
 {
   "tool_id": """ + str(tool_id) + """,
@@ -203,27 +296,24 @@ Usage Example: To create a Jira issue, use:
   "issuetype": "Task",
   "description": "Optional description"
 }
+To create several issues at once, use:
+{
+  "tool_id": """ + str(tool_id) + """,
+  "action": "create_issues",
+  "issues": [
+    {"project_key": "PROJ", "summary": "First issue", "issuetype": "Task"},
+    {"project_key": "PROJ", "summary": "Second issue", "issuetype": "Bug", "description": "Optional description"}
+  ]
+}
 """
-        
-        tool_section = f"""
-Tool {tool_id}: {tool_name}
-Description: {tool_description}
-API URL: {api_url}
-MCP Capability: Available
-You can call this tool using the MCP protocol with the following schema:
-{json.dumps(mcp_tool['inputSchema'], indent=2)}
-{usage_instructions}
-"""
-        tool_sections.append(tool_section)
-    
-    return "\n".join(tool_sections)
 
 
 def execute_tool(
     tool: Dict[str, Any],
     method: str = "POST",
     body: Optional[Dict[str, Any]] = None,
-    params: Optional[Dict[str, Any]] = None
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
 ) -> Dict[str, Any]:
     """
     Execute a tool API call with authentication.
@@ -233,6 +323,7 @@ def execute_tool(
         method: HTTP method (GET, POST, PUT, DELETE)
         body: Request body for POST/PUT requests
         params: Query parameters for GET requests
+        timeout: Request timeout in seconds
     
     Returns:
         Response from the API call
@@ -250,17 +341,14 @@ def execute_tool(
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
     
-    if method.upper() == "GET":
-        response = requests.get(api_url, headers=headers, params=params)
-    elif method.upper() == "POST":
-        response = requests.post(api_url, headers=headers, json=body, params=params)
-    elif method.upper() == "PUT":
-        response = requests.put(api_url, headers=headers, json=body, params=params)
-    elif method.upper() == "DELETE":
-        response = requests.delete(api_url, headers=headers, params=params)
-    else:
+    method = method.upper()
+    if method not in ("GET", "POST", "PUT", "DELETE"):
         raise ValueError(f"Unsupported HTTP method: {method}")
     
+    response = tool_transport.request(
+        method, api_url, headers=headers, params=params,
+        json=body if method in ("POST", "PUT") else None, timeout=timeout
+    )
     response.raise_for_status()
     
     try:
@@ -273,7 +361,11 @@ def execute_github_file_contents(
     tool: Dict[str, Any],
     owner: str,
     repo: str,
-    path: str
+    path: str,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS,
+    ref: Optional[str] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Execute GitHub file contents API call.
@@ -283,6 +375,10 @@ def execute_github_file_contents(
         owner: Repository owner
         repo: Repository name
         path: File path
+        timeout: Request timeout in seconds
+        ref: Optional branch, tag, or commit SHA
+        start_line: Optional first line to return
+        end_line: Optional last line to return
     
     Returns:
         Dict with file contents and metadata
@@ -291,11 +387,98 @@ def execute_github_file_contents(
     if not api_key:
         raise ValueError("GitHub tool requires api_key")
     
+    return _run_github_call(
+        "getting file contents",
+        lambda: get_file_contents(
+            owner, repo, path, api_key, timeout=timeout, ref=ref,
+            start_line=start_line, end_line=end_line
+        )
+    )
+
+
+def execute_github_list_tree(
+    tool: Dict[str, Any],
+    owner: str,
+    repo: str,
+    path: str = "",
+    ref: Optional[str] = None,
+    recursive: bool = True,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
+) -> Dict[str, Any]:
+    """
+    Execute GitHub directory listing API call.
+    
+    Args:
+        tool: Tool dict with 'api_key'
+        owner: Repository owner
+        repo: Repository name
+        path: Directory (default: the repository root)
+        ref: Optional branch, tag, or commit SHA
+        recursive: List the whole subtree
+        timeout: Request timeout in seconds
+    
+    Returns:
+        Dict with the directory entries
+    """
+    api_key = tool.get('api_key', '')
+    if not api_key:
+        raise ValueError("GitHub tool requires api_key")
+    
+    return _run_github_call(
+        "listing directory",
+        lambda: list_tree(owner, repo, api_key, path=path, ref=ref, recursive=recursive, timeout=timeout)
+    )
+
+
+def execute_github_get_files(
+    tool: Dict[str, Any],
+    owner: str,
+    repo: str,
+    paths: Optional[List[str]] = None,
+    path: Optional[str] = None,
+    ref: Optional[str] = None,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
+) -> Dict[str, Any]:
+    """
+    Execute a batch of GitHub file contents API calls.
+    
+    Args:
+        tool: Tool dict with 'api_key'
+        owner: Repository owner
+        repo: Repository name
+        paths: File paths to fetch
+        path: Directory to fetch the files of (used when paths is not given)
+        ref: Optional branch, tag, or commit SHA
+        timeout: Time budget in seconds for the whole batch
+    
+    Returns:
+        Dict with the fetched files and the ones skipped
+    """
+    api_key = tool.get('api_key', '')
+    if not api_key:
+        raise ValueError("GitHub tool requires api_key")
+    
+    return _run_github_call(
+        "getting files",
+        lambda: get_files(owner, repo, api_key, paths=paths, path=path, ref=ref, timeout=timeout)
+    )
+
+
+def _run_github_call(activity: str, call: Callable[[], Any]) -> Dict[str, Any]:
+    """
+    Run a GitHub API call and wrap its result or error in a tool result dict.
+    
+    Args:
+        activity: What the call does, for error messages (e.g., "getting file contents")
+        call: The API call
+    
+    Returns:
+        Dict with 'success' and 'result' or 'error'
+    """
     try:
-        result = get_file_contents(owner, repo, path, api_key)
         return {
             "success": True,
-            "result": result
+            "result": call()
         }
     except requests.HTTPError as e:
         # Handle rate limiting specifically
@@ -311,7 +494,7 @@ def execute_github_file_contents(
     except Exception as e:
         return {
             "success": False,
-            "error": f"Error getting file contents: {str(e)}"
+            "error": f"Error {activity}: {str(e)}"
         }
 
 
@@ -320,7 +503,8 @@ def execute_jira_create_issue(
     project_key: str,
     summary: str,
     issuetype: str,
-    description: Optional[str] = None
+    description: Optional[str] = None,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
 ) -> Dict[str, Any]:
     """
     Execute Jira create issue API call.
@@ -331,6 +515,7 @@ def execute_jira_create_issue(
         summary: Issue summary/title
         issuetype: Issue type name
         description: Optional issue description
+        timeout: Request timeout in seconds
     
     Returns:
         Dict with issue creation result
@@ -352,7 +537,8 @@ def execute_jira_create_issue(
             project_key=project_key,
             summary=summary,
             issuetype=issuetype,
-            description=description
+            description=description,
+            timeout=timeout
         )
         return {
             "success": True,
@@ -375,79 +561,201 @@ def execute_jira_create_issue(
         }
 
 
-def handle_mcp_tool_call(
-    tool_id: int,
-    tools: List[Dict[str, Any]],
-    mcp_call: Dict[str, Any]
+def execute_jira_create_issues(
+    tool: Dict[str, Any],
+    issues: List[Dict[str, Any]],
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
 ) -> Dict[str, Any]:
     """
-    Handle an MCP tool call request from a sub-agent.
+    Execute a Jira bulk create API call.
+    Issues missing a required field are reported as failed without being sent.
     
     Args:
-        tool_id: ID of the tool to execute
-        tools: List of available tools
-        mcp_call: MCP call parameters (varies by tool type)
+        tool: Tool dict with 'api_url', 'api_key', and 'email'
+        issues: Issue dicts with 'project_key', 'summary', 'issuetype', and optional 'description'
+        timeout: Time budget in seconds
     
     Returns:
-        Result of tool execution
+        Dict with one result per issue, in order
     """
-    # Find the tool by ID
-    tool = next((t for t in tools if t.get('id') == tool_id), None)
-    
-    if not tool:
-        return {"error": f"Tool with ID {tool_id} not found"}
-    
-    # Handle GitHub tools
-    if is_github_tool(tool):
-        action = mcp_call.get('action', 'get_file_contents')
-        if action == 'get_file_contents':
-            owner = mcp_call.get('owner')
-            repo = mcp_call.get('repo')
-            path = mcp_call.get('path')
-            
-            if not owner or not repo or not path:
-                return {
-                    "success": False,
-                    "error": "GitHub get_file_contents requires 'owner', 'repo', and 'path' parameters"
-                }
-            
-            return execute_github_file_contents(tool, owner, repo, path)
+    api_url = tool.get('api_url', '')
+    api_key = tool.get('api_key', '')
+    email = tool.get('email', '')
+    
+    if not api_key:
+        raise ValueError("Jira tool requires api_key")
+    if not email:
+        raise ValueError("Jira tool requires email")
+    
+    results: List[Optional[Dict[str, Any]]] = []
+    valid_issues = []
+    for issue in issues:
+        if not isinstance(issue, dict) or not all(issue.get(key) for key in ("project_key", "summary", "issuetype")):
+            results.append({
+                "summary": issue.get("summary", "") if isinstance(issue, dict) else "",
+                "success": False,
+                "error": "Issue requires 'project_key', 'summary', and 'issuetype'"
+            })
         else:
+            results.append(None)
+            valid_issues.append(issue)
+    
+    try:
+        created = create_issues(api_url, email, api_key, valid_issues, timeout=timeout) if valid_issues else None
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error creating Jira issues: {str(e)}"
+        }
+    created_results = iter(created["results"] if created else [])
+    results = [result if result is not None else next(created_results) for result in results]
+    created_count = sum(1 for result in results if result["success"])
+    return {
+        "success": True,
+        "result": {
+            "results": results,
+            "created": created_count,
+            "failed": len(results) - created_count,
+            "success": created_count == len(results),
+        }
+    }
+
+
+def handle_github_call(tool: Dict[str, Any], mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Validate and execute an MCP call to a GitHub tool.
+    
+    Args:
+        tool: GitHub tool dict
+        mcp_call: MCP call parameters ('action', 'owner', 'repo', ...)
+        timeout: Time budget in seconds
+    
+    Returns:
+        Result of tool execution
+    """
+    action = mcp_call.get('action', 'get_file_contents')
+    if action == 'get_file_contents':
+        owner = mcp_call.get('owner')
+        repo = mcp_call.get('repo')
+        path = mcp_call.get('path')
+        
+        if not owner or not repo or not path:
+            return {
+                "success": False,
+                "error": "GitHub get_file_contents requires 'owner', 'repo', and 'path' parameters"
+            }
+        
+        try:
+            start_line = int(mcp_call['start_line']) if mcp_call.get('start_line') else None
+            end_line = int(mcp_call['end_line']) if mcp_call.get('end_line') else None
+        except (TypeError, ValueError):
+            return {
+                "success": False,
+                "error": "GitHub get_file_contents 'start_line' and 'end_line' must be line numbers"
+            }
+        
+        return execute_github_file_contents(
+            tool, owner, repo, path, timeout=timeout, ref=mcp_call.get('ref'),
+            start_line=start_line, end_line=end_line
+        )
+    elif action in ('list_tree', 'get_files'):
+        owner = mcp_call.get('owner')
+        repo = mcp_call.get('repo')
+        
+        if not owner or not repo:
+            return {
+                "success": False,
+                "error": f"GitHub {action} requires 'owner' and 'repo' parameters"
+            }
+        
+        if action == 'list_tree':
+            return execute_github_list_tree(
+                tool, owner, repo, path=mcp_call.get('path') or "", ref=mcp_call.get('ref'),
+                recursive=mcp_call.get('recursive', True) is not False, timeout=timeout
+            )
+        
+        paths = mcp_call.get('paths')
+        if paths is not None and (not isinstance(paths, list) or not all(isinstance(p, str) for p in paths)):
             return {
                 "success": False,
-                "error": f"Unknown GitHub action: {action}"
+                "error": "GitHub get_files 'paths' must be a list of file paths"
             }
+        if not paths and not mcp_call.get('path'):
+            return {
+                "success": False,
+                "error": "GitHub get_files requires 'paths' or a directory 'path'"
+            }
+        return execute_github_get_files(
+            tool, owner, repo, paths=paths, path=mcp_call.get('path'),
+            ref=mcp_call.get('ref'), timeout=timeout
+        )
+    else:
+        return {
+            "success": False,
+            "error": f"Unknown GitHub action: {action}"
+        }
+
+
+def handle_jira_call(tool: Dict[str, Any], mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Validate and execute an MCP call to a Jira tool.
     
-    # Handle Jira tools
-    if is_jira_tool(tool):
-        action = mcp_call.get('action', 'create_issue')
-        if action == 'create_issue':
-            project_key = mcp_call.get('project_key')
-            summary = mcp_call.get('summary')
-            issuetype = mcp_call.get('issuetype')
-            description = mcp_call.get('description')
-            
-            if not project_key or not summary or not issuetype:
-                return {
-                    "success": False,
-                    "error": "Jira create_issue requires 'project_key', 'summary', and 'issuetype' parameters"
-                }
-            
-            return execute_jira_create_issue(tool, project_key, summary, issuetype, description)
-        else:
+    Args:
+        tool: Jira tool dict
+        mcp_call: MCP call parameters ('action', 'project_key', 'summary', ...)
+        timeout: Time budget in seconds
+    
+    Returns:
+        Result of tool execution
+    """
+    action = mcp_call.get('action', 'create_issue')
+    if action == 'create_issue':
+        project_key = mcp_call.get('project_key')
+        summary = mcp_call.get('summary')
+        issuetype = mcp_call.get('issuetype')
+        description = mcp_call.get('description')
+        
+        if not project_key or not summary or not issuetype:
             return {
                 "success": False,
-                "error": f"Unknown Jira action: {action}"
+                "error": "Jira create_issue requires 'project_key', 'summary', and 'issuetype' parameters"
             }
+        
+        return execute_jira_create_issue(tool, project_key, summary, issuetype, description, timeout=timeout)
+    elif action == 'create_issues':
+        issues = mcp_call.get('issues')
+        if not isinstance(issues, list) or not issues:
+            return {
+                "success": False,
+                "error": "Jira create_issues requires a non-empty 'issues' list"
+            }
+        
+        return execute_jira_create_issues(tool, issues, timeout=timeout)
+    else:
+        return {
+            "success": False,
+            "error": f"Unknown Jira action: {action}"
+        }
+
+
+def handle_generic_call(tool: Dict[str, Any], mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Execute an MCP call to a generic HTTP tool.
     
-    # Handle generic tools
+    Args:
+        tool: Tool dict
+        mcp_call: MCP call parameters ('method', 'body', 'params')
+        timeout: Time budget in seconds
+    
+    Returns:
+        Result of tool execution
+    """
     method = mcp_call.get('method', 'POST')
     body = mcp_call.get('body')
     params = mcp_call.get('params')
     
     try:
-        result = execute_tool(tool, method=method, body=body, params=params)
+        result = execute_tool(tool, method=method, body=body, params=params, timeout=timeout)
         return {"success": True, "result": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
-
@@ -0,0 +1,401 @@
+"""
+Tool registry: each system's tools compiled once into handlers, indexed by ID, with
+their tool type resolved and their prompt section (with their MCP schema) rendered.
+"""
+import inspect
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional, Type
+from .config import TOOL_REQUEST_TIMEOUT_SECONDS
+from .deadline import Deadline, DeadlineExceeded, call_timeout
+from .idempotency import idempotency_key, idempotent_calls, normalize_arguments
+from .tool_handler import (
+    is_github_tool, is_jira_tool, github_mcp_schema, jira_mcp_schema, generic_mcp_schema,
+    github_usage_example, jira_usage_example, format_tool_section,
+    handle_github_call, handle_jira_call, handle_generic_call,
+)
+from .tools.jira_metadata import jira_metadata
+
+
+class ToolHandler(ABC):
+    """
+    A configured tool, compiled for dispatch: how it is described to sub-agents and
+    how its calls are executed.
+
+    This is the plugin interface for tool types. A new type subclasses ToolHandler,
+    sets `name`, implements matches(), build_schema(), and call() (and optionally
+    usage_example(), warm(), and idempotency_arguments()), and is passed to
+    register_tool_type(). A tool config can also name its type explicitly with a
+    "type" key.
+    """
+
+    # Tool type name, used in tool configs ("type") and to pick result policies
+    name = "generic"
+
+    def __init__(self, tool: Dict[str, Any]):
+        """
+        Compile a tool: build its schema once and render its prompt section.
+
+        Args:
+            tool: Tool dict with 'id', 'name', 'description', 'api_url', 'api_key'
+        """
+        self.tool = tool
+        self.tool_id = tool.get('id')
+        self._compile()
+
+    @classmethod
+    def matches(cls, tool: Dict[str, Any]) -> bool:
+        """
+        Whether a tool config without an explicit "type" is of this tool type.
+
+        Args:
+            tool: Tool dict
+
+        Returns:
+            True if this handler should serve the tool
+        """
+        return False
+
+    @abstractmethod
+    def build_schema(self) -> Dict[str, Any]:
+        """
+        Build the tool's MCP definition (called once, when the tool is compiled).
+
+        Returns:
+            MCP-formatted tool definition with 'name', 'description', 'inputSchema', 'metadata'
+        """
+
+    def usage_example(self) -> str:
+        """Usage example appended to the tool's prompt section (empty for none)."""
+        return ""
+
+    @abstractmethod
+    def call(self, mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        Validate and execute an MCP call.
+
+        Args:
+            mcp_call: MCP call parameters
+            timeout: Time budget in seconds
+
+        Returns:
+            Dict with 'success' and 'result' or 'error'
+        """
+
+    def warm(self) -> None:
+        """Start loading anything the tool's schema depends on (called when the system is created)."""
+
+    def idempotency_arguments(self, mcp_call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        What identifies a side-effecting call, so that repeating it within the same
+        request returns the first call's result instead of running again.
+
+        Args:
+            mcp_call: MCP call parameters
+
+        Returns:
+            Normalized arguments of the call, or None if the call has no side effects
+            (and may simply run again)
+        """
+        return None
+
+    def prompt_fragment(self) -> str:
+        """The tool's section of the sub-agent system prompt."""
+        return self._fragment
+
+    def _compile(self) -> None:
+        """Build the schema and render the prompt section."""
+        schema = self.build_schema()
+        self._fragment = format_tool_section(self.tool, schema['inputSchema'], self.usage_example())
+
+
+class GitHubToolHandler(ToolHandler):
+    """GitHub contents API tools (get_file_contents, list_tree, get_files)."""
+
+    name = "github"
+
+    @classmethod
+    def matches(cls, tool: Dict[str, Any]) -> bool:
+        return is_github_tool(tool)
+
+    def build_schema(self) -> Dict[str, Any]:
+        return github_mcp_schema(self.tool)
+
+    def usage_example(self) -> str:
+        return github_usage_example(self.tool_id)
+
+    def call(self, mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        return handle_github_call(self.tool, mcp_call, timeout)
+
+
+class JiraToolHandler(ToolHandler):
+    """
+    Jira issue creation tools (create_issue, create_issues).
+
+    The schema lists the instance's projects and issue types once they are loaded,
+    so it is rebuilt whenever the Jira metadata cache has fetched something new.
+    """
+
+    name = "jira"
+
+    def __init__(self, tool: Dict[str, Any]):
+        self._generation = jira_metadata.generation
+        super().__init__(tool)
+
+    @classmethod
+    def matches(cls, tool: Dict[str, Any]) -> bool:
+        return is_jira_tool(tool)
+
+    def build_schema(self) -> Dict[str, Any]:
+        return jira_mcp_schema(self.tool)
+
+    def usage_example(self) -> str:
+        return jira_usage_example(self.tool_id)
+
+    def call(self, mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        return handle_jira_call(self.tool, mcp_call, timeout)
+
+    def idempotency_arguments(self, mcp_call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        action = mcp_call.get('action', 'create_issue')
+        if action == 'create_issue':
+            return {"action": action, "issue": _issue_identity(mcp_call)}
+        if action == 'create_issues' and isinstance(mcp_call.get('issues'), list):
+            return {"action": action, "issues": [_issue_identity(issue) for issue in mcp_call['issues']]}
+        return None
+
+    def warm(self) -> None:
+        if self.tool.get('api_key') and self.tool.get('email'):
+            jira_metadata.warm(self.tool.get('api_url', ''), self.tool['email'], self.tool['api_key'])
+
+    def prompt_fragment(self) -> str:
+        self._refresh()
+        return self._fragment
+
+    def _refresh(self) -> None:
+        """Rebuild the schema if Jira metadata was fetched since it was built."""
+        generation = jira_metadata.generation
+        if generation != self._generation:
+            # Read the generation first: a fetch finishing meanwhile triggers another rebuild
+            self._generation = generation
+            self._compile()
+
+
+class GenericToolHandler(ToolHandler):
+    """Any other HTTP API, called with a method and a JSON body (the fallback type)."""
+
+    name = "generic"
+
+    @classmethod
+    def matches(cls, tool: Dict[str, Any]) -> bool:
+        return True
+
+    def build_schema(self) -> Dict[str, Any]:
+        return generic_mcp_schema(self.tool)
+
+    def call(self, mcp_call: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        return handle_generic_call(self.tool, mcp_call, timeout)
+
+    def idempotency_arguments(self, mcp_call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        method = str(mcp_call.get('method', 'POST')).upper()
+        if method in ("GET", "HEAD"):
+            return None
+        return normalize_arguments({
+            "method": method, "body": mcp_call.get('body'), "params": mcp_call.get('params')
+        })
+
+
+# Registered tool types, in the order they are matched against tool configs;
+# GenericToolHandler serves tools no registered type matches
+_TOOL_TYPES: List[Type[ToolHandler]] = [GitHubToolHandler, JiraToolHandler]
+
+
+def register_tool_type(handler_class: Type[ToolHandler]) -> Type[ToolHandler]:
+    """
+    Register a tool type. Types registered later are matched first, so a plugin can
+    take over tools a built-in type would otherwise serve. Can be used as a class
+    decorator.
+
+    Args:
+        handler_class: ToolHandler subclass with a unique `name`
+
+    Returns:
+        handler_class
+
+    Raises:
+        ValueError: If handler_class is not a ToolHandler, leaves an abstract method
+            (build_schema() or call()) unimplemented, or its name is taken
+    """
+    if not isinstance(handler_class, type) or not issubclass(handler_class, ToolHandler):
+        raise ValueError("Tool types must be ToolHandler subclasses")
+    if inspect.isabstract(handler_class):
+        missing = ", ".join(sorted(handler_class.__abstractmethods__))
+        raise ValueError(f"Tool type '{handler_class.name}' does not implement {missing}")
+    if any(registered.name == handler_class.name for registered in _TOOL_TYPES + [GenericToolHandler]):
+        raise ValueError(f"Tool type '{handler_class.name}' is already registered")
+    _TOOL_TYPES.insert(0, handler_class)
+    return handler_class
+
+
+def resolve_tool_type(tool: Dict[str, Any]) -> Type[ToolHandler]:
+    """
+    Find the handler class of a tool: the type its config names, else the first
+    registered type that matches it, else GenericToolHandler.
+
+    Args:
+        tool: Tool dict
+
+    Returns:
+        ToolHandler subclass
+
+    Raises:
+        ValueError: If the config names an unknown type
+    """
+    tool_type = tool.get('type')
+    if tool_type:
+        for handler_class in _TOOL_TYPES + [GenericToolHandler]:
+            if handler_class.name == tool_type:
+                return handler_class
+        known = ", ".join(handler_class.name for handler_class in _TOOL_TYPES + [GenericToolHandler])
+        raise ValueError(f"Tool {tool.get('id')} has unknown type '{tool_type}' (known types: {known})")
+    return next((handler_class for handler_class in _TOOL_TYPES if handler_class.matches(tool)), GenericToolHandler)
+
+
+class ToolRegistry:
+    """
+    A system's tools, compiled once when the system is created.
+
+    Tool types are resolved, schemas built, and prompt sections rendered up front;
+    lookups by ID or name are dictionary lookups. Side-effecting calls are keyed by
+    (system, request, tool, normalized arguments), and repeats of a call within the
+    idempotency window get the first call's result.
+    """
+
+    def __init__(self, tools: List[Dict[str, Any]], system_id: Optional[str] = None):
+        """
+        Compile a system's tools.
+
+        Args:
+            tools: List of tool configurations
+            system_id: ID of the system, part of the calls' idempotency keys
+
+        Raises:
+            ValueError: If a tool names an unknown type
+        """
+        self.system_id = system_id
+        self._handlers: Dict[Any, ToolHandler] = {}
+        self._by_name: Dict[str, ToolHandler] = {}
+        for tool in tools:
+            handler = resolve_tool_type(tool)(tool)
+            # The first tool with an ID or name wins, as with a linear search
+            self._handlers.setdefault(handler.tool_id, handler)
+            self._by_name.setdefault(tool.get('name', '').lower(), handler)
+
+    def get(self, tool_id: Any) -> Optional[ToolHandler]:
+        """Handler of a tool by ID, or None."""
+        return self._handlers.get(tool_id)
+
+    def handlers(self) -> List[ToolHandler]:
+        """Handlers of all tools, in config order."""
+        return list(self._handlers.values())
+
+    def find_by_name(self, name: str) -> Optional[ToolHandler]:
+        """Handler of a tool by name (case-insensitive), or None."""
+        return self._by_name.get(name.lower())
+
+    def tool_type(self, tool_id: Any) -> str:
+        """Type name of a tool ("generic" if unknown)."""
+        handler = self._handlers.get(tool_id)
+        return handler.name if handler is not None else GenericToolHandler.name
+
+    def format_for_prompt(self, tool_ids: List[Any]) -> str:
+        """
+        Prompt sections of a model's tools.
+
+        Args:
+            tool_ids: IDs of the model's tools (unknown IDs are skipped)
+
+        Returns:
+            Formatted string with tool descriptions and MCP capabilities
+        """
+        return "\n".join(
+            self._handlers[tool_id].prompt_fragment() for tool_id in tool_ids if tool_id in self._handlers
+        )
+
+    def call(
+        self,
+        tool_id: Any,
+        mcp_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Handle an MCP tool call request from a sub-agent.
+
+        Args:
+            tool_id: ID of the tool to execute
+            mcp_call: MCP call parameters (varies by tool type)
+            deadline: Optional request deadline; the call gets at most the time left
+
+        Returns:
+            Result of tool execution
+        """
+        handler = self._handlers.get(tool_id)
+        if handler is None:
+            return {"error": f"Tool with ID {tool_id} not found"}
+
+        try:
+            timeout = call_timeout(deadline, TOOL_REQUEST_TIMEOUT_SECONDS, f"tool {tool_id}")
+        except DeadlineExceeded as e:
+            return {"success": False, "error": str(e)}
+
+        # Files the query named may already have been fetched speculatively (see core/prefetch.py)
+        if handler.name == "github" and deadline is not None and deadline.prefetch is not None:
+            result = deadline.prefetch.take(tool_id, mcp_call, timeout)
+            if result is not None:
+                return result
+
+        key = self.idempotency_key(tool_id, mcp_call, deadline)
+        if key is None:
+            return handler.call(mcp_call, timeout)
+        return idempotent_calls.run(key, lambda: handler.call(mcp_call, timeout), timeout)
+
+    def idempotency_key(
+        self,
+        tool_id: Any,
+        mcp_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Optional[str]:
+        """
+        Idempotency key of a call.
+
+        Args:
+            tool_id: ID of the tool
+            mcp_call: MCP call parameters
+            deadline: Deadline of the request the call is made for
+
+        Returns:
+            Key, or None if the call is not side-effecting or not made for a request
+        """
+        handler = self._handlers.get(tool_id)
+        if handler is None or deadline is None:
+            return None
+        arguments = handler.idempotency_arguments(mcp_call)
+        if arguments is None:
+            return None
+        return idempotency_key(self.system_id, deadline.request_id, tool_id, arguments)
+
+    def warm(self) -> None:
+        """Let every tool start loading what its schema depends on."""
+        for handler in self._handlers.values():
+            handler.warm()
+
+
+def _issue_identity(issue: Any) -> Any:
+    """Normalized fields of a Jira issue (project keys and issue types match case-insensitively)."""
+    if not isinstance(issue, dict):
+        return issue
+    identity = normalize_arguments({
+        key: issue.get(key) for key in ("project_key", "summary", "issuetype", "description")
+    })
+    for key in ("project_key", "issuetype"):
+        if isinstance(identity.get(key), str):
+            identity[key] = identity[key].lower()
+    return identity
@@ -0,0 +1,108 @@
+"""
+Cache of GitHub file contents, revalidated with ETags and deduplicated by blob SHA.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from ..config import GITHUB_CACHE_MAX_BYTES
+from ..metrics import Metrics, global_metrics
+
+# Most (owner, repo, ref, path) entries remembered; their content is bounded separately
+_MAX_ENTRIES = 4096
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class FileContentCache:
+    """
+    Thread-safe cache of file contents in front of the GitHub contents API.
+
+    Each (owner, repo, ref, path) maps to the ETag and blob SHA of its last response;
+    the decoded content is stored once per SHA, so the same file in several repos or
+    branches takes space once. Callers revalidate with If-None-Match and reuse the
+    content on a 304, which does not count against the GitHub rate limit. Contents
+    are evicted least recently used first when they exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = GITHUB_CACHE_MAX_BYTES, metrics: Metrics = global_metrics):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_bytes: Largest total size of cached contents (0 disables the cache)
+            metrics: Metrics that receive the cache size gauges
+        """
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self._entries: "OrderedDict[CacheKey, Tuple[str, str, Dict[str, Any]]]" = OrderedDict()
+        self._blobs: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key: CacheKey) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Get the cached response for a file.
+
+        Args:
+            key: (owner, repo, ref, path); ref is "" for the default branch
+
+        Returns:
+            (ETag, result dict) to revalidate, or None if the file is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            etag, sha, metadata = entry
+            blob = self._blobs.get(sha)
+            if blob is None:
+                # Content was evicted; the next fetch must be unconditional
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self._blobs.move_to_end(sha)
+            return etag, dict(metadata, content=blob[0])
+
+    def store(self, key: CacheKey, etag: str, result: Dict[str, Any]) -> None:
+        """
+        Cache a file fetched from GitHub.
+
+        Args:
+            key: (owner, repo, ref, path)
+            etag: ETag of the response
+            result: Result dict with 'content' and 'sha'
+        """
+        content = result["content"]
+        sha = result.get("sha")
+        size = len(content.encode("utf-8"))
+        if not sha or self.max_bytes <= 0 or size > self.max_bytes:
+            return
+        metadata = {name: value for name, value in result.items() if name != "content"}
+        with self._lock:
+            self._entries[key] = (etag, sha, metadata)
+            self._entries.move_to_end(key)
+            if len(self._entries) > _MAX_ENTRIES:
+                self._entries.popitem(last=False)
+            if sha in self._blobs:
+                self._blobs.move_to_end(sha)
+                self.metrics.incr("github.cache.deduplicated")
+            else:
+                self._blobs[sha] = (content, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._blobs.popitem(last=False)
+                    self._bytes -= evicted_size
+                    self.metrics.incr("github.cache.evicted")
+            self.metrics.set_gauge("github.cache.bytes", self._bytes)
+            self.metrics.set_gauge("github.cache.blobs", len(self._blobs))
+
+    def clear(self) -> None:
+        """Drop all cached contents."""
+        with self._lock:
+            self._entries.clear()
+            self._blobs.clear()
+            self._bytes = 0
+
+
+# Process-wide cache shared by every GitHub tool
+file_cache = FileContentCache()
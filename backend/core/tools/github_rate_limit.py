@@ -0,0 +1,199 @@
+"""
+GitHub rate-limit scheduling: a shared budget per API token, kept from the
+X-RateLimit-* headers of every response.
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+import requests
+from ..config import GITHUB_RATE_LOW_FRACTION, GITHUB_BACKGROUND_RESERVE_FRACTION
+from ..metrics import Metrics, global_metrics
+
+# Call priorities: interactive calls serve a waiting user, background calls (e.g.,
+# prefetches) only use budget that interactive calls are not expected to need
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+
+class _TokenBudget:
+    """Rate-limit state of one token (guarded by the scheduler's lock)."""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0           # Epoch seconds when the window resets
+        self.blocked_until = 0.0      # Epoch seconds; set by secondary rate limits
+        self.next_slot = 0.0          # Epoch seconds; earliest start of a paced call
+        self.interactive_waiting = 0
+
+
+class GitHubRateScheduler:
+    """
+    Schedules GitHub API calls against the rate limit of the token they use.
+
+    Every response updates the token's budget from its X-RateLimit-Remaining and
+    X-RateLimit-Reset headers, and every call takes one unit from it up front, so
+    concurrent calls from all systems see the same budget. Once less than
+    low_fraction of the limit is left, calls are paced evenly over the rest of the
+    window; when nothing is left, they wait for the reset. Background calls keep
+    background_reserve of the limit free and always yield to waiting interactive calls.
+    """
+
+    def __init__(
+        self,
+        low_fraction: float = GITHUB_RATE_LOW_FRACTION,
+        background_reserve: float = GITHUB_BACKGROUND_RESERVE_FRACTION,
+        metrics: Metrics = global_metrics
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            low_fraction: Share of the limit below which calls are paced
+            background_reserve: Share of the limit background calls leave untouched
+            metrics: Metrics that receive the budget gauges and wait counters
+        """
+        self.low_fraction = low_fraction
+        self.background_reserve = background_reserve
+        self.metrics = metrics
+        self._budgets: Dict[str, _TokenBudget] = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, api_key: str, timeout: float, priority: str = INTERACTIVE) -> float:
+        """
+        Wait until a call with this token fits the rate-limit budget, and take a unit of it.
+
+        Args:
+            api_key: GitHub token the call uses
+            timeout: Longest time to wait
+            priority: INTERACTIVE or BACKGROUND
+
+        Returns:
+            Seconds waited
+
+        Raises:
+            requests.HTTPError: If the budget does not allow the call within the timeout
+        """
+        key = self._key(api_key)
+        started = time.monotonic()
+        give_up_at = started + timeout
+        with self._cond:
+            budget = self._budgets.setdefault(key, _TokenBudget())
+            interactive = priority != BACKGROUND
+            if interactive:
+                budget.interactive_waiting += 1
+            try:
+                while True:
+                    wait, required = self._wait_needed(budget, interactive)
+                    if wait <= 0:
+                        break
+                    if time.monotonic() + wait > give_up_at:
+                        if not required:
+                            # Pacing is best effort: go now rather than fail with budget left
+                            self._take_slot(budget, interactive)
+                            break
+                        self.metrics.incr(f"github.rate.rejected.{priority}")
+                        raise requests.HTTPError(
+                            f"GitHub API rate limit nearly exhausted for this token "
+                            f"({budget.remaining} of {budget.limit} left, resets in "
+                            f"{max(0, budget.reset_at - time.time()):.0f}s); try again later"
+                        )
+                    self._cond.wait(wait)
+                if budget.remaining is not None:
+                    budget.remaining -= 1
+                    self.metrics.set_gauge(f"github.rate.remaining.{key}", budget.remaining)
+            finally:
+                if interactive:
+                    budget.interactive_waiting -= 1
+                    self._cond.notify_all()
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.metrics.incr(f"github.rate.waits.{priority}")
+            self.metrics.observe("github.rate.wait_seconds", waited)
+        return waited
+
+    def update(self, api_key: str, response: requests.Response) -> None:
+        """
+        Update a token's budget from a response.
+
+        Args:
+            api_key: GitHub token the call used
+            response: GitHub API response
+        """
+        headers = response.headers
+        key = self._key(api_key)
+        with self._cond:
+            budget = self._budgets.setdefault(key, _TokenBudget())
+            try:
+                remaining = int(headers["X-RateLimit-Remaining"])
+                limit = int(headers.get("X-RateLimit-Limit", remaining))
+                reset_at = float(headers.get("X-RateLimit-Reset", 0))
+            except (KeyError, ValueError):
+                remaining = None
+            if remaining is not None:
+                if reset_at != budget.reset_at or budget.remaining is None:
+                    # First response of a new window
+                    budget.remaining = remaining
+                else:
+                    # Responses of concurrent calls may arrive out of order
+                    budget.remaining = min(budget.remaining, remaining)
+                budget.limit = limit
+                budget.reset_at = reset_at
+                self.metrics.set_gauge(f"github.rate.remaining.{key}", budget.remaining)
+            if response.status_code in (403, 429) and headers.get("Retry-After"):
+                # Secondary rate limit: GitHub says how long to back off
+                try:
+                    budget.blocked_until = time.time() + float(headers["Retry-After"])
+                except ValueError:
+                    pass
+            self._cond.notify_all()
+
+    def _wait_needed(self, budget: _TokenBudget, interactive: bool) -> Tuple[float, bool]:
+        """
+        Time until a call may start (lock held).
+
+        Returns:
+            (seconds to wait, 0 if the call may start now; True if the wait is
+            required, False if it only paces calls)
+        """
+        now = time.time()
+        if now < budget.blocked_until:
+            return budget.blocked_until - now, True
+        if not interactive and budget.interactive_waiting:
+            return 0.05, True
+        if budget.remaining is None or budget.limit is None:
+            return 0.0, False
+        if now >= budget.reset_at:
+            # The window has reset; the next response reports the new budget
+            budget.remaining = None
+            return 0.0, False
+        if self._available(budget, interactive) <= 0:
+            return budget.reset_at - now, True
+        if budget.remaining > budget.limit * self.low_fraction:
+            return 0.0, False
+        # Running low: spread what is left evenly over the rest of the window
+        if now < budget.next_slot:
+            return budget.next_slot - now, not interactive
+        self._take_slot(budget, interactive)
+        return 0.0, False
+
+    def _available(self, budget: _TokenBudget, interactive: bool) -> int:
+        """Units a call of this priority may still use in the window (lock held)."""
+        reserve = 0 if interactive else int(budget.limit * self.background_reserve)
+        return budget.remaining - reserve
+
+    def _take_slot(self, budget: _TokenBudget, interactive: bool) -> None:
+        """Move the paced start time on by an even share of the rest of the window (lock held)."""
+        now = time.time()
+        available = max(1, self._available(budget, interactive))
+        budget.next_slot = max(now, budget.next_slot) + max(0.0, budget.reset_at - now) / available
+
+    @staticmethod
+    def _key(api_key: str) -> str:
+        """Short, non-reversible name of a token, used as the budget key and in metric names."""
+        return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+# Process-wide scheduler: all systems sharing a token share its budget
+github_scheduler = GitHubRateScheduler()
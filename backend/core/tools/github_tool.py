@@ -1,80 +1,478 @@
 """
-GitHub Tool for reading file contents from GitHub repositories.
+GitHub Tool for reading file contents and directory trees from GitHub repositories.
 """
+import hashlib
 import requests
-import base64
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from ..config import (
+    TOOL_REQUEST_TIMEOUT_SECONDS, GITHUB_FILE_MAX_BYTES, GITHUB_TREE_MAX_ENTRIES,
+    GITHUB_BATCH_MAX_FILES, GITHUB_BATCH_MAX_CHARS, GITHUB_BATCH_CONCURRENCY,
+)
+from .github_cache import file_cache
+from .github_rate_limit import github_scheduler, INTERACTIVE
+from .transport import tool_transport
+from ..metrics import global_metrics
 
+GITHUB_API_URL = "https://api.github.com"
 
-def get_file_contents(owner: str, repo: str, path: str, api_key: str) -> Dict[str, Any]:
+# Git tree entry types as reported to the model
+_ENTRY_TYPES = {"blob": "file", "tree": "dir", "commit": "submodule"}
+
+# Streamed read size, and how much of a file's start is checked for binary content
+_CHUNK_BYTES = 16 * 1024
+_BINARY_SNIFF_BYTES = 8000
+
+
+def _headers(api_key: str) -> Dict[str, str]:
+    """Request headers for the GitHub REST API."""
+    return {
+        "Accept": "application/vnd.github.v3+json",
+        "Authorization": f"Bearer {api_key}",
+    }
+
+
+def _get(
+    api_key: str,
+    endpoint: str,
+    timeout: float,
+    priority: str,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, str]] = None,
+    stream: bool = False,
+    started: Optional[threading.Event] = None
+) -> requests.Response:
+    """
+    Send a GET request to the GitHub API once the token's rate-limit budget allows it.
+    
+    Args:
+        api_key: GitHub Personal Access Token
+        endpoint: API path (e.g., "/repos/owner/repo/contents/README.md")
+        timeout: Time budget in seconds, including any wait for the budget
+        priority: INTERACTIVE or BACKGROUND (see github_rate_limit)
+        headers: Request headers (default: _headers(api_key))
+        params: Optional query parameters
+        stream: Stream the body (the caller must close the response)
+        started: Optional event set once the budget allows the call, as it is sent
+    
+    Returns:
+        The response (its status is not checked)
+    
+    Raises:
+        requests.HTTPError: If the rate-limit budget does not allow the call in time
+    """
+    waited = github_scheduler.acquire(api_key, timeout, priority)
+    if started is not None:
+        started.set()
+    response = tool_transport.request(
+        "GET", f"{GITHUB_API_URL}{endpoint}", headers=headers or _headers(api_key),
+        params=params, timeout=max(0.001, timeout - waited), stream=stream
+    )
+    github_scheduler.update(api_key, response)
+    return response
+
+
+def _check_rate_limit(response: requests.Response) -> None:
+    """Raise a descriptive error if GitHub rejected the request for its rate limit."""
+    if response.status_code == 403:
+        rate_limit_remaining = response.headers.get("X-RateLimit-Remaining", "unknown")
+        rate_limit_reset = response.headers.get("X-RateLimit-Reset", "unknown")
+        raise requests.HTTPError(
+            f"GitHub API rate limit exceeded. Remaining: {rate_limit_remaining}, "
+            f"Resets at: {rate_limit_reset}"
+        )
+
+
+def get_file_contents(
+    owner: str,
+    repo: str,
+    path: str,
+    api_key: str,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS,
+    ref: Optional[str] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    max_bytes: int = GITHUB_FILE_MAX_BYTES,
+    priority: str = INTERACTIVE,
+    started: Optional[threading.Event] = None
+) -> Dict[str, Any]:
     """
     Get file contents from a GitHub repository.
+    The raw file is streamed, and reading stops as soon as it turns out to be binary,
+    at end_line, or once max_bytes of content have been read, so large files are never
+    downloaded in full only to be cut down. Files read in full are cached and
+    revalidated with their ETag, so an unchanged file costs a 304 (which does not
+    count against the rate limit) and is served from the file cache.
     
     Args:
         owner: Repository owner (username or organization)
         repo: Repository name
         path: File path in the repository
         api_key: GitHub Personal Access Token
+        timeout: Request timeout in seconds
+        ref: Optional branch, tag, or commit SHA (default: the repository's default branch)
+        start_line: Optional first line to return (1-based)
+        end_line: Optional last line to return (inclusive)
+        max_bytes: Most bytes of content returned
+        priority: INTERACTIVE, or BACKGROUND for calls no user is waiting for
+        started: Optional event set once the rate-limit budget allows the download
     
     Returns:
         Dict with file contents and metadata:
         {
-            "content": "<decoded file content>",
-            "sha": "<file SHA>",
-            "size": <file size>,
-            "encoding": "base64",
-            "path": "<file path>"
+            "content": "<file content, or the requested lines>",
+            "sha": "<blob SHA, empty if the file was not read in full>",
+            "size": <bytes read>,
+            "encoding": "utf-8",
+            "path": "<file path>",
+            "line_range": [<first line>, <last line>] (only if a range was requested),
+            "truncated": True (only if max_bytes cut the content short)
         }
     
     Raises:
         requests.HTTPError: If the API request fails
-        ValueError: If file is not found or is a directory
+        ValueError: If file is not found, is a directory, or is binary
     """
-    base_url = "https://api.github.com"
     endpoint = f"/repos/{owner}/{repo}/contents/{path}"
+    headers = _headers(api_key)
+    headers["Accept"] = "application/vnd.github.raw+json"
+    params = {"ref": ref} if ref else None
+    line_range = start_line is not None or end_line is not None
     
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "Authorization": f"Bearer {api_key}",
+    cache_key = (owner, repo, ref or "", path)
+    cached = file_cache.lookup(cache_key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    
+    give_up_at = time.monotonic() + timeout
+    response = _get(
+        api_key, endpoint, timeout, priority, headers=headers, params=params, stream=True, started=started
+    )
+    try:
+        if response.status_code == 304 and cached:
+            global_metrics.incr("github.cache.hits")
+            return _select_lines(cached[1], start_line, end_line, max_bytes)
+        global_metrics.incr("github.cache.misses")
+        
+        _check_rate_limit(response)
+        if response.status_code == 404:
+            raise ValueError(f"File '{path}' not found or is not a file")
+        response.raise_for_status()
+        
+        # Directories come back as a JSON listing even when the raw file is asked for
+        # (files are served raw, never as application/json), so check before reading
+        if response.headers.get("Content-Type", "").startswith("application/json"):
+            raise ValueError(f"Path '{path}' is a directory, not a file; use list_tree or get_files")
+        
+        if line_range:
+            body, first_line, truncated = _read_line_range(
+                response, path, start_line, end_line, max_bytes, give_up_at
+            )
+            complete = False
+        else:
+            body, complete = _read_capped(response, path, max_bytes, give_up_at)
+            first_line, truncated = 1, not complete
+    finally:
+        response.close()
+    
+    result = {
+        "content": body.decode("utf-8", errors="replace"),
+        # The Git blob SHA of the content, so identical files share one cache entry
+        "sha": hashlib.sha1(b"blob %d\0" % len(body) + body).hexdigest() if complete else "",
+        "size": len(body),
+        "encoding": "utf-8",
+        "path": path,
+        "name": path.split("/")[-1],
+        "type": "file",
     }
+    if truncated:
+        result["truncated"] = True
+    if line_range:
+        last_line = first_line + max(0, result["content"].count("\n") - result["content"].endswith("\n"))
+        result["content"] = result["content"].removesuffix("\n")
+        result["line_range"] = [first_line, last_line]
+        return result
     
-    response = requests.get(f"{base_url}{endpoint}", headers=headers)
+    etag = response.headers.get("ETag")
+    if complete and etag:
+        file_cache.store(cache_key, etag, result)
+    return result
+
+
+def _select_lines(
+    result: Dict[str, Any],
+    start_line: Optional[int],
+    end_line: Optional[int],
+    max_bytes: int
+) -> Dict[str, Any]:
+    """Apply a line range and the byte cap to a cached file."""
+    content = result["content"]
+    if start_line is not None or end_line is not None:
+        lines = content.splitlines()
+        first = max(1, int(start_line or 1))
+        if first > len(lines):
+            raise ValueError(
+                f"File '{result['path']}' has only {len(lines)} lines; start_line {first} is past its end"
+            )
+        last = min(len(lines), int(end_line or len(lines)))
+        content = "\n".join(lines[first - 1:last])
+        result = dict(result, line_range=[first, max(first, last)])
+    encoded = content.encode("utf-8")
+    if len(encoded) > max_bytes:
+        content = encoded[:max_bytes].decode("utf-8", errors="ignore")
+        result = dict(result, truncated=True)
+    return dict(result, content=content)
+
+
+def _check_binary(data: bytes, path: str) -> None:
+    """Raise if the start of a file looks binary (contains a NUL byte, as Git checks)."""
+    if b"\0" in data[:_BINARY_SNIFF_BYTES]:
+        raise ValueError(f"File '{path}' is binary; only text files can be read")
+
+
+def _read_capped(
+    response: requests.Response,
+    path: str,
+    max_bytes: int,
+    give_up_at: float
+) -> Tuple[bytes, bool]:
+    """
+    Read a streamed body up to max_bytes.
     
-    # Handle rate limiting
-    if response.status_code == 403:
-        rate_limit_remaining = response.headers.get("X-RateLimit-Remaining", "unknown")
-        rate_limit_reset = response.headers.get("X-RateLimit-Reset", "unknown")
-        raise requests.HTTPError(
-            f"GitHub API rate limit exceeded. Remaining: {rate_limit_remaining}, "
-            f"Resets at: {rate_limit_reset}"
-        )
+    Returns:
+        (body, True if the whole body was read)
+    """
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=_CHUNK_BYTES):
+        if not body:
+            _check_binary(chunk, path)
+        body += chunk
+        if len(body) > max_bytes:
+            return bytes(body[:max_bytes]), False
+        if time.monotonic() > give_up_at:
+            raise TimeoutError(f"Timed out reading '{path}' from GitHub")
+    return bytes(body), True
+
+
+def _iter_lines(response: requests.Response, path: str, give_up_at: float) -> Iterator[bytes]:
+    """Yield the lines of a streamed body (without their newline), checking for binary content."""
+    pending = b""
+    sniffed = 0
+    for chunk in response.iter_content(chunk_size=_CHUNK_BYTES):
+        if sniffed < _BINARY_SNIFF_BYTES:
+            _check_binary(chunk, path)
+            sniffed += len(chunk)
+        if time.monotonic() > give_up_at:
+            raise TimeoutError(f"Timed out reading '{path}' from GitHub")
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _read_line_range(
+    response: requests.Response,
+    path: str,
+    start_line: Optional[int],
+    end_line: Optional[int],
+    max_bytes: int,
+    give_up_at: float
+) -> Tuple[bytes, int, bool]:
+    """
+    Read the lines start_line..end_line of a streamed body. Earlier lines are
+    skipped without being kept, and reading stops after end_line or max_bytes.
+    
+    Returns:
+        (the lines' bytes, number of the first line, True if max_bytes cut them short)
+    """
+    first_line = max(1, int(start_line or 1))
+    kept = bytearray()
+    line_count = 0
+    for line_number, line in enumerate(_iter_lines(response, path, give_up_at), start=1):
+        line_count = line_number
+        if line_number < first_line:
+            continue
+        if len(kept) + len(line) + 1 > max_bytes:
+            return bytes(kept), first_line, True
+        kept += line + b"\n"
+        if end_line is not None and line_number >= int(end_line):
+            break
+    if line_count < first_line:
+        raise ValueError(f"File '{path}' has only {line_count} lines; start_line {first_line} is past its end")
+    return bytes(kept), first_line, False
+
+
+def list_tree(
+    owner: str,
+    repo: str,
+    api_key: str,
+    path: str = "",
+    ref: Optional[str] = None,
+    recursive: bool = True,
+    max_entries: int = GITHUB_TREE_MAX_ENTRIES,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS,
+    priority: str = INTERACTIVE
+) -> Dict[str, Any]:
+    """
+    List a directory of a GitHub repository in one call (Git Trees API).
+    
+    Args:
+        owner: Repository owner (username or organization)
+        repo: Repository name
+        api_key: GitHub Personal Access Token
+        path: Directory to list (default: the repository root)
+        ref: Optional branch, tag, or commit SHA (default: the default branch)
+        recursive: List the whole subtree rather than only the directory's children
+        max_entries: Most entries returned
+        timeout: Request timeout in seconds
+        priority: INTERACTIVE, or BACKGROUND for calls no user is waiting for
     
+    Returns:
+        Dict with the listing:
+        {
+            "path": "<directory>",
+            "entries": [{"path": "<path>", "type": "file" | "dir" | "submodule", "size": <bytes>}, ...],
+            "total": <entries before the cap>,
+            "truncated": <True if entries were left out>
+        }
+    
+    Raises:
+        requests.HTTPError: If the API request fails
+        ValueError: If the directory does not exist
+    """
+    endpoint = f"/repos/{owner}/{repo}/git/trees/{ref or 'HEAD'}"
+    response = _get(api_key, endpoint, timeout, priority, params={"recursive": "1"})
+    _check_rate_limit(response)
     response.raise_for_status()
     data = response.json()
     
-    # Check if it's a directory (GitHub returns array for directories)
-    if isinstance(data, list):
-        raise ValueError(f"Path '{path}' is a directory, not a file")
-    
-    # Check if content exists
-    if "content" not in data:
-        raise ValueError(f"File '{path}' not found or is not a file")
+    prefix = path.strip("/")
+    prefix = f"{prefix}/" if prefix else ""
+    entries = []
+    for item in data.get("tree", []):
+        item_path = item.get("path", "")
+        if not item_path.startswith(prefix):
+            continue
+        if not recursive and "/" in item_path[len(prefix):]:
+            continue
+        entry = {"path": item_path, "type": _ENTRY_TYPES.get(item.get("type"), item.get("type"))}
+        if "size" in item:
+            entry["size"] = item["size"]
+        entries.append(entry)
     
-    # Decode base64 content
-    try:
-        # GitHub API returns base64-encoded content with newlines, need to remove them
-        encoded_content = data["content"].replace("\n", "")
-        decoded_content = base64.b64decode(encoded_content).decode("utf-8")
-    except Exception as e:
-        raise ValueError(f"Failed to decode file content: {str(e)}")
+    if prefix and not entries:
+        raise ValueError(f"Directory '{path}' not found or empty")
     
     return {
-        "content": decoded_content,
-        "sha": data.get("sha", ""),
-        "size": data.get("size", 0),
-        "encoding": data.get("encoding", "base64"),
-        "path": data.get("path", path),
-        "name": data.get("name", path.split("/")[-1]),
-        "type": data.get("type", "file"),
+        "path": path or "/",
+        "entries": entries[:max_entries],
+        "total": len(entries),
+        # GitHub also truncates very large trees on its side
+        "truncated": len(entries) > max_entries or bool(data.get("truncated")),
     }
 
+
+def get_files(
+    owner: str,
+    repo: str,
+    api_key: str,
+    paths: Optional[List[str]] = None,
+    path: Optional[str] = None,
+    ref: Optional[str] = None,
+    max_files: int = GITHUB_BATCH_MAX_FILES,
+    max_chars: int = GITHUB_BATCH_MAX_CHARS,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS,
+    priority: str = INTERACTIVE
+) -> Dict[str, Any]:
+    """
+    Fetch several files in one call, concurrently.
+    Either pass the file paths, or a directory whose files (recursively) are fetched.
+    Files beyond max_files, or past max_chars of content in total, are listed as skipped.
+    
+    Args:
+        owner: Repository owner (username or organization)
+        repo: Repository name
+        api_key: GitHub Personal Access Token
+        paths: File paths to fetch
+        path: Directory to fetch the files of (used when paths is not given)
+        ref: Optional branch, tag, or commit SHA (default: the default branch)
+        max_files: Most files fetched
+        max_chars: Largest total content size in characters
+        timeout: Time budget in seconds for the whole batch
+        priority: INTERACTIVE, or BACKGROUND for calls no user is waiting for
+    
+    Returns:
+        Dict with the files:
+        {
+            "files": [{"path": "<path>", "content": "<content>", "sha": "<sha>", "size": <bytes>}, ...],
+            "skipped": [{"path": "<path>", "reason": "<why it was not returned>"}, ...],
+            "truncated": <True if files were skipped for a cap>
+        }
+    
+    Raises:
+        requests.HTTPError: If listing the directory fails
+        ValueError: If neither paths nor path is given
+    """
+    give_up_at = time.monotonic() + timeout
+    skipped: List[Dict[str, str]] = []
+    if paths:
+        candidates = [{"path": file_path} for file_path in paths]
+    elif path is not None:
+        tree = list_tree(owner, repo, api_key, path=path, ref=ref, timeout=timeout, priority=priority)
+        candidates = [entry for entry in tree["entries"] if entry["type"] == "file"]
+    else:
+        raise ValueError("get_files requires 'paths' or a directory 'path'")
+    
+    # Sizes from the tree let files that cannot fit be skipped without fetching them
+    selected = []
+    budget = max_chars
+    capped = False
+    for entry in candidates:
+        if len(selected) >= max_files:
+            skipped.append({"path": entry["path"], "reason": f"over the {max_files}-file cap"})
+            capped = True
+        elif entry.get("size", 0) > budget:
+            skipped.append({"path": entry["path"], "reason": f"{entry['size']} bytes, over the size cap"})
+            capped = True
+        else:
+            selected.append(entry["path"])
+            budget -= entry.get("size", 0)
+    
+    def fetch(file_path: str) -> Dict[str, Any]:
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("batch timed out")
+        return get_file_contents(
+            owner, repo, file_path, api_key, timeout=remaining, ref=ref, priority=priority
+        )
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(GITHUB_BATCH_CONCURRENCY, len(selected)))) as pool:
+        futures = [(file_path, pool.submit(fetch, file_path)) for file_path in selected]
+        files = []
+        total_chars = 0
+        for file_path, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                skipped.append({"path": file_path, "reason": f"error: {e}"})
+                continue
+            if total_chars + len(result["content"]) > max_chars:
+                skipped.append({"path": file_path, "reason": "over the size cap"})
+                capped = True
+                continue
+            total_chars += len(result["content"])
+            files.append({
+                "path": result["path"],
+                "content": result["content"],
+                "sha": result["sha"],
+                "size": result["size"],
+            })
+    
+    return {
+        "files": files,
+        "skipped": skipped,
+        "truncated": capped,
+    }
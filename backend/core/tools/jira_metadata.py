@@ -0,0 +1,270 @@
+"""
+Cached Jira create metadata (projects, issue types, required fields) for validating
+issues locally before they are sent.
+"""
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from ..config import (
+    TOOL_REQUEST_TIMEOUT_SECONDS, JIRA_METADATA_TTL_SECONDS, JIRA_METADATA_MAX_PROJECTS,
+    JIRA_METADATA_FAILURE_TTL_SECONDS,
+)
+from .transport import tool_transport
+
+# Fields the Jira tool sets itself (or Jira fills in), so they never block a create
+_SUPPLIED_FIELDS = {"project", "summary", "issuetype", "description", "reporter"}
+
+
+class IssueValidationError(ValueError):
+    """Raised when an issue does not fit the instance's create metadata."""
+
+
+class _FetchFailed:
+    """Cached outcome of a metadata fetch that failed."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class JiraMetadataCache:
+    """
+    Per-instance cache of what can be created in Jira, with a TTL.
+
+    Entries are keyed by (Jira URL, account email), since what an account may create
+    depends on its permissions. When metadata cannot be fetched, validation lets the
+    issue through and Jira has the final say, as before; the failure is remembered
+    for failure_ttl_seconds, so later issues skip validation without fetching again.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = JIRA_METADATA_TTL_SECONDS,
+        failure_ttl_seconds: float = JIRA_METADATA_FAILURE_TTL_SECONDS
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl_seconds: How long fetched metadata is used before it is fetched again
+            failure_ttl_seconds: How long a failed fetch is remembered
+        """
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        # Incremented whenever metadata is fetched, so cached schemas know to refresh
+        self.generation = 0
+        self._entries: Dict[Tuple[str, ...], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def validate(
+        self,
+        jira_url: str,
+        email: str,
+        api_token: str,
+        issue: Dict[str, Any],
+        timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
+    ) -> Dict[str, Any]:
+        """
+        Check an issue against the instance's create metadata.
+
+        Args:
+            jira_url: Jira instance URL
+            email: Email address for authentication
+            api_token: Jira API token
+            issue: Issue dict with 'project_key', 'summary', 'issuetype', and optional 'description'
+            timeout: Time budget in seconds for fetching missing metadata
+
+        Returns:
+            The issue, with project key and issue type in Jira's spelling
+
+        Raises:
+            IssueValidationError: If the project or issue type does not exist, or the
+                issue type requires fields the tool cannot set (any failure to fetch or
+                parse the metadata sends the issue unvalidated instead)
+        """
+        give_up_at = time.monotonic() + timeout
+        try:
+            projects = self.projects(jira_url, email, api_token, timeout)
+            project_key = _match(issue["project_key"], projects)
+            if project_key is None:
+                raise IssueValidationError(
+                    f"Unknown project '{issue['project_key']}'; valid project keys: {_listing(projects)}"
+                )
+            issue_types = self.issue_types(
+                jira_url, email, api_token, project_key, max(0.001, give_up_at - time.monotonic())
+            )
+            issuetype = _match(issue["issuetype"], {name: name for name in issue_types})
+            if issuetype is None:
+                raise IssueValidationError(
+                    f"Unknown issue type '{issue['issuetype']}' for project {project_key}; "
+                    f"valid issue types: {_listing(issue_types)}"
+                )
+            required = self.required_fields(
+                jira_url, email, api_token, project_key, issue_types[issuetype],
+                max(0.001, give_up_at - time.monotonic())
+            )
+        except IssueValidationError:
+            raise
+        except Exception as e:
+            print(f"WARNING: Could not load Jira metadata from {jira_url} ({e}), sending issue unvalidated")
+            return issue
+        if required:
+            raise IssueValidationError(
+                f"Issue type {issuetype} in project {project_key} requires fields this tool cannot set: "
+                f"{', '.join(required)}; use another issue type"
+            )
+        return dict(issue, project_key=project_key, issuetype=issuetype)
+
+    def projects(self, jira_url: str, email: str, api_token: str, timeout: float) -> Dict[str, str]:
+        """
+        Projects the account can see.
+
+        Returns:
+            Dict of project key -> project name
+        """
+        def fetch() -> Dict[str, str]:
+            data = _get(jira_url, email, api_token, "/rest/api/2/project", timeout)
+            return {project["key"]: project.get("name", "") for project in data}
+        return self._cached((jira_url, email, "projects"), fetch)
+
+    def issue_types(
+        self,
+        jira_url: str,
+        email: str,
+        api_token: str,
+        project_key: str,
+        timeout: float
+    ) -> Dict[str, str]:
+        """
+        Issue types that can be created in a project.
+
+        Returns:
+            Dict of issue type name -> issue type ID
+        """
+        def fetch() -> Dict[str, str]:
+            data = _get(jira_url, email, api_token, f"/rest/api/2/issue/createmeta/{project_key}/issuetypes", timeout)
+            values = data.get("issueTypes") or data.get("values") or []
+            return {item["name"]: item["id"] for item in values if not item.get("subtask")}
+        return self._cached((jira_url, email, "issuetypes", project_key), fetch)
+
+    def required_fields(
+        self,
+        jira_url: str,
+        email: str,
+        api_token: str,
+        project_key: str,
+        issuetype_id: str,
+        timeout: float
+    ) -> List[str]:
+        """
+        Required fields of an issue type, other than those the tool sets and those with defaults.
+
+        Returns:
+            Field names
+        """
+        def fetch() -> List[str]:
+            data = _get(
+                jira_url, email, api_token,
+                f"/rest/api/2/issue/createmeta/{project_key}/issuetypes/{issuetype_id}", timeout
+            )
+            values = data.get("fields") or data.get("values") or []
+            return [
+                field.get("name", field.get("fieldId", ""))
+                for field in values
+                if field.get("required") and not field.get("hasDefaultValue")
+                and field.get("fieldId", field.get("key")) not in _SUPPLIED_FIELDS
+            ]
+        return self._cached((jira_url, email, "fields", project_key, issuetype_id), fetch)
+
+    def describe(self, jira_url: str, email: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Cached projects and their issue types, without fetching anything.
+
+        Args:
+            jira_url: Jira instance URL
+            email: Account email
+
+        Returns:
+            Dict of project key -> issue type names (empty if not fetched yet), or
+            None if the projects have not been fetched
+        """
+        now = time.monotonic()
+        with self._lock:
+            projects = self._entries.get((_normalize(jira_url), email, "projects"))
+            if projects is None or projects[0] < now or isinstance(projects[1], _FetchFailed):
+                return None
+            described = {}
+            for key in projects[1]:
+                types = self._entries.get((_normalize(jira_url), email, "issuetypes", key))
+                fresh = types is not None and types[0] >= now and not isinstance(types[1], _FetchFailed)
+                described[key] = sorted(types[1]) if fresh else []
+            return described
+
+    def warm(self, jira_url: str, email: str, api_token: str) -> None:
+        """
+        Fetch the projects and (for up to JIRA_METADATA_MAX_PROJECTS of them) their
+        issue types in the background, so they can go into the tool schema.
+        """
+        def run() -> None:
+            try:
+                projects = self.projects(jira_url, email, api_token, TOOL_REQUEST_TIMEOUT_SECONDS)
+                for project_key in list(projects)[:JIRA_METADATA_MAX_PROJECTS]:
+                    self.issue_types(jira_url, email, api_token, project_key, TOOL_REQUEST_TIMEOUT_SECONDS)
+            except Exception as e:
+                print(f"WARNING: Could not load Jira metadata from {jira_url}: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def _cached(self, key: Tuple[str, ...], fetch) -> Any:
+        """Return a fresh cached value, or fetch and cache it (re-raising a remembered failure)."""
+        key = (_normalize(key[0]),) + key[1:]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now:
+                if isinstance(entry[1], _FetchFailed):
+                    raise entry[1].error
+                return entry[1]
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.failure_ttl_seconds, _FetchFailed(e))
+            raise
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.generation += 1
+        return value
+
+
+def _get(jira_url: str, email: str, api_token: str, path: str, timeout: float) -> Any:
+    """GET a Jira REST resource and parse its JSON body."""
+    # Imported here: jira_tool uses this module for validation
+    from .jira_tool import _auth_headers
+    response = tool_transport.request(
+        "GET", f"{_normalize(jira_url)}{path}", headers=_auth_headers(email, api_token), timeout=timeout
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _normalize(jira_url: str) -> str:
+    """Jira URL without a trailing slash."""
+    return jira_url.rstrip('/')
+
+
+def _match(value: str, options: Dict[str, Any]) -> Optional[str]:
+    """The option equal to value, ignoring case, or None."""
+    if value in options:
+        return value
+    lowered = str(value).lower()
+    return next((option for option in options if option.lower() == lowered), None)
+
+
+def _listing(options: Dict[str, Any], limit: int = 30) -> str:
+    """Comma-separated option names, shortened past limit."""
+    names = sorted(options)
+    more = f" (and {len(names) - limit} more)" if len(names) > limit else ""
+    return ", ".join(names[:limit]) + more
+
+
+# Process-wide cache shared by every Jira tool
+jira_metadata = JiraMetadataCache()
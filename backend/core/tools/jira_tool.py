@@ -3,7 +3,55 @@ Jira Tool for creating issues in Jira.
 """
 import requests
 import base64
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, List, Any, Optional
+from ..config import TOOL_REQUEST_TIMEOUT_SECONDS
+from .transport import tool_transport
+from .jira_metadata import IssueValidationError, jira_metadata
+
+# Most issues Jira accepts in one bulk request
+JIRA_BULK_MAX_ISSUES = 50
+
+
+def _auth_headers(email: str, api_token: str) -> Dict[str, str]:
+    """Basic Auth request headers for the Jira REST API."""
+    credentials = f"{email}:{api_token}"
+    encoded_credentials = base64.b64encode(credentials.encode()).decode()
+    return {
+        "Authorization": f"Basic {encoded_credentials}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+
+def _issue_fields(
+    project_key: str,
+    summary: str,
+    issuetype: str,
+    description: Optional[str] = None
+) -> Dict[str, Any]:
+    """The 'fields' object of an issue create request."""
+    fields = {
+        "project": {
+            "key": project_key
+        },
+        "summary": summary,
+        "issuetype": {
+            "name": issuetype
+        }
+    }
+    
+    # Add description if provided
+    if description:
+        fields["description"] = description
+    return fields
+
+
+def _format_errors(error_data: Dict[str, Any]) -> str:
+    """Join the field errors and error messages of a Jira error response."""
+    messages = [f"{k}: {v}" for k, v in (error_data.get("errors") or {}).items()]
+    messages.extend(error_data.get("errorMessages") or [])
+    return "; ".join(messages)
 
 
 def create_issue(
@@ -13,7 +61,8 @@ def create_issue(
     project_key: str,
     summary: str,
     issuetype: str,
-    description: Optional[str] = None
+    description: Optional[str] = None,
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
 ) -> Dict[str, Any]:
     """
     Create a Jira issue.
@@ -26,6 +75,7 @@ def create_issue(
         summary: Issue summary/title
         issuetype: Issue type name (e.g., "Task", "Bug", "Story")
         description: Optional issue description
+        timeout: Request timeout in seconds
     
     Returns:
         Dict with issue details:
@@ -39,40 +89,26 @@ def create_issue(
     
     Raises:
         requests.HTTPError: If the API request fails
-        ValueError: If required fields are missing or invalid
+        ValueError: If required fields are missing or invalid (checked against the
+            cached project and issue type metadata before anything is sent)
     """
     # Ensure jira_url doesn't have trailing slash
     jira_url = jira_url.rstrip('/')
     endpoint = f"{jira_url}/rest/api/2/issue/"
+    give_up_at = time.monotonic() + timeout
     
-    # Create Basic Auth header
-    credentials = f"{email}:{api_token}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
+    issue = jira_metadata.validate(
+        jira_url, email, api_token,
+        {"project_key": project_key, "summary": summary, "issuetype": issuetype},
+        timeout
+    )
     
-    headers = {
-        "Authorization": f"Basic {encoded_credentials}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-    
-    # Build request body
-    payload = {
-        "fields": {
-            "project": {
-                "key": project_key
-            },
-            "summary": summary,
-            "issuetype": {
-                "name": issuetype
-            }
-        }
-    }
-    
-    # Add description if provided
-    if description:
-        payload["fields"]["description"] = description
+    headers = _auth_headers(email, api_token)
+    payload = {"fields": _issue_fields(issue["project_key"], summary, issue["issuetype"], description)}
     
-    response = requests.post(endpoint, headers=headers, json=payload)
+    response = tool_transport.request(
+        "POST", endpoint, headers=headers, json=payload, timeout=max(0.001, give_up_at - time.monotonic())
+    )
     
     # Handle authentication errors
     if response.status_code == 401:
@@ -99,3 +135,145 @@ def create_issue(
         "url": f"{jira_url}/browse/{data.get('key', '')}"
     }
 
+
+def create_issues(
+    jira_url: str,
+    email: str,
+    api_token: str,
+    issues: List[Dict[str, Any]],
+    timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS
+) -> Dict[str, Any]:
+    """
+    Create several Jira issues with the bulk endpoint (one request per 50 issues).
+    Issues are reported one by one, so some can fail while the others are created.
+    
+    Args:
+        jira_url: Jira instance URL (e.g., "https://your-domain.atlassian.net")
+        email: Email address for authentication
+        api_token: Jira API token
+        issues: Issue dicts with 'project_key', 'summary', 'issuetype', and optional 'description'
+        timeout: Time budget in seconds for all requests
+    
+    Returns:
+        Dict with one result per issue, in order (issues that fail validation against
+        the cached metadata are not sent; a batch that fails as a whole, e.g. on
+        authentication, reports the error for each of its issues):
+        {
+            "results": [
+                {"key": "<issue-key>", "id": "<issue-id>", "self": "<issue-url>",
+                 "summary": "<summary>", "success": True, "url": "<browse-url>"},
+                {"summary": "<summary>", "success": False, "error": "<why it failed>"},
+                ...
+            ],
+            "created": <number created>,
+            "failed": <number failed>,
+            "success": <True if all were created>
+        }
+    """
+    jira_url = jira_url.rstrip('/')
+    endpoint = f"{jira_url}/rest/api/2/issue/bulk"
+    headers = _auth_headers(email, api_token)
+    give_up_at = time.monotonic() + timeout
+    
+    # Check every issue locally first; rejected ones keep their place in the results
+    rejected: Dict[int, str] = {}
+    valid: List[Dict[str, Any]] = []
+    for index, issue in enumerate(issues):
+        try:
+            valid.append(jira_metadata.validate(
+                jira_url, email, api_token, issue, max(0.001, give_up_at - time.monotonic())
+            ))
+        except IssueValidationError as e:
+            rejected[index] = str(e)
+    
+    sent: List[Dict[str, Any]] = []
+    for batch_start in range(0, len(valid), JIRA_BULK_MAX_ISSUES):
+        batch = valid[batch_start:batch_start + JIRA_BULK_MAX_ISSUES]
+        payload = {
+            "issueUpdates": [
+                {"fields": _issue_fields(
+                    issue["project_key"], issue["summary"], issue["issuetype"], issue.get("description")
+                )}
+                for issue in batch
+            ]
+        }
+        try:
+            data = _post_bulk(endpoint, headers, payload, max(0.001, give_up_at - time.monotonic()))
+        except requests.RequestException as e:
+            # The whole batch failed; earlier batches may still have been created
+            sent.extend(
+                {"summary": issue["summary"], "success": False, "error": str(e)} for issue in batch
+            )
+            continue
+        
+        errors = {
+            error.get("failedElementNumber"): _format_errors(error.get("elementErrors") or {})
+            for error in data.get("errors") or []
+        }
+        created = iter(data.get("issues") or [])
+        for index, issue in enumerate(batch):
+            if index in errors:
+                sent.append({
+                    "summary": issue["summary"],
+                    "success": False,
+                    "error": errors[index] or "Jira rejected the issue",
+                })
+                continue
+            # Created issues are listed in request order, without the failed ones
+            created_issue = next(created, {})
+            sent.append({
+                "key": created_issue.get("key", ""),
+                "id": created_issue.get("id", ""),
+                "self": created_issue.get("self", ""),
+                "summary": issue["summary"],
+                "success": bool(created_issue),
+                "url": f"{jira_url}/browse/{created_issue.get('key', '')}",
+            })
+    
+    results: List[Dict[str, Any]] = []
+    sent_results = iter(sent)
+    for index, issue in enumerate(issues):
+        if index in rejected:
+            results.append({"summary": issue["summary"], "success": False, "error": rejected[index]})
+        else:
+            results.append(next(sent_results))
+    
+    created_count = sum(1 for result in results if result["success"])
+    return {
+        "results": results,
+        "created": created_count,
+        "failed": len(results) - created_count,
+        "success": created_count == len(results),
+    }
+
+
+def _post_bulk(
+    endpoint: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Send one bulk create request.
+    
+    Returns:
+        Response body with 'issues' (created) and 'errors' (failed, by position)
+    
+    Raises:
+        requests.HTTPError: If the request failed as a whole
+    """
+    response = tool_transport.request("POST", endpoint, headers=headers, json=payload, timeout=timeout)
+    
+    if response.status_code == 401:
+        raise requests.HTTPError("Jira authentication failed. Check email and API token.")
+    
+    # Partial failures come back as 201, or as 400 when every issue failed;
+    # either way the body reports each issue
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or ("issues" not in data and "errors" not in data):
+        response.raise_for_status()
+        raise requests.HTTPError(f"Unexpected Jira bulk response: {response.text[:200]}")
+    return data
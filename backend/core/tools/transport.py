@@ -0,0 +1,193 @@
+"""
+Shared HTTP transport for tool calls: pooled keep-alive sessions per host, timeouts,
+and retries with jittered backoff.
+"""
+import random
+import threading
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import (
+    TOOL_REQUEST_TIMEOUT_SECONDS, TOOL_POOL_MAXSIZE, TOOL_RETRIES,
+    TOOL_RETRY_BACKOFF_SECONDS, TOOL_RETRY_MAX_BACKOFF_SECONDS,
+)
+from ..metrics import Metrics, global_metrics
+
+# Responses worth retrying: rate limited or the server is temporarily unavailable
+_RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# Methods that may be sent twice; others are only retried when the connection was
+# never established, so the request cannot have reached the server
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+
+
+class ToolTransport:
+    """
+    HTTP client shared by all tool calls.
+
+    Each host gets its own requests.Session with a keep-alive connection pool, so
+    repeated calls to api.github.com or a Jira site reuse TCP and TLS connections
+    instead of paying a DNS lookup and handshakes every time. Sessions keep no
+    cookies: they are shared by every system and account calling the host, and a
+    session cookie set for one account's call (e.g., Jira's JSESSIONID) must not
+    authenticate another's. Failed attempts are retried with exponential backoff and
+    full jitter, all within the call's timeout.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = TOOL_POOL_MAXSIZE,
+        retries: int = TOOL_RETRIES,
+        backoff: float = TOOL_RETRY_BACKOFF_SECONDS,
+        max_backoff: float = TOOL_RETRY_MAX_BACKOFF_SECONDS,
+        metrics: Metrics = global_metrics
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_maxsize: Connections kept open per host
+            retries: Retries after a failed attempt
+            backoff: Base backoff in seconds (doubled on each retry)
+            max_backoff: Longest backoff in seconds
+            metrics: Metrics that receive request, retry, latency, and pool statistics
+        """
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Any] = None,
+        timeout: float = TOOL_REQUEST_TIMEOUT_SECONDS,
+        stream: bool = False
+    ) -> requests.Response:
+        """
+        Send a request through the host's pooled session, retrying transient failures.
+
+        Connection errors, timeouts, and 429/502/503/504 responses are retried for
+        idempotent methods; other methods are only retried when the connection could
+        not be established. A Retry-After header sets the backoff when present.
+
+        Args:
+            method: HTTP method
+            url: Full URL
+            headers: Optional request headers
+            params: Optional query parameters
+            json: Optional JSON body
+            timeout: Time budget in seconds for all attempts together
+            stream: Return as soon as the headers arrive and let the caller read the
+                body (the caller must close the response)
+
+        Returns:
+            The last response (its status is not checked)
+
+        Raises:
+            requests.RequestException: If the last attempt failed without a response
+        """
+        method = method.upper()
+        host = self._host(url)
+        session = self._session(url)
+        give_up_at = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            self.metrics.incr(f"tool.http.requests.{host}")
+            try:
+                response = session.request(
+                    method, url, headers=headers, params=params, json=json,
+                    timeout=max(0.001, give_up_at - started), stream=stream
+                )
+            except requests.RequestException as e:
+                self.metrics.incr(f"tool.http.errors.{host}")
+                if not self._retryable_error(method, e):
+                    raise
+                delay = self._delay(attempt, None)
+                if attempt >= self.retries or time.monotonic() + delay >= give_up_at:
+                    raise
+                print(f"WARNING: Tool request to {host} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                self.metrics.observe(f"tool.http.latency.{host}", time.monotonic() - started)
+                self._publish_pool(host, session, url)
+                if response.status_code not in _RETRY_STATUS_CODES or method not in _IDEMPOTENT_METHODS:
+                    return response
+                delay = self._delay(attempt, response.headers.get("Retry-After"))
+                if attempt >= self.retries or time.monotonic() + delay >= give_up_at:
+                    return response
+                print(f"WARNING: Tool request to {host} returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            self.metrics.incr(f"tool.http.retries.{host}")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def _session(self, url: str) -> requests.Session:
+        """Get the pooled session for a URL's host, creating it on first use."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                # Reject every cookie, so nothing set for one call is sent with the next
+                session.cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount(origin, adapter)
+                self._sessions[origin] = session
+            return session
+
+    def _retryable_error(self, method: str, error: requests.RequestException) -> bool:
+        """True if a failed attempt may be sent again."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if method not in _IDEMPOTENT_METHODS:
+            return False
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Backoff before the next attempt: Retry-After if given, else full jitter."""
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _publish_pool(self, host: str, session: requests.Session, url: str) -> None:
+        """Update the gauges of connections opened and requests sent over them for a host."""
+        pools = session.get_adapter(url).poolmanager.pools
+        connections = requests_sent = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        self.metrics.set_gauge(f"tool.http.connections.{host}", connections)
+        self.metrics.set_gauge(f"tool.http.pooled_requests.{host}", requests_sent)
+
+    @staticmethod
+    def _host(url: str) -> str:
+        """Host name of a URL, used in metric names."""
+        return urlsplit(url).hostname or "unknown"
+
+
+# Process-wide transport shared by every tool call
+tool_transport = ToolTransport()